@@ -22,10 +22,28 @@ class ClientEnvConfig:
     SKYSCAN_EWMS_PILOT_LOG: str = cfg.LOG_LEVEL_DEFAULT
     SKYSCAN_MQ_CLIENT_LOG: str = cfg.LOG_LEVEL_DEFAULT
 
+    # persist parsed GCD frames to 'config.LOCAL_GCD_FRAME_CACHE', which is
+    #   shared by all client instances, so that only the first client parses the file
+    SKYSCAN_GCD_DISK_CACHE: bool = False
+
+    # the wall-clock limit (seconds) for each pixel's reco (0 -> no limit)
+    #   if set, each reco runs in a subprocess, which is killed at the limit
+    SKYSCAN_RECO_TIMEOUT_SEC: int = 0
+    # when a reco fails (raises or times out), write a failure message to the
+    #   outfile (for the server), instead of erroring out
+    SKYSCAN_RECO_FAILURE_MESSAGES: bool = False
+
     # TESTING/DEBUG VARS
     # NOTE - these are accessed via `os.getenv` -- ctrl+F for usages
     # _SKYSCAN_CI_MINI_TEST: bool = False  # run minimal variations for testing (mini-scale)
     # _SKYSCAN_CI_CRASH_DUMMY_PROBABILITY: float = 0.5  # for reco algo: crash-dummy
 
+    def __post_init__(self) -> None:
+        """Check values."""
+        if self.SKYSCAN_RECO_TIMEOUT_SEC < 0:
+            raise ValueError(
+                f"Env Var: SKYSCAN_RECO_TIMEOUT_SEC is negative: {self.SKYSCAN_RECO_TIMEOUT_SEC}"
+            )
+
 
 CLIENT_ENV = from_environment_as_dataclass(ClientEnvConfig)
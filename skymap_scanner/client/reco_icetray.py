@@ -2,12 +2,16 @@
 
 import argparse
 import datetime
+import itertools
 import json
 import logging
+import multiprocessing
+import multiprocessing.connection
 import os
+import sys
 import time
 from pathlib import Path
-from typing import Any, List, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 from icecube import (  # type: ignore[import-not-found]  # noqa: F401
     dataio,
@@ -23,11 +27,13 @@ from icecube.icetray import I3Tray  # type: ignore[import-not-found]
 from wipac_dev_tools import argparse_tools, logging_tools
 
 from .. import config as cfg, recos
+from ..recos import RecoInterface
 from . import CLIENT_ENV
 from ..utils import messages
 from ..utils.data_handling import get_gcd_datastager
+from ..utils.gcd_cache import load_gcd_frames
 from ..utils.load_scan_state import get_baseline_gcd_frames
-from ..utils.pixel_classes import RecoPixelVariation, pframe_tuple
+from ..utils.pixel_classes import PTuple, RecoPixelVariation, pframe_tuple
 from ..utils.utils import save_GCD_frame_packet_to_file
 
 LOGGER = logging.getLogger(__name__)
@@ -38,19 +44,26 @@ def frame_for_logging(frame: icetray.I3Frame) -> str:
 
 
 class LoadInitialFrames(icetray.I3Module):  # type: ignore[misc]
-    """Push Pixel PFrame into tray along with GCDQp frames."""
+    """Push Pixel PFrame(s) into tray along with GCDQp frames.
+
+    The GCDQp frames are pushed once, then one PFrame per call, so each
+    PFrame goes through the whole tray before the next one is pushed.
+    """
 
     def __init__(self, ctx: Any) -> None:
         super().__init__(ctx)
         self.AddParameter("Pixel", "Pixel PFrame", None)
+        self.AddParameter("Pixels", "Pixel PFrames (instead of Pixel)", [])
         self.AddParameter("GCDQpFrames", "GCDQp packet (list of frames)", [])
 
-        self._frames_loaded = False
+        self._n_pixels_pushed = 0
 
     def Configure(self) -> None:
-        self.pixel = self.GetParameter("Pixel")
-        if not self.pixel:
-            raise RuntimeError("self.pixel is not set")
+        self.pixels = list(self.GetParameter("Pixels"))
+        if not self.pixels:
+            self.pixels = [self.GetParameter("Pixel")]
+        if not all(self.pixels):
+            raise RuntimeError("self.pixels is not set")
 
         self.GCDQp_packet = self.GetParameter("GCDQpFrames")
         if not self.GCDQp_packet:
@@ -61,18 +74,19 @@ class LoadInitialFrames(icetray.I3Module):  # type: ignore[misc]
         if self.PopFrame():
             raise RuntimeError("LoadInitialFrames needs to be used as a driving module")
 
-        if self._frames_loaded:  # are we done yet?
+        if self._n_pixels_pushed == len(self.pixels):  # are we done yet?
             self.RequestSuspension()
             return
 
-        for frame in self.GCDQp_packet:
-            LOGGER.debug(f"Pushing GCDQP Frame: {frame_for_logging(frame)}")
-            self.PushFrame(frame)
-
-        LOGGER.debug(f"Pushing Pixel Frame: {frame_for_logging(self.pixel)}")
-        self.PushFrame(self.pixel)
+        if not self._n_pixels_pushed:
+            for frame in self.GCDQp_packet:
+                LOGGER.debug(f"Pushing GCDQP Frame: {frame_for_logging(frame)}")
+                self.PushFrame(frame)
 
-        self._frames_loaded = True
+        pixel = self.pixels[self._n_pixels_pushed]
+        LOGGER.debug(f"Pushing Pixel Frame: {frame_for_logging(pixel)}")
+        self.PushFrame(pixel)
+        self._n_pixels_pushed += 1
 
 
 def save_to_disk_cache(frame: icetray.I3Frame, save_dir: Path) -> Path:
@@ -100,22 +114,32 @@ def check_baseline_GCD(baseline_GCD_file: Union[str, None]) -> bool:
         )
 
 
-def reco_pixel(
+def _reco_in_tray(
     reco_algo: str,
-    pframe: icetray.I3Frame,
+    pframes: List[icetray.I3Frame],
     GCDQp_packet: List[icetray.I3Frame],
     baseline_GCD_file: str,
-    outfile: Path,
     realtime_format_version: str,
-) -> Path:
-    """Actually do the reco."""
-    start_time = time.time()
-
-    LOGGER.debug(f"pixel pframe contains: {list(pframe.keys())}")
-
-    LOGGER.info(f"Reco'ing pixel: {pframe_tuple(pframe)}...")
-
-    LOGGER.debug(f"PFrame: {frame_for_logging(pframe)}")
+    reco: RecoInterface,
+    save_dir: Path,
+    on_reco: Optional[Callable[[RecoPixelVariation], None]] = None,
+) -> List[RecoPixelVariation]:
+    """Reco the PFrames in one tray, in order.
+
+    Each reco is passed to `on_reco()` as soon as it is done (from
+    within the tray). Each reco'd frame is saved to the disk cache in
+    `save_dir`.
+
+    If the reco's traysegment depends on the seed (see
+    `RecoInterface.SEED_DEPENDENT_TRAYSEGMENT`), the PFrames must all be
+    of one pixel; otherwise, the traysegment is not given a seed.
+    """
+    seed = _get_tray_seed(reco_algo, reco, pframes)
+
+    for pframe in pframes:
+        LOGGER.debug(f"pixel pframe contains: {list(pframe.keys())}")
+        LOGGER.info(f"Reco'ing pixel: {pframe_tuple(pframe)}...")
+        LOGGER.debug(f"PFrame: {frame_for_logging(pframe)}")
     for frame in GCDQp_packet:
         LOGGER.debug(f"GCDQP Frame: {frame_for_logging(frame)}")
     LOGGER.info(f"{baseline_GCD_file=}")
@@ -127,7 +151,7 @@ def reco_pixel(
     tray.AddModule(
         LoadInitialFrames,
         "LoadInitialFrames",
-        Pixel=pframe,
+        Pixels=pframes,
         GCDQpFrames=GCDQp_packet,
     )
 
@@ -146,48 +170,31 @@ def reco_pixel(
             base_filename=baseline_GCD_file,
         )
 
-    # create instance of reco_algo object
-    RecoAlgo = recos.get_reco_interface_object(reco_algo)
-    reco = RecoAlgo(realtime_format_version)
-    reco.setup_reco()
-
     # perform fit
     tray.AddSegment(
         reco.traysegment,
         f"{reco_algo}_traysegment",
         logger=LOGGER,
-        seed=pframe[f"{cfg.OUTPUT_PARTICLE_NAME}"],
+        seed=seed,
     )
 
-    # Write reco out
+    # Collect recos
+    reco_pixel_variations: List[RecoPixelVariation] = []
+
     def writeout_reco(frame: icetray.I3Frame) -> None:
         LOGGER.debug(f"writeout_reco {pframe_tuple(frame)}: {frame_for_logging(frame)}")
         if frame.Stop != icetray.I3Frame.Physics:
             LOGGER.debug("frame.Stop is not Physics")
             return
-        if outfile.exists():  # check in case the tray is re-writing this file
-            raise FileExistsError(outfile)
-        save_to_disk_cache(frame, outfile.parent)
-        with open(outfile, "w") as f:
-            LOGGER.info(
-                f"Dumping reco {pframe_tuple(frame)}: "
-                f"{frame_for_logging(frame)} to {outfile}."
-            )
-            geometry = get_baseline_gcd_frames(baseline_GCD_file, GCDQp_packet)[0]
-            reco_pixel_variation = RecoPixelVariation.from_i3frame(
-                frame, geometry, reco_algo
-            )
-            LOGGER.info(f"RecoPixelFinal: {reco_pixel_variation}")
-            json.dump(
-                {
-                    cfg.MSG_KEY_RECO_PIXEL_VARIATION_PKL_B64: messages.Serialization.encode_pkl_b64(
-                        reco_pixel_variation
-                    ),
-                    # can't trust the clocks running in containers, but we can trust the relative time
-                    cfg.MSG_KEY_RUNTIME: time.time() - start_time,
-                },
-                f,
-            )
+        save_to_disk_cache(frame, save_dir)
+        geometry = get_baseline_gcd_frames(baseline_GCD_file, GCDQp_packet)[0]
+        reco_pixel_variation = RecoPixelVariation.from_i3frame(
+            frame, geometry, reco_algo
+        )
+        LOGGER.info(f"RecoPixelVariation: {reco_pixel_variation}")
+        reco_pixel_variations.append(reco_pixel_variation)
+        if on_reco:
+            on_reco(reco_pixel_variation)
 
     tray.AddModule(writeout_reco, "writeout_reco")
 
@@ -204,13 +211,436 @@ def reco_pixel(
 
     # Check Output #####################################################
 
-    if not outfile.exists():
-        raise FileNotFoundError(
-            f"Out file was not written {pframe_tuple(pframe)}: {outfile}"
+    if [r.id_tuple for r in reco_pixel_variations] != [pframe_tuple(f) for f in pframes]:
+        raise RuntimeError(
+            f"Recos were not all done {[pframe_tuple(f) for f in pframes]}: "
+            f"{[r.id_tuple for r in reco_pixel_variations]}"
+        )
+    return reco_pixel_variations
+
+
+def _get_tray_seed(
+    reco_algo: str,
+    reco: RecoInterface,
+    pframes: List[icetray.I3Frame],
+) -> Optional[Any]:
+    """Get the seed particle to give the traysegment, if it depends on it.
+
+    A seed-dependent traysegment is set up for one pixel, so the PFrames
+    must all be of one pixel (see `RecoInterface.SEED_DEPENDENT_TRAYSEGMENT`).
+    """
+    if not reco.SEED_DEPENDENT_TRAYSEGMENT:
+        return None
+
+    pixels = set(pframe_tuple(f)[:2] for f in pframes)
+    if len(pixels) != 1:
+        raise ValueError(
+            f"{reco_algo}'s traysegment depends on the seed, so its tray "
+            f"cannot reco more than one pixel: {sorted(pixels)}"
+        )
+    return pframes[0][f"{cfg.OUTPUT_PARTICLE_NAME}"]
+
+
+def reco_pixels(
+    reco_algo: str,
+    pframes: List[icetray.I3Frame],
+    GCDQp_packet: List[icetray.I3Frame],
+    baseline_GCD_file: str,
+    save_dir: Path,
+    realtime_format_version: str,
+    reco: Optional[RecoInterface] = None,
+    on_reco: Optional[Callable[[RecoPixelVariation], None]] = None,
+) -> List[RecoPixelVariation]:
+    """Reco a batch of PFrames, passing each reco to `on_reco()` as soon
+    as it is done.
+
+    The GCDQp packet is pushed once, followed by all the PFrames,
+    through a single tray -- so the GCD uncompression and the reco's
+    services are set up once per batch, not once per PFrame. If the
+    reco's traysegment depends on the seed (see
+    `RecoInterface.SEED_DEPENDENT_TRAYSEGMENT`), there is instead one
+    tray per pixel, whose variations must be given one after another.
+
+    The recos are returned in the PFrames' order. The trays run in the
+    calling thread; to bound a stuck tray, run this in a subprocess (see
+    `reco_pixel_in_subprocess()`). If `reco` is given, it
+    must already be set up (see `RecoInterface.setup_reco()`);
+    otherwise, a new instance is made. Each reco'd frame is saved to the
+    disk cache in `save_dir`.
+    """
+    # create instance of reco_algo object
+    if reco is None:
+        reco = get_setup_reco(reco_algo, realtime_format_version)
+
+    if reco.SEED_DEPENDENT_TRAYSEGMENT:
+        batches = [
+            list(group)
+            for _, group in itertools.groupby(pframes, key=lambda f: pframe_tuple(f)[:2])
+        ]
+    else:
+        batches = [pframes]
+
+    reco_pixel_variations: List[RecoPixelVariation] = []
+    for batch in batches:
+        reco_pixel_variations.extend(
+            _reco_in_tray(
+                reco_algo,
+                batch,
+                # the tray may alter the frames (ex: GCD uncompress), so give each one copies
+                [icetray.I3Frame(frame) for frame in GCDQp_packet],
+                baseline_GCD_file,
+                realtime_format_version,
+                reco,
+                save_dir,
+                on_reco,
+            )
+        )
+    return reco_pixel_variations
+
+
+def reco_pixel(
+    reco_algo: str,
+    pframe: icetray.I3Frame,
+    GCDQp_packet: List[icetray.I3Frame],
+    baseline_GCD_file: str,
+    outfile: Path,
+    realtime_format_version: str,
+    reco: Optional[RecoInterface] = None,
+    wire_version: int = cfg.WIRE_VERSION_PKL_B64,
+) -> Path:
+    """Actually do the reco.
+
+    If `reco` is given, it must already be set up (see
+    `RecoInterface.setup_reco()`); otherwise, a new instance is made.
+
+    The outfile's message is encoded using `wire_version` (use the
+    version of the received message).
+    """
+    start_time = time.time()
+    if outfile.exists():
+        raise FileExistsError(outfile)
+
+    [reco_pixel_variation] = reco_pixels(
+        reco_algo,
+        [pframe],
+        GCDQp_packet,
+        baseline_GCD_file,
+        outfile.parent,
+        realtime_format_version,
+        reco,
+    )
+
+    with open(outfile, "w") as f:
+        LOGGER.info(f"Dumping reco {reco_pixel_variation.id_tuple} to {outfile}.")
+        json.dump(
+            messages.encode_reco_pixel_variation_msg(
+                reco_pixel_variation,
+                # can't trust the clocks running in containers, but we can trust the relative time
+                time.time() - start_time,
+                wire_version,
+            ),
+            f,
         )
     return outfile
 
 
+def reco_pixel_variations(
+    reco_algo: str,
+    pframes: List[icetray.I3Frame],
+    GCDQp_packet: List[icetray.I3Frame],
+    baseline_GCD_file: str,
+    outfile: Path,
+    realtime_format_version: str,
+    reco: Optional[RecoInterface] = None,
+    wire_version: int = cfg.WIRE_VERSION_PKL_B64,
+    best_only: bool = False,
+) -> Path:
+    """Reco multiple pixel variations (see `reco_pixels()`).
+
+    If `best_only`, only each pixel's best variation is written out (the
+    others are listed as omitted). See `reco_pixel()` for the rest.
+    """
+    start_time = time.time()
+    if outfile.exists():
+        raise FileExistsError(outfile)
+
+    rpvs = reco_pixels(
+        reco_algo,
+        pframes,
+        GCDQp_packet,
+        baseline_GCD_file,
+        outfile.parent,
+        realtime_format_version,
+        reco,
+    )
+
+    results: List[RecoPixelVariation] = []
+    omitted: List[PTuple] = []
+    if not best_only:
+        results.extend(rpvs)
+    else:
+        # a pixel's variations are sent (and so reco'd) one after another
+        for _, group in itertools.groupby(rpvs, key=lambda r: r.id_tuple[:2]):
+            pixel_rpvs = list(group)
+            best = RecoPixelVariation.best_of(pixel_rpvs)
+            results.append(best)
+            omitted.extend(r.id_tuple for r in pixel_rpvs if r is not best)
+
+    with open(outfile, "w") as f:
+        LOGGER.info(f"Dumping {len(results)} recos ({len(omitted)} omitted) to {outfile}.")
+        json.dump(
+            messages.encode_reco_pixel_variations_msg(
+                results,
+                omitted,
+                # can't trust the clocks running in containers, but we can trust the relative time
+                time.time() - start_time,
+                wire_version,
+            ),
+            f,
+        )
+    return outfile
+
+
+class RecoTimeoutError(Exception):
+    """Raised when a reco runs longer than its wall-clock limit."""
+
+
+def _reco_pixel_in_child(
+    conn: multiprocessing.connection.Connection,
+    target: Callable[..., Path],
+    *args: Any,
+    **kwargs: Any,
+) -> None:
+    try:
+        target(*args, **kwargs)
+    except BaseException as e:
+        conn.send(repr(e))
+        raise
+
+
+def reco_pixel_in_subprocess(
+    timeout: float,
+    *args: Any,
+    target: Callable[..., Path] = reco_pixel,
+    **kwargs: Any,
+) -> None:
+    """Call `target()` (ex: `reco_pixel()`) in a subprocess, which is killed
+    after `timeout` sec.
+
+    A subprocess is used since a hung reco may be stuck in compiled code,
+    which Python cannot interrupt. The subprocess is forked, so it reuses
+    everything already loaded (ex: the GCD frames & a set-up reco).
+    """
+    ctx = multiprocessing.get_context("fork")
+    recv_conn, send_conn = ctx.Pipe(duplex=False)
+    proc = ctx.Process(
+        target=_reco_pixel_in_child,
+        args=(send_conn, target, *args),
+        kwargs=kwargs,
+    )
+    proc.start()
+    send_conn.close()
+
+    proc.join(timeout)
+    if proc.is_alive():
+        proc.kill()
+        proc.join()
+        raise RecoTimeoutError(f"Reco did not finish within {timeout} seconds")
+    if proc.exitcode != 0:
+        reason = recv_conn.recv() if recv_conn.poll() else f"exit code {proc.exitcode}"
+        raise RuntimeError(f"Reco failed in subprocess: {reason}")
+
+
+def run_reco_pixel(
+    reco_algo: str,
+    pframes: List[icetray.I3Frame],
+    GCDQp_packet: List[icetray.I3Frame],
+    baseline_GCD_file: str,
+    outfile: Path,
+    realtime_format_version: str,
+    reco: Optional[RecoInterface] = None,
+    wire_version: int = cfg.WIRE_VERSION_PKL_B64,
+    best_only: bool = False,
+) -> Optional[str]:
+    """Call `reco_pixel()` with a wall-clock limit & failure handling.
+
+    Multiple PFrames (from one message) are reco'd with
+    `reco_pixel_variations()` instead, with the wall-clock limit applying
+    to all of them.
+
+    If the reco fails (or times out) and failure messages are enabled,
+    write a failure message to `outfile` and return the reason.
+    Otherwise, the error is raised.
+
+    Environment Variables:
+        `SKYSCAN_RECO_TIMEOUT_SEC`
+            - the wall-clock limit (0 -> no limit)
+        `SKYSCAN_RECO_FAILURE_MESSAGES`
+            - whether to write a failure message instead of raising
+    """
+    start_time = time.time()
+    target: Callable[..., Path]
+    if len(pframes) == 1 and not best_only:
+        target = reco_pixel
+        args: Tuple[Any, ...] = (reco_algo, pframes[0])
+        kwargs: Dict[str, Any] = dict(reco=reco, wire_version=wire_version)
+    else:
+        target = reco_pixel_variations
+        args = (reco_algo, pframes)
+        kwargs = dict(reco=reco, wire_version=wire_version, best_only=best_only)
+    args += (GCDQp_packet, baseline_GCD_file, outfile, realtime_format_version)
+    try:
+        if CLIENT_ENV.SKYSCAN_RECO_TIMEOUT_SEC:
+            reco_pixel_in_subprocess(
+                CLIENT_ENV.SKYSCAN_RECO_TIMEOUT_SEC,
+                *args,
+                target=target,
+                **kwargs,
+            )
+        else:
+            target(*args, **kwargs)
+        return None
+    except Exception as e:
+        if not CLIENT_ENV.SKYSCAN_RECO_FAILURE_MESSAGES:
+            raise
+        LOGGER.exception(e)
+        reason = repr(e)
+
+    id_tuples = [pframe_tuple(f) for f in pframes]
+    LOGGER.warning(f"Writing failure message for {id_tuples} to {outfile}")
+    with open(outfile, "w") as f:  # overwrite anything partially written
+        json.dump(
+            messages.encode_reco_failure_msg(
+                id_tuples,
+                reason,
+                time.time() - start_time,
+            ),
+            f,
+        )
+    return reason
+
+
+def get_setup_reco(reco_algo: str, realtime_format_version: str) -> RecoInterface:
+    """Get a new reco_algo object, with its (expensive) services set up."""
+    RecoAlgo = recos.get_reco_interface_object(reco_algo)
+    reco = RecoAlgo(realtime_format_version)
+    reco.setup_reco()
+    return reco
+
+
+def read_startup_json(
+    client_startup_json: Path,
+) -> Tuple[Path, List[icetray.I3Frame]]:
+    """Read startup.json, stage the baseline GCD file, and get the GCDQp
+    packet."""
+    with open(client_startup_json, "rb") as f:
+        startup_json_dict = json.load(f)
+
+    # stage file(s)
+    datastager = get_gcd_datastager()
+    baseline_gcd_file = Path(startup_json_dict["baseline_GCD_file"])
+    datastager.stage_files([baseline_gcd_file.name])
+    baseline_gcd_file = Path(datastager.get_filepath(baseline_gcd_file.name))
+    # check if baseline GCD file is reachable
+    if not baseline_gcd_file.exists():
+        raise FileNotFoundError(baseline_gcd_file)
+    # parse now (or load a previously parsed copy) -- later reads hit the in-memory cache
+    load_gcd_frames(
+        str(baseline_gcd_file),
+        disk_cache_dir=(
+            cfg.LOCAL_GCD_FRAME_CACHE if CLIENT_ENV.SKYSCAN_GCD_DISK_CACHE else None
+        ),
+    )
+
+    # get GCDQp_packet
+    GCDQp_packet = full_event_followup.i3live_json_to_frame_packet(
+        json.dumps(startup_json_dict[cfg.STATEDICT_GCDQP_PACKET]),
+        pnf_framing=False,
+    )
+
+    return baseline_gcd_file, GCDQp_packet
+
+
+def read_infile(infile: Path) -> Tuple[str, List[icetray.I3Frame], str, int, bool]:
+    """Get the reco_algo, PFrame(s), realtime_format_version, the
+    message's wire version, and whether to reply with only the best
+    variations from the infile."""
+    LOGGER.info(f"Reading {infile}...")
+    with open(infile, "r") as f:
+        msg = json.load(f)
+    return messages.decode_pframes_msg(msg)
+
+
+def serve(
+    baseline_gcd_file: Path,
+    GCDQp_packet: List[icetray.I3Frame],
+) -> None:
+    """Reco a stream of pixels, one per line on stdin.
+
+    Each line is a JSON object: `{"infile": ..., "outfile": ...}`. Once
+    a pixel is done (or has failed), a JSON line is written to stdout:
+    `{"infile": ..., "outfile": ..., "error": null|str}`. If failure
+    messages are enabled, a failed pixel's outfile holds its failure
+    message (see `run_reco_pixel()`).
+
+    The GCDQp packet, the staged baseline GCD, and each reco_algo's
+    services (splines, etc.) are loaded once and kept for all pixels.
+    """
+    warm_recos: Dict[Tuple[str, str], RecoInterface] = {}
+
+    LOGGER.info("Serving pixels from stdin...")
+    for i, line in enumerate(sys.stdin):
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        infile, outfile = Path(request["infile"]), Path(request["outfile"])
+        LOGGER.info(f"Got request R#{i}: {infile=} {outfile=}")
+
+        error = None
+        try:
+            if outfile.exists():
+                raise FileExistsError(outfile)
+            (
+                reco_algo,
+                pframes,
+                realtime_format_version,
+                wire_version,
+                best_only,
+            ) = read_infile(infile)
+            # get or set up the reco_algo object
+            key = (reco_algo, realtime_format_version)
+            if key not in warm_recos:
+                LOGGER.info(f"Setting up {reco_algo} ({realtime_format_version})...")
+                warm_recos[key] = get_setup_reco(*key)
+            # go!
+            LOGGER.info(f"Starting {reco_algo}...")
+            error = run_reco_pixel(
+                reco_algo,
+                pframes,
+                # the tray may alter the frames (ex: GCD uncompress), so give it copies
+                [icetray.I3Frame(frame) for frame in GCDQp_packet],
+                str(baseline_gcd_file),
+                outfile,
+                realtime_format_version,
+                reco=warm_recos[key],
+                wire_version=wire_version,
+                best_only=best_only,
+            )
+            LOGGER.info(f"Done reco'ing pixel (R#{i}).")
+        except Exception as e:
+            LOGGER.exception(e)
+            error = repr(e)
+
+        print(
+            json.dumps(
+                {"infile": str(infile), "outfile": str(outfile), "error": error}
+            ),
+            flush=True,
+        )
+
+    LOGGER.info("Done serving pixels (stdin closed).")
+
+
 # fmt: on
 def main() -> None:
     """Reco a single pixel."""
@@ -218,16 +648,27 @@ def main() -> None:
         description=(
             "Perform reconstruction on a pixel "
             "by reading `--infile FILE` and writing result to "
-            "`--outfile FILE`."
+            "`--outfile FILE`. Alternatively, use `--serve` to "
+            "reconstruct a stream of pixels (see `serve()`)."
         ),
         epilog="",
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
     )
 
     # input/output args
+    parser.add_argument(
+        "--serve",
+        default=False,
+        action="store_true",
+        help=(
+            "keep running and reconstruct the pixels requested on stdin "
+            "(one JSON line per pixel: {\"infile\": ..., \"outfile\": ...}), "
+            "instead of using --infile/--outfile"
+        ),
+    )
     parser.add_argument(
         "--infile",
-        required=True,
+        default=None,
         help="a file containing the pixel to reconstruct",
         type=lambda x: argparse_tools.validate_arg(
             Path(x),
@@ -237,7 +678,7 @@ def main() -> None:
     )
     parser.add_argument(
         "--outfile",
-        required=True,
+        default=None,
         help="a file to write the reconstruction to",
         type=lambda x: argparse_tools.validate_arg(
             Path(x),
@@ -269,41 +710,33 @@ def main() -> None:
     )
     logging_tools.log_argparse_args(args, logger=LOGGER, level="WARNING")
 
+    if args.serve == bool(args.infile or args.outfile):
+        parser.error("use either --serve or (--infile and --outfile)")
+    if not args.serve and not (args.infile and args.outfile):
+        parser.error("--infile and --outfile are both required")
+
     # read startup.json
-    with open(args.client_startup_json, "rb") as f:
-        startup_json_dict = json.load(f)
+    baseline_gcd_file, GCDQp_packet = read_startup_json(args.client_startup_json)
 
-    # stage file(s)
-    datastager = get_gcd_datastager()
-    baseline_gcd_file = Path(startup_json_dict["baseline_GCD_file"])
-    datastager.stage_files([baseline_gcd_file.name])
-    baseline_gcd_file = Path(datastager.get_filepath(baseline_gcd_file.name))
-    # check if baseline GCD file is reachable
-    if not baseline_gcd_file.exists():
-        raise FileNotFoundError(baseline_gcd_file)
+    if args.serve:
+        serve(baseline_gcd_file, GCDQp_packet)
+        return
 
     # get PFrame
-    LOGGER.info(f"Reading {args.infile}...")
-    with open(args.infile, "r") as f:
-        msg = json.load(f)
-        reco_algo = msg[cfg.MSG_KEY_RECO_ALGO]
-        pframe = messages.Serialization.decode_pkl_b64(msg[cfg.MSG_KEY_PFRAME_PKL_B64])
-        realtime_format_version = msg[cfg.MSG_KEY_REALTIME_FORMAT_VERSION]
-
-    # get GCDQp_packet
-    GCDQp_packet = full_event_followup.i3live_json_to_frame_packet(
-        json.dumps(startup_json_dict[cfg.STATEDICT_GCDQP_PACKET]),
-        pnf_framing=False,
+    reco_algo, pframes, realtime_format_version, wire_version, best_only = (
+        read_infile(args.infile)
     )
 
     # go!
     LOGGER.info(f"Starting {reco_algo}...")
-    reco_pixel(
+    run_reco_pixel(
         reco_algo,
-        pframe,
+        pframes,
         GCDQp_packet,
         str(baseline_gcd_file),
         args.outfile,
         realtime_format_version,
+        wire_version=wire_version,
+        best_only=best_only,
     )
     LOGGER.info("Done reco'ing pixel.")
@@ -32,6 +32,9 @@ LOCAL_DATA_CACHE: Final[Path] = (
     Path(os.getenv("EWMS_TASK_DATA_HUB_DIR", ".")) / "data-staging-cache"
 )
 
+# Local directory to persist parsed GCD frames (see `utils.gcd_cache`).
+LOCAL_GCD_FRAME_CACHE: Final[Path] = LOCAL_DATA_CACHE / "gcd-frame-cache"
+
 # Directory path under a local data source to fetch spline data from.
 LOCAL_SPLINE_SUBDIR: Final[str] = "photon-tables/splines"
 REMOTE_SPLINE_SUBDIR: Final[str] = "spline-tables"
@@ -83,6 +86,28 @@ MSG_KEY_REALTIME_FORMAT_VERSION: Final = "realtime_format_version"
 #
 MSG_KEY_RECO_PIXEL_VARIATION_PKL_B64: Final = "reco_pixel_variation_pkl_b64"
 MSG_KEY_RUNTIME: Final = "runtime"
+#
+MSG_KEY_WIRE_VERSION: Final = "wire_version"  # if absent -> WIRE_VERSION_PKL_B64
+MSG_KEY_PFRAME_I3_B64: Final = "pframe_i3_b64"
+MSG_KEY_RECO_PIXEL_VARIATION_BIN_B64: Final = "reco_pixel_variation_bin_b64"
+#
+MSG_KEY_RECO_FAILURE: Final = "reco_failure"  # present only if the reco failed
+MSG_KEY_RECO_FAILURE_PTUPLES: Final = "pixel_variations"  # [[nside, pixel_id, posvar_id], ...]
+MSG_KEY_RECO_FAILURE_REASON: Final = "reason"
+#
+# for messages with multiple pixel variations (ex: all of a pixel's position variations)
+MSG_KEY_PFRAMES_PKL_B64: Final = "pframes_pkl_b64"
+MSG_KEY_PFRAMES_I3_B64: Final = "pframes_i3_b64"
+MSG_KEY_BEST_ONLY: Final = "best_only"  # reply w/ only each pixel's best variation
+MSG_KEY_RECO_PIXEL_VARIATIONS_PKL_B64: Final = "reco_pixel_variations_pkl_b64"
+MSG_KEY_RECO_PIXEL_VARIATIONS_BIN_B64: Final = "reco_pixel_variations_bin_b64"
+MSG_KEY_OMITTED_PTUPLES: Final = "omitted_pixel_variations"  # reco'd, but not the best
+
+# message encodings ("wire versions") -- a client replies using the version it received
+#   clients built before wire versions existed only understand WIRE_VERSION_PKL_B64
+WIRE_VERSION_PKL_B64: Final = 1  # pickled objects
+WIRE_VERSION_BINARY: Final = 2  # raw I3Frame bytes & fixed-layout binary records
+WIRE_VERSIONS: Final = (WIRE_VERSION_PKL_B64, WIRE_VERSION_BINARY)
 
 # default filepaths
 BASELINE_GCD_FILENAME = "base_GCD_for_diff.i3"
@@ -95,6 +120,16 @@ PREDICTIVE_SCANNING_THRESHOLD_MAX = 1.0
 PREDICTIVE_SCANNING_THRESHOLD_DEFAULT = 1.0
 COLLECTOR_BASE_THRESHOLDS = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0]
 
+# the orders in which a round's pixels can be served
+PIXEL_ORDER_RANDOM: Final = "random"
+PIXEL_ORDER_CLOSEST_TO_BEST_FIT: Final = "closest-to-best-fit"
+PIXEL_ORDER_LONGEST_RUNTIME_FIRST: Final = "longest-runtime-first"
+PIXEL_ORDERS: Final = (
+    PIXEL_ORDER_RANDOM,
+    PIXEL_ORDER_CLOSEST_TO_BEST_FIT,
+    PIXEL_ORDER_LONGEST_RUNTIME_FIRST,
+)
+
 # reporter config
 REPORTER_TIMELINE_PERCENTAGES = [
     0.1,
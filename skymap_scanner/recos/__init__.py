@@ -42,6 +42,11 @@ class RecoInterface(ABC):
     # The spline files will be looked up in pre-defined local paths or fetched from a remote data store.
     SPLINE_REQUIREMENTS: List[str] = list()
 
+    # Whether the traysegment is set up using its `seed` (the PFrame's seed particle).
+    # If so, a tray can only reco PFrames with the same seed direction (i.e. the same pixel);
+    # otherwise, the traysegment is given `seed=None`, since its tray may reco many pixels.
+    SEED_DEPENDENT_TRAYSEGMENT: bool = False
+
     @abstractmethod
     def __init__(self, realtime_format_version: str):
         self.realtime_format_version = realtime_format_version
@@ -44,6 +44,9 @@ class MillipedeWilks(RecoInterface):
     SPLINE_REQUIREMENTS = [FTP_ABS_SPLINE, FTP_PROB_SPLINE, FTP_EFFD_SPLINE,
                            FTP_EFFP_SPLINE, FTP_TMOD_SPLINE]
 
+    # the step sizes are aligned with the seed's direction
+    SEED_DEPENDENT_TRAYSEGMENT = True
+
     def __init__(self, realtime_format_version: str):
         super().__init__(realtime_format_version)
         self.rotate_vertex = True
@@ -159,23 +162,26 @@ class MillipedeWilks(RecoInterface):
         # exclude bright DOMs
         ExcludedDOMs = exclusionList
 
+        # the DOMs to skip if unhit -- the geometry is the same for every
+        # frame in the tray, so only go through it once
+        skippable_doms = []
+
         def skipunhits(frame, output, pulses):
-            keepstrings = [1,3,5,14,16,18,20,31,33,35,37,39,51,53,55,57,59,68,70,72,74]
-            keepoms = list(range(1,60,5))
+            if not skippable_doms:
+                keepstrings = [1,3,5,14,16,18,20,31,33,35,37,39,51,53,55,57,59,68,70,72,74]
+                keepoms = list(range(1,60,5))
+                for k, v in frame['I3Geometry'].omgeo.items():
+                    if v.omtype != dataclasses.I3OMGeo.OMType.IceCube:
+                        continue
+                    if k.string not in keepstrings or k.om not in keepoms:
+                        skippable_doms.append(k)
             all_pulses = dataclasses.I3RecoPulseSeriesMap.from_frame(
                 frame, pulses)
-            omgeo = frame['I3Geometry']
-            geo = omgeo.omgeo
+            hit_doms = set(all_pulses.keys())
             unhits = dataclasses.I3VectorOMKey()
-            for k, v in geo.items():
-                if v.omtype != dataclasses.I3OMGeo.OMType.IceCube:
-                    continue
-                if k.string not in keepstrings:
-                    if k not in all_pulses.keys():
-                        unhits.append(k)
-                else:
-                    if k not in all_pulses.keys() and k.om not in keepoms:
-                        unhits.append(k)
+            for k in skippable_doms:
+                if k not in hit_doms:
+                    unhits.append(k)
 
             frame[output] = unhits
 
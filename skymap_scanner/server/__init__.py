@@ -58,6 +58,90 @@ class ServerEnvConfig:
         #   Going much higher (>300) typically gives only small additional throughput gains (diminishing returns).
         300
     )
+    SKYSCAN_MQ_WIRE_VERSION: int = (
+        # How pixels are encoded in messages to clients (see `config.WIRE_VERSIONS`)
+        #   Clients reply using the same encoding.
+        #   NOTE: only clients that understand the 'wire_version' field (this version
+        #         of the client or later) can decode WIRE_VERSION_BINARY messages --
+        #         opt in only once every client image in use has been updated.
+        cfg.WIRE_VERSION_PKL_B64
+    )
+
+    SKYSCAN_PIXEL_ORDER: str = (
+        # The order in which each round's pixels are served (see `config.PIXEL_ORDERS`)
+        #   "closest-to-best-fit" converges (and triggers refinement) sooner,
+        #   "longest-runtime-first" shortens the end of each round
+        cfg.PIXEL_ORDER_RANDOM
+    )
+
+    SKYSCAN_MERGE_POSVARS: bool = (
+        # Send all of a pixel's position variations in one message, to be reco'd in
+        #   one tray -- instead of one message per variation
+        False
+    )
+    SKYSCAN_MERGE_POSVARS_BEST_ONLY: bool = (
+        # With SKYSCAN_MERGE_POSVARS, clients reply with only each pixel's best variation
+        #   (the others are recorded as NaN, so the pixel's result is the same)
+        False
+    )
+
+    SKYSCAN_BUNDLE_TARGET_SEC: int = (
+        # Bundle multiple pixels into one message, so each takes about this long to reco
+        #   (sized from the nside's observed reco runtime). Helps when recos are fast
+        #   compared to the per-message overhead. 0 -> one pixel per message.
+        0
+    )
+
+    SKYSCAN_DATAFLOW_REFINEMENT: bool = (
+        # Refine each pixel's neighborhood as soon as it (and its neighbors) are done,
+        #   instead of refining in rounds, each gated by a collection threshold --
+        #   a full round is only run when there's nothing left in flight
+        False
+    )
+
+    # DISPATCH WINDOW
+    #
+    SKYSCAN_DISPATCH_MAX_IN_FLIGHT: int = (
+        # The max number of pixel variations sent to clients but not yet returned
+        #   The rest wait (ordered by priority) on the server, so finer, more
+        #   important pixels can jump ahead. 0 -> no limit, send all immediately.
+        0
+    )
+    SKYSCAN_DISPATCH_AUTO_WINDOW: bool = (
+        # Size the window from the observed throughput & round-trip times (Little's law)
+        #   SKYSCAN_DISPATCH_MAX_IN_FLIGHT is then used as the initial/minimum window.
+        False
+    )
+    SKYSCAN_DISPATCH_AUTO_WINDOW_HEADROOM: float = (
+        # The auto-sized window is this multiple of the in-flight count needed to keep
+        #   the observed workers busy (>1.0 lets the window grow as workers are added)
+        1.5
+    )
+
+    # STRAGGLERS
+    #
+    SKYSCAN_STRAGGLER_RTT_MULTIPLE: float = (
+        # Re-send an in-flight pixel variation once it has been out for this multiple of
+        #   the (nside's) median round-trip time -- the first result back is kept.
+        #   0 -> never re-send. Works best w/ a dispatch window, since otherwise the
+        #   round-trip times include time waiting in the broker's queue.
+        0.0
+    )
+    SKYSCAN_STRAGGLER_MAX_RESENDS: int = 1  # per pixel variation
+
+    # RETRIES
+    #
+    SKYSCAN_RETRY_BUDGET: int = (
+        # The max number of times to re-send a pixel variation that failed (see the
+        #   client's SKYSCAN_RECO_FAILURE_MESSAGES) or that is overdue -- after that,
+        #   it is recorded as NaN so the scan can finish
+        0
+    )
+    SKYSCAN_RETRY_DEADLINE_SEC: int = (
+        # How long a pixel variation can be in flight before it's overdue (0 -> never)
+        #   Without a dispatch window, this includes time waiting in the broker's queue.
+        0
+    )
 
     # TIMEOUTS
     #
@@ -85,6 +169,50 @@ class ServerEnvConfig:
             raise ValueError(
                 f"Env Var: SKYSCAN_RESULT_INTERVAL_SEC is not positive: {self.SKYSCAN_RESULT_INTERVAL_SEC}"
             )
+        if self.SKYSCAN_PIXEL_ORDER not in cfg.PIXEL_ORDERS:
+            raise ValueError(
+                f"Env Var: SKYSCAN_PIXEL_ORDER is not one of {cfg.PIXEL_ORDERS}: {self.SKYSCAN_PIXEL_ORDER}"
+            )
+        if self.SKYSCAN_DISPATCH_MAX_IN_FLIGHT < 0:
+            raise ValueError(
+                f"Env Var: SKYSCAN_DISPATCH_MAX_IN_FLIGHT is negative: {self.SKYSCAN_DISPATCH_MAX_IN_FLIGHT}"
+            )
+        if self.SKYSCAN_DISPATCH_AUTO_WINDOW and not self.SKYSCAN_DISPATCH_MAX_IN_FLIGHT:
+            raise ValueError(
+                "Env Var: SKYSCAN_DISPATCH_AUTO_WINDOW requires a (minimum) SKYSCAN_DISPATCH_MAX_IN_FLIGHT"
+            )
+        if self.SKYSCAN_DISPATCH_AUTO_WINDOW_HEADROOM < 1.0:
+            raise ValueError(
+                f"Env Var: SKYSCAN_DISPATCH_AUTO_WINDOW_HEADROOM is less than 1.0: {self.SKYSCAN_DISPATCH_AUTO_WINDOW_HEADROOM}"
+            )
+        if self.SKYSCAN_STRAGGLER_RTT_MULTIPLE and self.SKYSCAN_STRAGGLER_RTT_MULTIPLE <= 1.0:
+            raise ValueError(
+                f"Env Var: SKYSCAN_STRAGGLER_RTT_MULTIPLE must be 0 (disabled) or greater than 1.0: {self.SKYSCAN_STRAGGLER_RTT_MULTIPLE}"
+            )
+        if self.SKYSCAN_STRAGGLER_MAX_RESENDS < 0:
+            raise ValueError(
+                f"Env Var: SKYSCAN_STRAGGLER_MAX_RESENDS is negative: {self.SKYSCAN_STRAGGLER_MAX_RESENDS}"
+            )
+        if self.SKYSCAN_RETRY_BUDGET < 0:
+            raise ValueError(
+                f"Env Var: SKYSCAN_RETRY_BUDGET is negative: {self.SKYSCAN_RETRY_BUDGET}"
+            )
+        if self.SKYSCAN_RETRY_DEADLINE_SEC < 0:
+            raise ValueError(
+                f"Env Var: SKYSCAN_RETRY_DEADLINE_SEC is negative: {self.SKYSCAN_RETRY_DEADLINE_SEC}"
+            )
+        if self.SKYSCAN_BUNDLE_TARGET_SEC < 0:
+            raise ValueError(
+                f"Env Var: SKYSCAN_BUNDLE_TARGET_SEC is negative: {self.SKYSCAN_BUNDLE_TARGET_SEC}"
+            )
+        if self.SKYSCAN_MERGE_POSVARS_BEST_ONLY and not self.SKYSCAN_MERGE_POSVARS:
+            raise ValueError(
+                "Env Var: SKYSCAN_MERGE_POSVARS_BEST_ONLY requires SKYSCAN_MERGE_POSVARS"
+            )
+        if self.SKYSCAN_MQ_WIRE_VERSION not in cfg.WIRE_VERSIONS:
+            raise ValueError(
+                f"Env Var: SKYSCAN_MQ_WIRE_VERSION is not one of {cfg.WIRE_VERSIONS}: {self.SKYSCAN_MQ_WIRE_VERSION}"
+            )
 
 
 SERVER_ENV = from_environment_as_dataclass(ServerEnvConfig)
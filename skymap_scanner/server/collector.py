@@ -1,12 +1,11 @@
 """The Skymap Scanner Server."""
 
-import itertools
+import dataclasses as dc
 import logging
+import math
 import time
 from bisect import bisect
-from typing import Any, Dict, List, Optional, Set, Tuple
-
-import numpy
+from typing import AbstractSet, Any, Dict, List, Optional, Set, Tuple
 
 from .reporter import Reporter
 from .. import config as cfg
@@ -14,6 +13,7 @@ from ..utils.pixel_classes import (
     NSidesDict,
     PTuple,
     RecoPixelFinal,
+    RecoPixelFinalStore,
     RecoPixelVariation,
     SentPixelVariation,
 )
@@ -63,14 +63,7 @@ class RecoPixelFinalFinder:
 
         if len(self.cache_by_nside_pixid[index]) >= self.n_posvar:
             # find minimum llh
-            best = None
-            for this in self.cache_by_nside_pixid[index]:
-                if (not best) or (this.llh < best.llh and not numpy.isnan(this.llh)):
-                    best = this
-            if best is None:
-                # just push the first if all of them are nan
-                best = self.cache_by_nside_pixid[index][0]
-
+            best = RecoPixelVariation.best_of(self.cache_by_nside_pixid[index])
             del self.cache_by_nside_pixid[index]  # del list
             return RecoPixelFinal.from_recopixelvariation(best)
 
@@ -89,6 +82,77 @@ class RecoPixelFinalFinder:
             )
 
 
+class NSidesProgressTracker:
+    """Incrementally track each nside's percentage done vs its thresholds.
+
+    Percentages are only re-binned for nsides whose counts changed in a
+    way that could matter: when pixel variations are sent, or when the
+    number of finished pixels reaches the (precomputed) boundary count
+    of the nside's next threshold bin.
+    """
+
+    def __init__(
+        self,
+        nsides_thresholds: Dict[int, List[float]],
+        n_posvar: int,
+    ) -> None:
+        self.nsides_thresholds = nsides_thresholds
+        self.n_posvar = n_posvar
+
+        self.n_sent: Dict[int, int] = {}
+        self.percents_done: Dict[int, float] = {}
+        self._bins: Dict[int, float] = {}  # bin at last evaluation
+        self._boundaries: Dict[int, float] = {}  # n finished pixels to reach next bin
+        self._dirty: Set[int] = set([])  # nsides needing re-evaluation
+
+    def _bin_it(self, nside: int, percent: float) -> float:
+        # find the threshold bin (floor) for the nside (0.0 if too low)
+        thresholds = self.nsides_thresholds[nside]
+        index = bisect(thresholds, percent)
+        return thresholds[index - 1] if index else 0.0
+
+    def _percent(self, nside: int, n_finished: int) -> float:
+        return (n_finished * self.n_posvar) / self.n_sent[nside]
+
+    def _calc_boundary(self, nside: int) -> float:
+        """Get the min # of finished pixels needed to reach the next bin."""
+        next_tbins = [t for t in self.nsides_thresholds[nside] if t > self._bins[nside]]
+        if not next_tbins:
+            return float("inf")
+        tbin = next_tbins[0]
+        # start with an estimate, then make it exact w/ the same float math as `_percent()`
+        boundary = math.ceil(tbin * self.n_sent[nside] / self.n_posvar)
+        while boundary > 0 and self._percent(nside, boundary - 1) >= tbin:
+            boundary -= 1
+        while self._percent(nside, boundary) < tbin:
+            boundary += 1
+        return boundary
+
+    def register_sent(self, nside: int, n_pixvars: int) -> None:
+        """Record that `n_pixvars` more pixel variations were sent."""
+        self.n_sent[nside] = self.n_sent.get(nside, 0) + n_pixvars
+        self._dirty.add(nside)
+
+    def record_finished(self, nside: int, n_finished: int) -> None:
+        """Record the nside's current number of finished pixels."""
+        if n_finished >= self._boundaries.get(nside, 0):
+            self._dirty.add(nside)
+
+    def pop_newly_thresholded(self, nsides_dict: NSidesDict) -> List[int]:
+        """Get the nsides that breached a new threshold since the last call."""
+        newly_thresholded_nsides = []
+        for nside in self._dirty:
+            percent = self._percent(nside, len(nsides_dict.get(nside, [])))
+            tbin = self._bin_it(nside, percent)
+            if tbin > self._bins.get(nside, 0.0):
+                newly_thresholded_nsides.append(nside)
+            self.percents_done[nside] = percent
+            self._bins[nside] = tbin
+            self._boundaries[nside] = self._calc_boundary(nside)
+        self._dirty.clear()
+        return newly_thresholded_nsides
+
+
 class Collector:
     """Manage collecting, filtering, reporting, and saving of
     RecoPixelFinals."""
@@ -109,13 +173,15 @@ class Collector:
         # data stores
         self.nsides_dict = nsides_dict
         self._pixfinid_received_quick_lookup: Set[PTuple] = set([])
-        self._sent_pixvars_by_nside: Dict[int, List[SentPixelVariation]] = {}
+        self._sent_pixvars: Dict[PTuple, SentPixelVariation] = {}
+        self._sent_pixels_quick_lookup: Set[Tuple[int, int]] = set([])  # (nside, pixel_id)
+        self._dupe_ok_pixvars: Set[PTuple] = set([])  # these may be received twice
 
         # percentage progress trackers
-        self._nsides_thresholds = Collector._make_nsides_thresholds(
-            predictive_scanning_threshold, nsides
+        self._progress = NSidesProgressTracker(
+            Collector._make_nsides_thresholds(predictive_scanning_threshold, nsides),
+            n_posvar,
         )
-        self._nsides_percents_done = {n: 0.0 for n in nsides}
 
     @staticmethod
     def _make_nsides_thresholds(
@@ -161,12 +227,20 @@ class Collector:
 
     @property
     def n_sent(self) -> int:
-        return sum(len(x) for x in self._sent_pixvars_by_nside.values())
+        return len(self._sent_pixvars)
 
     @property
     def sent_pixvars(self) -> Set[SentPixelVariation]:
         """Just the PixelSent instances that have been sent."""
-        return set(itertools.chain(*self._sent_pixvars_by_nside.values()))
+        return set(self._sent_pixvars.values())
+
+    @property
+    def sent_pixels(self) -> AbstractSet[Tuple[int, int]]:
+        """The `(nside, pixel_id)` of each pixel that has been sent.
+
+        This is a live, read-only view (it updates as more are sent).
+        """
+        return self._sent_pixels_quick_lookup
 
     def finder_context(self) -> "_FinderContextManager":
         """Creates a context manager for startup & ending conditions."""
@@ -185,42 +259,72 @@ class Collector:
             self.finder.finish()
             self.parent._in_finder_context = False
 
-    async def register_sent_pixvars(
-        self, addl_sent_pixvars: Set[SentPixelVariation]
-    ) -> None:
-        """Register the pixel ids recently sent.
+    def register_sent_pixvar(self, sent_pixvar: SentPixelVariation) -> None:
+        """Register a pixel variation that is being sent.
 
-        When `addl_sent_pixvars` is empty (happens at the end of the
-        scan), `self.predictive_scanning_threshold` will now be ignored.
+        Call this *before* sending, since the collection of other recos
+        may be happening concurrently. A pixel variation can only be
+        registered once (see `expect_duplicates()` for re-sending one).
         """
-        if addl_sent_pixvars:
-            for spv in addl_sent_pixvars:
-                self.reporter.increment_sent_ct(spv.nside)
-                try:
-                    self._sent_pixvars_by_nside[spv.nside].append(spv)
-                except KeyError:
-                    self._sent_pixvars_by_nside[spv.nside] = [spv]
+        id_tuple = (sent_pixvar.nside, sent_pixvar.pixel_id, sent_pixvar.posvar_id)
+        if id_tuple in self._sent_pixvars:
+            raise RuntimeError(f"Pixel variation has already been registered as sent: {id_tuple}")
+        self.reporter.increment_sent_ct(sent_pixvar.nside)
+        self._sent_pixvars[id_tuple] = sent_pixvar
+        self._progress.register_sent(sent_pixvar.nside, 1)
+        self._sent_pixels_quick_lookup.add((sent_pixvar.nside, sent_pixvar.pixel_id))
+
+    def restamp_sent_time(self, id_tuple: PTuple) -> None:
+        """Reset a registered pixel variation's sent time to now.
+
+        Use this when a pixel variation is registered well before it is
+        actually sent, so its round-trip time is not inflated.
+        """
+        self._sent_pixvars[id_tuple] = dc.replace(
+            self._sent_pixvars[id_tuple], sent_time=time.time()
+        )
+
+    def expect_duplicates(self, id_tuple: PTuple) -> None:
+        """Register that a pixel variation may be received more than once.
+
+        Ex: it was re-sent, or it was given up on. Only its first reco
+        is collected, any others are discarded.
+        """
+        self._dupe_ok_pixvars.add(id_tuple)
+
+    async def report_sent_pixvars(
+        self, n_addl_sent: int, bypass_timers: bool = True
+    ) -> None:
+        """Report on the round of pixel variations that was just sent.
 
+        When `n_addl_sent` is 0 (happens at the end of the scan), there
+        were no additional pixels to send.
+        """
+        if n_addl_sent:
             await self.reporter.make_reports_if_needed(
-                bypass_timers=True,
+                bypass_timers=bypass_timers,
                 summary_msg=(
-                    f"The Skymap Scanner has sent out {len(addl_sent_pixvars)} "
+                    f"The Skymap Scanner has sent out {n_addl_sent} "
                     f"pixels and is waiting to receive recos."
                 ),
             )
         else:
             await self.reporter.make_reports_if_needed(
-                bypass_timers=True,
+                bypass_timers=bypass_timers,
                 summary_msg="The Skymap Scanner is waiting to receive recos.",
             )
 
     async def collect(
         self,
         reco_pixel_variation: RecoPixelVariation,
-        on_worker_runtime: float,
-    ) -> None:
+        on_worker_runtime: Optional[float],
+    ) -> Optional[RecoPixelFinal]:
         """Cache RecoPixelVariation until we can save the pixel's best received
-        reco (RecoPixelFinal)."""
+        reco (RecoPixelFinal).
+
+        `on_worker_runtime` is `None` if there was no reco (it was given up on).
+        Return the RecoPixelFinal if it was just now saved.
+        """
         if not self._in_finder_context:
             raise RuntimeError("Must be in `Collector.finder_context()` context.")
         LOGGER.debug(  # don't log HUGE string
@@ -228,15 +332,17 @@ class Collector:
         )
 
         if reco_pixel_variation.id_tuple in self._pixfinid_received_quick_lookup:
+            if reco_pixel_variation.id_tuple in self._dupe_ok_pixvars:
+                LOGGER.debug(  # ex: the slower copy of a re-sent straggler
+                    f"Discarding duplicate RecoPixelVariation: {reco_pixel_variation.id_tuple}"
+                )
+                return None
             raise ExtraRecoPixelVariationException(
                 f"RecoPixelVariation has already been received: {reco_pixel_variation.id_tuple}"
             )
 
         # match to corresponding SentPixelVariation
-        sent_pixvar = None
-        for sent_pixvar in self._sent_pixvars_by_nside[reco_pixel_variation.nside]:
-            if sent_pixvar.matches_reco_pixel_variation(reco_pixel_variation):
-                break
+        sent_pixvar = self._sent_pixvars.get(reco_pixel_variation.id_tuple)
         if not sent_pixvar:
             raise ExtraRecoPixelVariationException(
                 f"RecoPixelVariation received not in sent set: {reco_pixel_variation.id_tuple}"
@@ -264,21 +370,28 @@ class Collector:
             )
             # insert pixfin into nsides_dict
             if pixfin.nside not in self.nsides_dict:
-                self.nsides_dict[pixfin.nside] = {}
+                self.nsides_dict[pixfin.nside] = RecoPixelFinalStore(pixfin.nside)
             if pixfin.pixel_id in self.nsides_dict[pixfin.nside]:
                 raise ExtraRecoPixelVariationException(
                     f"NSide {pixfin.nside} / Pixel {pixfin.pixel_id} is already in nsides_dict"
                 )
             self.nsides_dict[pixfin.nside][pixfin.pixel_id] = pixfin
+            self._progress.record_finished(
+                pixfin.nside, len(self.nsides_dict[pixfin.nside])
+            )
             LOGGER.debug(f"Saved (found during {logging_id}): {pixfin}")
 
         # report after potential save
+        if on_worker_runtime is None:  # not a reco, so no stats to record
+            await self.reporter.make_reports_if_needed()
+            return pixfin
         await self.reporter.record_reco(
             reco_pixel_variation.nside,
             on_worker_runtime,
             on_server_roundtrip_start=sent_pixvar.sent_time,
             on_server_roundtrip_end=time.time(),
         )
+        return pixfin
 
     def has_collected_all_sent(self) -> bool:
         """Has every pixel been collected?"""
@@ -286,13 +399,12 @@ class Collector:
         if self.n_sent != len(self._pixfinid_received_quick_lookup):
             return False
         # now, sanity check contents, slower: O(n)
-        sent_ids = set((p.nside, p.pixel_id, p.posvar_id) for p in self.sent_pixvars)
-        if sent_ids == self._pixfinid_received_quick_lookup:
+        if self._sent_pixvars.keys() == self._pixfinid_received_quick_lookup:
             LOGGER.info("Collected all sent")
             return True
         raise RuntimeError(
             f"Sanity check failed: Collected enough pixels,"
-            f" but does not match: {sent_ids=} vs {self._pixfinid_received_quick_lookup=}"
+            f" but does not match: {set(self._sent_pixvars)=} vs {self._pixfinid_received_quick_lookup=}"
         )
 
     def get_max_nside_thresholded(self) -> Optional[int]:
@@ -304,39 +416,12 @@ class Collector:
         if not self.nsides_dict:  # nothing has been saved yet
             return None
 
-        # recalculate nsides' percentage done
-        updated_percents = {}
-        for nside, spv in self._sent_pixvars_by_nside.items():
-            finished = len(self.nsides_dict.get(nside, [])) * self._finder.n_posvar
-            updated_percents[nside] = finished / len(spv)
-
-        def bin_it(nside: int, percent: float) -> float:
-            # find the threshold bin (floor) for the nside (0.0 if too low)
-            prev_bin = 0.0
-            for tbin in self._nsides_thresholds[nside]:
-                if percent < tbin:
-                    return prev_bin
-                prev_bin = tbin
-            return self._nsides_thresholds[nside][-1]  # it's the last bin
-
-        def reached_new_threshold(nside: int, percent: float) -> bool:
-            # did percentage reached new threshold?
-            old_bin = bin_it(nside, self._nsides_percents_done.get(nside, 0.0))
-            return bin_it(nside, percent) > old_bin
-
-        newly_thresholded_nsides = [
-            nside
-            for nside, percent in updated_percents.items()
-            if reached_new_threshold(nside, percent)
-        ]
-        LOGGER.debug(f"Old percents done: {self._nsides_percents_done}")
-        LOGGER.debug(f"New percents done: {updated_percents}")
-        LOGGER.debug(f"Newly thresholded nsides: {newly_thresholded_nsides}")
-        self._nsides_percents_done = updated_percents
-
+        newly_thresholded_nsides = self._progress.pop_newly_thresholded(
+            self.nsides_dict
+        )
         if not newly_thresholded_nsides:
             return None
         LOGGER.info(
-            f"Met thresholds: {newly_thresholded_nsides} ({self._nsides_percents_done})"
+            f"Met thresholds: {newly_thresholded_nsides} ({self._progress.percents_done})"
         )
         return max(newly_thresholded_nsides)
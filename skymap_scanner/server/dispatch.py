@@ -0,0 +1,377 @@
+"""Tools for dispatching pixel variations to clients."""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+import mqclient as mq
+from icecube import icetray  # type: ignore[import-not-found]
+
+from . import SERVER_ENV
+from .collector import Collector
+from .reporter import WorkerStatsCollection
+from ..utils import messages
+from ..utils.pixel_classes import PTuple, SentPixelVariation, pframe_tuple
+
+LOGGER = logging.getLogger(__name__)
+
+
+# how often (at most) to recalculate an auto-sized window
+AUTO_WINDOW_UPDATE_INTERVAL_SEC = 10
+
+# how often to look for stragglers
+STRAGGLER_CHECK_INTERVAL_SEC = 10
+# the min # of round trips needed before the stats are used to find stragglers
+STRAGGLER_MIN_ROUNDTRIPS = 10
+
+# how often to look for overdue pixel variations
+DEADLINE_CHECK_INTERVAL_SEC = 10
+
+# the max number of pixels bundled into one message
+BUNDLE_MAX_PIXELS = 100
+
+
+def calc_auto_window(
+    worker_stats_collection: WorkerStatsCollection,
+    headroom: float,
+) -> Optional[int]:
+    """Estimate the number of in-flight pixel variations to keep workers busy.
+
+    By Little's law, in-flight = throughput * time-in-flight. The time
+    used is a reco's (mean) runtime plus the transport overhead, estimated
+    from the fastest round trip -- not the mean round trip, since that
+    includes time spent queued, which would grow the window without bound.
+
+    Return `None` if there are not enough stats yet.
+    """
+    if not worker_stats_collection.total_ct:
+        return None
+    sec_per_reco = worker_stats_collection.on_server_recent_sec_per_reco_rate()
+    if sec_per_reco <= 0:
+        return None
+
+    stats = worker_stats_collection.aggregate
+    overhead = max(0.0, stats.fastest_roundtrip() - stats.fastest_worker())
+    in_flight = (stats.mean_worker() + overhead) / sec_per_reco
+    return math.ceil(headroom * in_flight)
+
+
+def calc_n_busy_workers(
+    worker_stats_collection: WorkerStatsCollection,
+) -> Optional[float]:
+    """Estimate the number of workers currently reco'ing.
+
+    By Little's law, this is the throughput times a reco's (mean) runtime.
+    Return `None` if there are not enough stats yet.
+    """
+    if not worker_stats_collection.total_ct:
+        return None
+    sec_per_reco = worker_stats_collection.on_server_recent_sec_per_reco_rate()
+    if sec_per_reco <= 0:
+        return None
+    return worker_stats_collection.aggregate.mean_worker() / sec_per_reco
+
+
+def calc_bundle_size(
+    sec_per_pixel: Optional[float],
+    n_pixels_left: int,
+    n_busy_workers: Optional[float],
+    target_sec: float,
+) -> int:
+    """Get the number of pixels to bundle into one message, so it takes
+    about `target_sec` to reco.
+
+    Near the end of a round, bundles shrink (down to single pixels) so
+    every worker still gets one -- otherwise, a few workers would be
+    left with all the remaining pixels. Return 1 if the runtimes are
+    unknown.
+    """
+    if not sec_per_pixel or not n_busy_workers:
+        return 1
+    size = min(
+        int(target_sec // sec_per_pixel),
+        int(n_pixels_left // max(n_busy_workers, 1.0)),
+        BUNDLE_MAX_PIXELS,
+    )
+    return max(1, size)
+
+
+def calc_straggler_timeout(
+    worker_stats_collection: WorkerStatsCollection,
+    nside: int,
+    rtt_multiple: float,
+) -> Optional[float]:
+    """Get how long (sec) a pixel variation can be in flight before it's a straggler.
+
+    Use the nside's round-trip times if there are enough, otherwise all
+    nsides'. Return `None` if there are not enough stats yet.
+    """
+    stats = worker_stats_collection.get_nside_worker_stats(nside)
+    if not stats or stats.count < STRAGGLER_MIN_ROUNDTRIPS:
+        if worker_stats_collection.total_ct < STRAGGLER_MIN_ROUNDTRIPS:
+            return None
+        stats = worker_stats_collection.aggregate
+    return rtt_multiple * stats.median_roundtrip()
+
+
+def calc_priority(pframes: List[icetray.I3Frame], nsides: List[int]) -> int:
+    """Get the priority to submit the pixel variations with (see `Dispatcher.submit()`).
+
+    This is the index of their finest nside in `nsides` (the nside
+    progression) -- finer pixels are refinements, so they're more important.
+    """
+    return max(nsides.index(pframe_tuple(pframe)[0]) for pframe in pframes)
+
+
+class Dispatcher:
+    """Send pixel variations to clients, with a bounded number in flight.
+
+    Submitted pixel variations are registered with the collector right
+    away, then wait on the server until there is room in the window.
+    Waiting pixel variations are sent highest priority first (then
+    first-come, first-served). Pixel variations submitted together are
+    sent in one message.
+
+    In-flight pixel variations that take too long (stragglers) can be
+    re-sent (see `run_straggler_checks()`), as can ones that failed or
+    are overdue (see `retry()`); these go ahead of everything else, and
+    don't take up more room in the window.
+    """
+
+    def __init__(
+        self,
+        to_clients_queue: mq.Queue,
+        collector: Collector,
+        worker_stats_collection: WorkerStatsCollection,
+        reco_algo: str,
+        realtime_format_version: str,
+    ) -> None:
+        """
+        Environment Variables:
+            `SKYSCAN_DISPATCH_MAX_IN_FLIGHT`
+                - the window size (0 -> unbounded)
+            `SKYSCAN_DISPATCH_AUTO_WINDOW`
+                - whether to auto-size the window (then, the above is the minimum)
+            `SKYSCAN_DISPATCH_AUTO_WINDOW_HEADROOM`
+                - the multiple of the auto-sized window's estimate
+            `SKYSCAN_STRAGGLER_RTT_MULTIPLE`
+                - re-send stragglers out this multiple of the median round-trip time
+            `SKYSCAN_STRAGGLER_MAX_RESENDS`
+                - the max number of times to re-send a straggler
+            `SKYSCAN_RETRY_BUDGET`
+                - the max number of times to re-send a failed/overdue pixel variation
+            `SKYSCAN_RETRY_DEADLINE_SEC`
+                - how long a pixel variation can be in flight before it's overdue
+            `SKYSCAN_MERGE_POSVARS_BEST_ONLY`
+                - whether a multi-variation message asks for only the best of each pixel
+        """
+        self.to_clients_queue = to_clients_queue
+        self.collector = collector
+        self.worker_stats_collection = worker_stats_collection
+        self.reco_algo = reco_algo
+        self.realtime_format_version = realtime_format_version
+
+        # heap of (-priority, submission order, pframes)
+        self._waiting: List[Tuple[int, int, List[icetray.I3Frame]]] = []
+        self._counter = itertools.count()
+        self._in_flight: Dict[PTuple, float] = {}  # id -> time last sent
+        self._wakeup = asyncio.Event()
+
+        # for re-sending stragglers & retrying
+        self._keep_pframes = bool(
+            SERVER_ENV.SKYSCAN_STRAGGLER_RTT_MULTIPLE or SERVER_ENV.SKYSCAN_RETRY_BUDGET
+        )
+        self._pframes: Dict[PTuple, icetray.I3Frame] = {}  # only if needed
+        self._n_resends: Dict[PTuple, int] = {}
+        self._n_retries: Dict[PTuple, int] = {}
+        self._to_resend: Deque[PTuple] = deque()
+
+        self._window = SERVER_ENV.SKYSCAN_DISPATCH_MAX_IN_FLIGHT or None
+        self._last_window_update = 0.0
+
+    @property
+    def n_waiting(self) -> int:
+        """The number of pixel variations waiting to be sent."""
+        return sum(len(w[2]) for w in self._waiting)
+
+    @property
+    def n_in_flight(self) -> int:
+        """The number of pixel variations sent but not yet returned."""
+        return len(self._in_flight)
+
+    def submit(self, pframes: List[icetray.I3Frame], priority: int) -> None:
+        """Register the pixel variations and queue them to be sent (in one message).
+
+        `priority` is the same for every sender (rounds & refinements):
+        the index of the pixel variations' finest nside in the nside
+        progression (see `calc_priority()`). Ties are sent in submission
+        order.
+        """
+        for pframe in pframes:
+            self.collector.register_sent_pixvar(SentPixelVariation.from_pframe(pframe))
+        heapq.heappush(self._waiting, (-priority, next(self._counter), pframes))
+        self._wakeup.set()
+
+    def mark_returned(self, id_tuple: PTuple) -> None:
+        """Free up the pixel variation's spot in the window."""
+        if id_tuple in self._in_flight:
+            del self._in_flight[id_tuple]
+            self._pframes.pop(id_tuple, None)
+            self._n_resends.pop(id_tuple, None)
+            self._n_retries.pop(id_tuple, None)
+            self._wakeup.set()
+
+    def is_in_flight(self, id_tuple: PTuple) -> bool:
+        """Was the pixel variation sent, but has not yet returned?"""
+        return id_tuple in self._in_flight
+
+    def _queue_resend(self, id_tuple: PTuple) -> None:
+        self.collector.expect_duplicates(id_tuple)
+        self._in_flight[id_tuple] = time.time()  # don't re-find it while queued
+        self._to_resend.append(id_tuple)
+        self._wakeup.set()
+
+    def retry(self, id_tuple: PTuple) -> bool:
+        """Queue the in-flight pixel variation to be re-sent, if it has
+        retries left (see `SKYSCAN_RETRY_BUDGET`).
+
+        Return whether it will be re-sent.
+        """
+        n_retries = self._n_retries.get(id_tuple, 0)
+        if id_tuple not in self._in_flight or n_retries >= SERVER_ENV.SKYSCAN_RETRY_BUDGET:
+            return False
+        self._n_retries[id_tuple] = n_retries + 1
+        LOGGER.info(f"Retrying {id_tuple} (retry #{n_retries + 1})...")
+        self._queue_resend(id_tuple)
+        return True
+
+    def _get_window(self) -> Optional[int]:
+        if not SERVER_ENV.SKYSCAN_DISPATCH_AUTO_WINDOW:
+            return self._window
+        if time.time() - self._last_window_update < AUTO_WINDOW_UPDATE_INTERVAL_SEC:
+            return self._window
+
+        self._last_window_update = time.time()
+        estimate = calc_auto_window(
+            self.worker_stats_collection,
+            SERVER_ENV.SKYSCAN_DISPATCH_AUTO_WINDOW_HEADROOM,
+        )
+        window = max(SERVER_ENV.SKYSCAN_DISPATCH_MAX_IN_FLIGHT, estimate or 0)
+        if window != self._window:
+            LOGGER.info(f"Dispatch window: {self._window} -> {window}")
+            self._window = window
+        return self._window
+
+    def _has_room(self) -> bool:
+        window = self._get_window()
+        return window is None or len(self._in_flight) < window
+
+    def _encode(self, pframes: List[icetray.I3Frame]) -> Dict[str, Any]:
+        if len(pframes) == 1:
+            return messages.encode_pframe_msg(
+                self.reco_algo,
+                self.realtime_format_version,
+                pframes[0],
+                SERVER_ENV.SKYSCAN_MQ_WIRE_VERSION,
+            )
+        return messages.encode_pframes_msg(
+            self.reco_algo,
+            self.realtime_format_version,
+            pframes,
+            SERVER_ENV.SKYSCAN_MQ_WIRE_VERSION,
+            best_only=SERVER_ENV.SKYSCAN_MERGE_POSVARS_BEST_ONLY,
+        )
+
+    async def run(self) -> None:
+        """Send waiting pixel variations whenever there's room, forever."""
+        async with self.to_clients_queue.open_pub() as pub:
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+
+                # re-sends first -- they're already in the window
+                while self._to_resend:
+                    id_tuple = self._to_resend.popleft()
+                    if id_tuple not in self._in_flight:  # returned in the meantime
+                        continue
+                    self._in_flight[id_tuple] = time.time()
+                    LOGGER.info(f"Re-sending {id_tuple}...")
+                    await pub.send(self._encode([self._pframes[id_tuple]]))
+
+                while self._waiting and self._has_room():
+                    _, i, pframes = heapq.heappop(self._waiting)
+                    id_tuples = [pframe_tuple(f) for f in pframes]
+                    # mark before sending, since its result could come back any time
+                    for id_tuple, pframe in zip(id_tuples, pframes):
+                        self._in_flight[id_tuple] = time.time()
+                        if self._keep_pframes:
+                            self._pframes[id_tuple] = pframe
+                        self.collector.restamp_sent_time(id_tuple)
+                    LOGGER.info(f"Sending message M#{i} {id_tuples}...")
+                    await pub.send(self._encode(pframes))
+                    LOGGER.debug(f"sent message M#{i} {id_tuples}")
+
+    def find_stragglers(self) -> List[PTuple]:
+        """Get the in-flight pixel variations that should be re-sent."""
+        now = time.time()
+        timeouts: Dict[int, Optional[float]] = {}  # by nside
+
+        stragglers = []
+        for id_tuple, sent_time in self._in_flight.items():
+            if self._n_resends.get(id_tuple, 0) >= SERVER_ENV.SKYSCAN_STRAGGLER_MAX_RESENDS:
+                continue
+            nside = id_tuple[0]
+            if nside not in timeouts:
+                timeouts[nside] = calc_straggler_timeout(
+                    self.worker_stats_collection,
+                    nside,
+                    SERVER_ENV.SKYSCAN_STRAGGLER_RTT_MULTIPLE,
+                )
+            timeout = timeouts[nside]
+            if timeout is not None and now - sent_time > timeout:
+                stragglers.append(id_tuple)
+        return stragglers
+
+    async def run_straggler_checks(self) -> None:
+        """Periodically queue up stragglers to be re-sent, forever."""
+        while True:
+            await asyncio.sleep(STRAGGLER_CHECK_INTERVAL_SEC)
+            stragglers = self.find_stragglers()
+            if not stragglers:
+                continue
+            LOGGER.info(f"Found {len(stragglers)} straggler(s), re-sending...")
+            for id_tuple in stragglers:
+                self._n_resends[id_tuple] = self._n_resends.get(id_tuple, 0) + 1
+                self._queue_resend(id_tuple)
+
+    def find_overdue(self) -> List[PTuple]:
+        """Get the pixel variations in flight longer than `SKYSCAN_RETRY_DEADLINE_SEC`."""
+        now = time.time()
+        return [
+            id_tuple
+            for id_tuple, sent_time in self._in_flight.items()
+            if now - sent_time > SERVER_ENV.SKYSCAN_RETRY_DEADLINE_SEC
+        ]
+
+    async def run_deadline_checks(
+        self,
+        give_up: Callable[[PTuple], Awaitable[None]],
+    ) -> None:
+        """Periodically retry overdue pixel variations, forever.
+
+        Those without retries left are passed to `give_up()`.
+        """
+        while True:
+            await asyncio.sleep(DEADLINE_CHECK_INTERVAL_SEC)
+            for id_tuple in self.find_overdue():
+                if self.retry(id_tuple):
+                    LOGGER.warning(f"Pixel variation {id_tuple} is overdue, re-sent it")
+                else:
+                    LOGGER.error(f"Pixel variation {id_tuple} is overdue, giving up")
+                    self.collector.expect_duplicates(id_tuple)  # in case it shows up
+                    await give_up(id_tuple)
@@ -0,0 +1,144 @@
+"""Memoized HEALPix geometry (ring scheme) for pixel selection.
+
+Coarse nsides are fully tabulated on first use. Fine nsides are cached
+in blocks of consecutive pixels, only for the pixels actually touched,
+with a bounded LRU so memory stays limited.
+"""
+
+import functools
+import logging
+from collections import OrderedDict
+from typing import Callable, Tuple, Union
+
+import healpy  # type: ignore[import-untyped]
+import numpy
+
+LOGGER = logging.getLogger(__name__)
+
+
+# nsides with no more than this many pixels are fully tabulated (nside <= 128)
+FULL_TABLE_MAX_NPIX = 12 * 128**2
+# fine nsides are cached in blocks of consecutive (ring-scheme) pixels
+BLOCK_SIZE = 4096
+MAX_CACHED_BLOCKS = 128  # per table -- ~12MB for the unit vectors
+
+
+class _PixelTable:
+    """Memoized per-(nside, pixel) values, computed with `func(nside, pixels)`."""
+
+    def __init__(
+        self,
+        func: Callable[[int, numpy.ndarray], numpy.ndarray],
+        n_values: int,
+    ) -> None:
+        self.func = func
+        self.n_values = n_values
+        self._blocks: OrderedDict[Tuple[int, int], numpy.ndarray] = OrderedDict()
+        self._full_table = functools.lru_cache(maxsize=None)(self._make_full_table)
+
+    def _make_full_table(self, nside: int) -> numpy.ndarray:
+        LOGGER.debug(f"Tabulating {self.func.__name__} for all pixels of nside {nside}")
+        return self.func(nside, numpy.arange(healpy.nside2npix(nside)))
+
+    def _get_block(self, nside: int, block: int) -> numpy.ndarray:
+        key = (nside, block)
+        try:
+            self._blocks.move_to_end(key)
+            return self._blocks[key]
+        except KeyError:
+            pass
+        start = block * BLOCK_SIZE
+        pixels = numpy.arange(start, min(start + BLOCK_SIZE, healpy.nside2npix(nside)))
+        values = numpy.zeros((self.n_values, BLOCK_SIZE))
+        values[:, : len(pixels)] = self.func(nside, pixels)
+        self._blocks[key] = values
+        if len(self._blocks) > MAX_CACHED_BLOCKS:
+            self._blocks.popitem(last=False)  # least recently used
+        return values
+
+    def get(self, nside: int, pixels: Union[int, numpy.ndarray]) -> numpy.ndarray:
+        """Get the values for `pixels`, shape: `(n_values,) + pixels.shape`."""
+        pixels = numpy.asarray(pixels, dtype=numpy.int64)
+        if healpy.nside2npix(nside) <= FULL_TABLE_MAX_NPIX:
+            return self._full_table(nside)[:, pixels]  # type: ignore[no-any-return]
+
+        blocks, offsets = numpy.divmod(pixels, BLOCK_SIZE)
+        unique_blocks, inverse = numpy.unique(blocks, return_inverse=True)
+        tables = numpy.stack([self._get_block(nside, int(b)) for b in unique_blocks])
+        values = tables[inverse.reshape(pixels.shape), :, offsets]  # -> pixels.shape + (n_values,)
+        return numpy.moveaxis(values, -1, 0)
+
+    def clear(self) -> None:
+        """Clear all the cached values."""
+        self._blocks.clear()
+        self._full_table.cache_clear()
+
+
+def _pix2vec(nside: int, pixels: numpy.ndarray) -> numpy.ndarray:
+    return numpy.array(healpy.pix2vec(nside, pixels))
+
+
+def _pix2ang(nside: int, pixels: numpy.ndarray) -> numpy.ndarray:
+    return numpy.array(healpy.pix2ang(nside, pixels))
+
+
+_VECTORS = _PixelTable(_pix2vec, 3)
+_ANGLES = _PixelTable(_pix2ang, 2)
+
+
+def pix2vec(nside: int, pixels: Union[int, numpy.ndarray]) -> numpy.ndarray:
+    """Memoized `healpy.pix2vec()` -- returns a `(3,) + pixels.shape` array
+    (`(3,)` for a single pixel)."""
+    return _VECTORS.get(nside, pixels)
+
+
+def pix2ang(nside: int, pixels: Union[int, numpy.ndarray]) -> numpy.ndarray:
+    """Memoized `healpy.pix2ang()` -- returns a `(2,) + pixels.shape` array
+    (`(2,)` for a single pixel)."""
+    return _ANGLES.get(nside, pixels)
+
+
+@functools.lru_cache(maxsize=None)
+def pixel_area(nside: int) -> float:
+    """Memoized `healpy.nside2pixarea()`."""
+    return healpy.nside2pixarea(nside)  # type: ignore[no-any-return]
+
+
+@functools.lru_cache(maxsize=32)
+def _sub_pixels_table(from_nside: int, n_doublings: int) -> numpy.ndarray:
+    LOGGER.debug(f"Tabulating sub-pixels of nside {from_nside} ({n_doublings} doublings)")
+    return _calc_sub_pixels(
+        from_nside, n_doublings, numpy.arange(healpy.nside2npix(from_nside))
+    )
+
+
+def _calc_sub_pixels(
+    from_nside: int, n_doublings: int, pixels: numpy.ndarray
+) -> numpy.ndarray:
+    pix_nested = healpy.ring2nest(from_nside, pixels)
+    sub_pixels_nested = (pix_nested[:, numpy.newaxis] << (2 * n_doublings)) + numpy.arange(
+        4**n_doublings, dtype=numpy.int64
+    )
+    return healpy.nest2ring(  # type: ignore[no-any-return]
+        from_nside << n_doublings, sub_pixels_nested
+    )
+
+
+def sub_pixels(from_nside: int, n_doublings: int, pixels: numpy.ndarray) -> numpy.ndarray:
+    """Get the sub-pixels of each of the `pixels` after `n_doublings` nside doublings.
+
+    Returns a `(len(pixels), 4**n_doublings)` array. The parent->children
+    map is fully tabulated if it is small enough.
+    """
+    pixels = numpy.asarray(pixels, dtype=numpy.int64).reshape(-1)
+    if healpy.nside2npix(from_nside) * 4**n_doublings <= FULL_TABLE_MAX_NPIX:
+        return _sub_pixels_table(from_nside, n_doublings)[pixels]  # type: ignore[no-any-return]
+    return _calc_sub_pixels(from_nside, n_doublings, pixels)
+
+
+def clear() -> None:
+    """Clear all the memoized geometry."""
+    _VECTORS.clear()
+    _ANGLES.clear()
+    pixel_area.cache_clear()
+    _sub_pixels_table.cache_clear()
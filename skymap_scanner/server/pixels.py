@@ -4,92 +4,137 @@
 # pylint: skip-file
 
 import logging
-from typing import List, Optional, Set, Tuple
+import random
+from typing import Container, Dict, Iterable, List, Optional, Set, Tuple
 
 import healpy  # type: ignore[import-untyped]
 import numpy
 from icecube import icetray  # type: ignore[import-not-found]
 
-from ..utils.pixel_classes import NSidesDict
+from .. import config as cfg
+from ..utils.pixel_classes import NSidesDict, RecoPixelFinalStore
+from . import pixel_geometry
 from .utils import NSideProgression
 
 LOGGER = logging.getLogger(__name__)
 
 
-def __healpix_pixel_upgrade(nside, pix) -> list:
-    pix_nested = healpy.ring2nest(nside, pix)
-    pix_upgraded = (pix_nested << 2)
-    sub_pixels = [pix_upgraded, pix_upgraded+1, pix_upgraded+2, pix_upgraded+3]
-    return healpy.nest2ring(nside*2, sub_pixels)
+LLH_DIFF_TO_TRIGGER_REFINEMENT = 200000
 
 
-def healpix_pixel_upgrade(from_nside, to_nside, pix) -> list:
+def healpix_pixels_upgrade(from_nside, to_nside, pixels) -> numpy.ndarray:
+    """Get the sub-pixels (at `to_nside`) of each of the `pixels` (at `from_nside`).
+
+    All pixels are upgraded at once, using the nested-scheme indexing:
+    the sub-pixels of nested pixel `p` (after `k` nside doublings) are
+    `(p << 2k) + [0, 4^k)` (see `pixel_geometry.sub_pixels()`). The
+    sub-pixels are grouped by parent pixel, in the order of `pixels`.
+    """
     if to_nside < from_nside:
         raise RuntimeError("to_nside needs to be greater than from_nside")
+
+    n_doublings = 0
+    while (from_nside << n_doublings) < to_nside:
+        n_doublings += 1
+    if (from_nside << n_doublings) != to_nside:
+        raise RuntimeError("invalid to_nside")
+
+    pixels = numpy.asarray(pixels, dtype=numpy.int64).reshape(-1)
+    if n_doublings == 0:
+        return pixels
+
+    return pixel_geometry.sub_pixels(from_nside, n_doublings, pixels).reshape(-1)
+
+
+def healpix_pixel_upgrade(from_nside, to_nside, pix) -> list:
     if to_nside==from_nside:
         return [pix]
+    return healpix_pixels_upgrade(from_nside, to_nside, [pix]).tolist()
 
-    current_nside = from_nside
-    pixels = [pix]
 
-    while True:
-        new_pixels = []
-        for p in pixels:
-            new_pixels.extend( __healpix_pixel_upgrade(current_nside, p) )
+def _pixels_in_disc_sorted(nside, vec, radius) -> numpy.ndarray:
+    """Get the pixels whose centers are within `radius` of `vec`, sorted by distance.
 
-        pixels = new_pixels
-        current_nside = current_nside*2
-        if current_nside==to_nside:
-            return pixels
-        if current_nside > to_nside:
-            raise RuntimeError("invalid to_nside")
+    Only the pixels overlapping the disc are considered as candidates
+    (not every pixel on the sky).
+    """
+    x0,y0,z0 = vec
+
+    # candidates: every pixel touching the disc (a superset of the pixels whose center is in it)
+    candidates = numpy.sort(healpy.query_disc(nside, vec, radius, inclusive=True))
+
+    x1,y1,z1 = pixel_geometry.pix2vec(nside, candidates)
+    cos_space_angle = numpy.clip(x0*x1 + y0*y1 + z0*z1, -1., 1.)
+    space_angle = numpy.arccos(cos_space_angle)
+    in_disc = numpy.where(space_angle < radius)[0]
+    pixels = candidates[in_disc]
+    pixel_space_angles = space_angle[in_disc]
+    # pixels, sorted by distance from the requested pixel
+    return pixels[numpy.argsort(pixel_space_angles)]
 
 
 # TODO: maybe use healpy to find neighboring pixels and scan all 8 neighbors+the current pixel
 def find_pixels_around_pixel(request_nside, pix_nside, pix, num=10) -> list:
-    pixel_area = healpy.nside2pixarea(request_nside)
+    pixel_area = pixel_geometry.pixel_area(request_nside)
     area_for_requested_pixels = pixel_area*float(num)
     radius_around = numpy.sqrt(area_for_requested_pixels/numpy.pi)
 
-    x0,y0,z0 = healpy.pix2vec(pix_nside, pix)
-
-    x1,y1,z1 = healpy.pix2vec(request_nside, numpy.asarray(list(range(healpy.nside2npix(request_nside)))))
-    cos_space_angle = numpy.clip(x0*x1 + y0*y1 + z0*z1, -1., 1.)
-    space_angle = numpy.arccos(cos_space_angle)
-    pixels = numpy.where(space_angle < radius_around)[0]
-    pixel_space_angles = space_angle[pixels]
-    # pixels, sorted by distance from the requested pixel
-    return pixels[numpy.argsort(pixel_space_angles)].tolist()
+    return _pixels_in_disc_sorted(
+        request_nside,
+        pixel_geometry.pix2vec(pix_nside, pix),
+        radius_around,
+    ).tolist()
 
 
 def pixel_dist(from_nside, from_pix, to_nside, to_pix):
-    x0,y0,z0 = healpy.pix2vec(from_nside, from_pix)
-    x1,y1,z1 = healpy.pix2vec(to_nside, to_pix)
+    x0,y0,z0 = pixel_geometry.pix2vec(from_nside, from_pix)
+    x1,y1,z1 = pixel_geometry.pix2vec(to_nside, to_pix)
     cos_space_angle = numpy.clip(x0*x1 + y0*y1 + z0*z1, -1., 1.)
     space_angle = numpy.arccos(cos_space_angle)
     return space_angle
 
 
+def find_best_pixels(nsides_dict: NSidesDict, k: int) -> List[Tuple[int, int]]:
+    """Get the `(nside, pixel_id)` of the `k` lowest (non-NaN) llh pixels, best first."""
+    if isinstance(nsides_dict, NSidesDict):
+        return nsides_dict.get_best_pixels(k)
+
+    # plain dicts: full scan
+    candidates = [
+        (pixels_dict[p].llh, i, j, nside, p)
+        for i, (nside, pixels_dict) in enumerate(nsides_dict.items())
+        for j, p in enumerate(pixels_dict.keys())
+    ]
+    candidates = [c for c in candidates if not numpy.isnan(c[0])]
+    return [(c[3], c[4]) for c in sorted(candidates)[:k]]
+
+
 def find_global_min_pixel(nsides_dict: NSidesDict) -> Tuple[Optional[int], Optional[int]]:
-    global_min_pix_index: Tuple[Optional[int], Optional[int]] = (None, None)
-    min_llh = None
+    best = find_best_pixels(nsides_dict, 1)
+    if best:
+        return best[0]
 
-    for nside in list(nsides_dict.keys()):
-        pixels_dict = nsides_dict[nside]
-        for p in list(pixels_dict.keys()):
-            this_llh = pixels_dict[p].llh
-            if min_llh is None or ((not numpy.isnan(this_llh)) and (this_llh < min_llh)):
-                global_min_pix_index=(nside,p)
-                min_llh=this_llh
+    # all the pixels are nan (or there are none) -- use the first pixel
+    for nside, pixels_dict in nsides_dict.items():
+        for p in pixels_dict.keys():
+            return (nside, p)
+    return (None, None)
 
-    return global_min_pix_index
+
+def _get_pixel_ids_and_llhs(pixels_dict) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """Get an nside's pixel ids and their llh values, as arrays."""
+    if isinstance(pixels_dict, RecoPixelFinalStore):
+        return pixels_dict.array['pixel_id'].copy(), pixels_dict.array['llh'].copy()
+    pixel_ids = numpy.fromiter(pixels_dict.keys(), dtype=numpy.int64, count=len(pixels_dict))
+    pixel_llhs = numpy.fromiter((pixels_dict[p].llh for p in pixel_ids.tolist()), dtype=float, count=len(pixels_dict))
+    return pixel_ids, pixel_llhs
 
 
 def find_pixels_to_refine(
     nsides_dict: NSidesDict,
     nside: int,
     pixel_extension_number: int,
-    llh_diff_to_trigger_refinement: int = 200000,
+    llh_diff_to_trigger_refinement: int = LLH_DIFF_TO_TRIGGER_REFINEMENT,
 ) -> List[int]:
     if nside not in nsides_dict:
         return []
@@ -99,25 +144,25 @@ def find_pixels_to_refine(
     pixels_to_refine = set()
 
     # refine pixels that have neighbors with a high likelihood ratio
-    for pixel in list(pixels_dict.keys()):
-        pixel_llh = pixels_dict[pixel].llh
-        if numpy.isnan(pixel_llh):
-            continue # do not refine nan pixels
-        neighbors = healpy.get_all_neighbours(nside, pixel)
-
-        for neighbor in neighbors:
-            if neighbor==-1:
-                continue
-            if neighbor not in pixels_dict:
-                continue
-            neighbor_llh = pixels_dict[neighbor].llh
-
-            llh_diff = 2.*numpy.abs(pixel_llh-neighbor_llh) # Wilk's theorem
-            if llh_diff > llh_diff_to_trigger_refinement:
-                # difference greater than the llh threshold,
-                # add the pixel and its neighbor
-                pixels_to_refine.add(pixel)
-                pixels_to_refine.add(neighbor)
+    pixel_ids, pixel_llhs = _get_pixel_ids_and_llhs(pixels_dict)
+    if len(pixel_ids):
+        neighbors = healpy.get_all_neighbours(nside, pixel_ids)  # shape: (8, n_pixels)
+
+        # look up each neighbor's llh (if the neighbor has been reco'd)
+        order = numpy.argsort(pixel_ids)
+        sorted_ids = pixel_ids[order]
+        index = numpy.clip(numpy.searchsorted(sorted_ids, neighbors), 0, len(sorted_ids)-1)
+        is_known_neighbor = (neighbors != -1) & (sorted_ids[index] == neighbors)
+        neighbor_llhs = pixel_llhs[order][index]
+
+        with numpy.errstate(invalid='ignore'):
+            llh_diffs = 2.*numpy.abs(pixel_llhs[numpy.newaxis, :]-neighbor_llhs) # Wilk's theorem
+            # difference greater than the llh threshold (do not refine nan pixels)
+            trigger = is_known_neighbor & (llh_diffs > llh_diff_to_trigger_refinement)
+
+        # add the pixel and its neighbor
+        pixels_to_refine.update(pixel_ids[trigger.any(axis=0)].tolist())
+        pixels_to_refine.update(neighbors[trigger].tolist())
 
     # refine the global minimum
     global_min_pix_nside, global_min_pix_index = find_global_min_pixel(nsides_dict)
@@ -128,6 +173,100 @@ def find_pixels_to_refine(
     return [x for x in pixels_to_refine]
 
 
+class DataflowRefiner:
+    """Incrementally choose pixels to refine, one finished pixel at a time.
+
+    This is the event-driven counterpart of `choose_pixels_to_reconstruct()`,
+    applying the same rules, but only to the finished pixel's neighborhood:
+
+        - a pixel and a (finished) neighbor are refined if their llh
+          differ enough -- checked once, when the later of the two finishes
+        - the region around the global minimum is refined at each nside,
+          once the minimum's (sent) neighbors are all finished
+
+    Pixels already sent are not filtered out.
+    """
+
+    def __init__(
+        self,
+        nsides_dict: NSidesDict,
+        nside_progression: NSideProgression,
+        sent_pixels: Container[Tuple[int, int]],
+        llh_diff_to_trigger_refinement: int = LLH_DIFF_TO_TRIGGER_REFINEMENT,
+    ) -> None:
+        self.nsides_dict = nsides_dict
+        self.nside_progression = nside_progression
+        self.sent_pixels = sent_pixels
+        self.llh_diff_to_trigger_refinement = llh_diff_to_trigger_refinement
+
+        # (global min nside, global min pixel, refined nside)
+        self._refined_around_min: Set[Tuple[int, int, int]] = set()
+
+    def _get_next(self, nside: int) -> Optional[Tuple[int, int]]:
+        """Get the next nside & its pixel extension number, if there is one."""
+        nsides = list(self.nside_progression.keys())
+        index = nsides.index(nside)
+        if index == len(nsides) - 1:
+            return None
+        return self.nside_progression.get_at_index(index+1)
+
+    def _upgrade(self, nside: int, pixels: Iterable[int]) -> Set[Tuple[int, int]]:
+        next_nside, _ = self._get_next(nside)  # type: ignore[misc]
+        return set(
+            (next_nside, x)
+            for x in healpix_pixels_upgrade(nside, next_nside, list(pixels)).tolist()
+        )
+
+    def _are_neighbors_finished(self, nside: int, pixel_id: int) -> bool:
+        pixels_dict = self.nsides_dict[nside]
+        return all(
+            n in pixels_dict or (nside, n) not in self.sent_pixels  # never sent -> don't wait
+            for n in healpy.get_all_neighbours(nside, pixel_id).tolist()
+            if n != -1
+        )
+
+    def _refine_by_neighbors(self, nside: int, pixel_id: int) -> Set[int]:
+        pixels_dict = self.nsides_dict[nside]
+        llh = pixels_dict[pixel_id].llh
+        if numpy.isnan(llh):  # do not refine nan pixels
+            return set()
+
+        to_refine = set()
+        for n in healpy.get_all_neighbours(nside, pixel_id).tolist():
+            if n == -1 or n not in pixels_dict:
+                continue
+            if 2.*abs(llh-pixels_dict[n].llh) > self.llh_diff_to_trigger_refinement:  # Wilk's theorem
+                to_refine.update([pixel_id, n])
+        return to_refine
+
+    def _refine_around_min(self) -> Set[Tuple[int, int]]:
+        min_nside, min_pixel = find_global_min_pixel(self.nsides_dict)
+        if min_pixel is None or not self._are_neighbors_finished(min_nside, min_pixel):  # type: ignore[arg-type]
+            return set()
+
+        to_refine: Set[Tuple[int, int]] = set()
+        for nside in self.nside_progression:
+            key = (min_nside, min_pixel, nside)
+            if key in self._refined_around_min or nside not in self.nsides_dict:
+                continue
+            if not (next_ := self._get_next(nside)):
+                continue
+            self._refined_around_min.add(key)  # type: ignore[arg-type]
+            LOGGER.debug(f"Refining nside {nside} around global min {(min_nside, min_pixel)}...")
+            to_refine.update(self._upgrade(
+                nside,
+                find_pixels_around_pixel(nside, min_nside, min_pixel, num=next_[1]),
+            ))
+        return to_refine
+
+    def on_pixel_finished(self, nside: int, pixel_id: int) -> Set[Tuple[int, int]]:
+        """Get the `(nside, pixel_id)` pixels to refine now that this pixel is finished."""
+        to_refine = self._refine_around_min()
+        if self._get_next(nside):
+            to_refine.update(self._upgrade(nside, self._refine_by_neighbors(nside, pixel_id)))
+        return to_refine
+
+
 def choose_pixels_to_reconstruct_around_coord(
     nsides_dict: NSidesDict,
     coord_ra_dec: Tuple[float, float],
@@ -139,27 +278,20 @@ def choose_pixels_to_reconstruct_around_coord(
     # pixel of central coordinate
     coord_pix = healpy.ang2pix(nside, numpy.pi/2.-dec, ra)
 
-    # coord pixel dir
-    x0,y0,z0 = healpy.pix2vec(nside, coord_pix)
-
-    # all possible pixels
-    x1,y1,z1 = healpy.pix2vec(nside, numpy.asarray(list(range(healpy.nside2npix(nside)))))
-
-    cos_space_angle = numpy.clip(x0*x1 + y0*y1 + z0*z1, -1., 1.)
-    space_angle = numpy.arccos(cos_space_angle)
-    pixels = numpy.where(space_angle < angular_dist)[0]
-    pixel_space_angles = space_angle[pixels]
-
-    # pixels, sorted by distance from the requested pixel
-    sorted_pixels = pixels[numpy.argsort(pixel_space_angles)].tolist()
+    # pixels around the coord pixel dir, sorted by distance from it
+    sorted_pixels = _pixels_in_disc_sorted(
+        nside,
+        pixel_geometry.pix2vec(nside, coord_pix),
+        angular_dist,
+    ).tolist()
 
     if not nsides_dict:
-        existing_pixels: List[int] = []
+        existing_pixels: Container[int] = set()
     else:
         if nside not in nsides_dict:
-            existing_pixels = []
+            existing_pixels = set()
         else:
-            existing_pixels = list(nsides_dict[nside].keys())
+            existing_pixels = nsides_dict[nside]  # O(1) lookups
 
     scan_pixels = []
 
@@ -225,16 +357,66 @@ def choose_pixels_to_reconstruct(
         )
         LOGGER.debug(f"Found {len(pixels_to_refine)} pixels to refine: {pixels_to_refine}...")
         if len(pixels_to_refine) > 0:
-            # have the list of pixels to refine - find their subdivisions
-            upgraded_pixels_to_refine: List[Tuple[icetray.I3Int, icetray.I3Int]] = []
-            for pixel in pixels_to_refine:
-                # upgrade to the next nside
-                upgraded_pixels_to_refine.extend(
-                    (next_nside, x) for x in healpix_pixel_upgrade(current_nside, next_nside, pixel)
-                )
+            # have the list of pixels to refine - find their subdivisions (upgrade to the next nside)
+            upgraded_pixels_to_refine: List[Tuple[icetray.I3Int, icetray.I3Int]] = [
+                (next_nside, x)
+                for x in healpix_pixels_upgrade(current_nside, next_nside, pixels_to_refine).tolist()
+            ]
             # update set
             LOGGER.debug(f"Extending list of pixels (nside={next_nside}) by {len(upgraded_pixels_to_refine)} ({upgraded_pixels_to_refine})...")
             all_pixels_to_refine.update(upgraded_pixels_to_refine)
 
     LOGGER.debug(f"Search Complete: Got {len(all_pixels_to_refine)} pixels to refine: {all_pixels_to_refine}.")
     return all_pixels_to_refine
+
+
+def _get_best_fit_vec(nsides_dict: NSidesDict, coord_ra_dec: Optional[Tuple[float, float]]) -> Optional[numpy.ndarray]:
+    """Get the direction of the current best fit (or else the given coordinate)."""
+    best = find_best_pixels(nsides_dict, 1)
+    if best:
+        nside, pix = best[0]
+        return pixel_geometry.pix2vec(nside, pix)
+    if coord_ra_dec:
+        ra, dec = coord_ra_dec
+        return healpy.ang2vec(numpy.pi/2.-dec, ra)
+    return None
+
+
+def order_pixels(
+    pixels: Iterable[Tuple[int, int]],
+    pixel_order: str,
+    nsides_dict: NSidesDict,
+    coord_ra_dec: Optional[Tuple[float, float]] = None,
+    runtimes_by_nside: Optional[Dict[int, float]] = None,
+) -> List[Tuple[int, int]]:
+    """Order the `(nside, pixel_id)` pixels to be served (see `cfg.PIXEL_ORDERS`).
+
+    The pixels are shuffled first, so ties are served in random order.
+    `runtimes_by_nside` holds the expected reco runtime for each nside;
+    nsides without one are assumed to take the longest.
+    """
+    pixels = sorted(pixels, key=lambda _: random.random())
+    if not pixels or pixel_order == cfg.PIXEL_ORDER_RANDOM:
+        return pixels
+
+    if pixel_order == cfg.PIXEL_ORDER_CLOSEST_TO_BEST_FIT:
+        best_fit_vec = _get_best_fit_vec(nsides_dict, coord_ra_dec)
+        if best_fit_vec is None:  # nothing to be close to yet
+            return pixels
+        nsides = numpy.array([p[0] for p in pixels])
+        pixel_ids = numpy.array([p[1] for p in pixels])
+        cos_space_angles = numpy.empty(len(pixels))
+        for nside in numpy.unique(nsides).tolist():
+            mask = nsides == nside
+            cos_space_angles[mask] = best_fit_vec @ pixel_geometry.pix2vec(nside, pixel_ids[mask])
+        order = numpy.argsort(-cos_space_angles, kind='stable')  # closest first
+        return [pixels[i] for i in order.tolist()]
+
+    if pixel_order == cfg.PIXEL_ORDER_LONGEST_RUNTIME_FIRST:
+        runtimes_by_nside = runtimes_by_nside or {}
+        return sorted(  # stable, so ties stay shuffled
+            pixels,
+            key=lambda p: -runtimes_by_nside.get(p[0], float('inf')),  # type: ignore[union-attr]
+        )
+
+    raise ValueError(f"Unknown pixel order: {pixel_order}")
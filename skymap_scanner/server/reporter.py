@@ -10,7 +10,7 @@ import math
 import statistics
 import time
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, Hashable, List, Optional, Union
 
 from rest_tools.client import RestClient
 from skyreader import EventMetadata, SkyScanResult
@@ -262,6 +262,17 @@ class WorkerStatsCollection:
         except KeyError:
             return 0
 
+    def get_nside_worker_stats(self, nside: int) -> Optional[WorkerStats]:
+        """Get the nside's `WorkerStats` (`None` if it has no recos)."""
+        return self._worker_stats_by_nside.get(nside)
+
+    def get_mean_worker_runtimes_by_nside(self) -> Dict[int, float]:
+        """Get the mean worker runtime for each nside (that has any recos)."""
+        return {
+            nside: worker_stats.mean_worker()
+            for nside, worker_stats in self._worker_stats_by_nside.items()
+        }
+
     @property
     def total_ct(self) -> int:
         """Get the total count of all work units (recos)."""
@@ -396,6 +407,12 @@ class Reporter:
         self.output_dir = output_dir
         self.event_metadata = event_metadata
 
+        self._result_builder = to_skyscan_result.IncrementalResultBuilder(
+            event_metadata
+        )
+        self._last_sent_result: Optional[SkyScanResult] = None
+        self._last_sent_result_signature: Optional[Hashable] = None
+
         # all set by calling initial_report()
         self.last_time_reported = 0.0
         self.last_time_reported_skymap = 0.0
@@ -501,10 +518,9 @@ class Reporter:
 
     def _get_result(self) -> SkyScanResult:
         """Get SkyScanResult."""
-        return to_skyscan_result.from_nsides_dict(
+        return self._result_builder.build(
             self.nsides_dict,
             self.is_event_scan_done,
-            self.event_metadata,
         )
 
     def predicted_total_recos(self) -> int:
@@ -760,7 +776,21 @@ class Reporter:
             LOGGER.info(f"Manifest File (scan progress + metadata): {fpath}")
 
     async def _send_result(self) -> SkyScanResult:
-        """Send result to SkyDriver (if the connection is established)."""
+        """Send result to SkyDriver (if the connection is established).
+
+        If nothing changed since the last result was sent, nothing is sent.
+        """
+        signature = self._result_builder.signature(
+            self.nsides_dict, self.is_event_scan_done
+        )
+        if (
+            self._last_sent_result is not None
+            and signature is not None
+            and signature == self._last_sent_result_signature
+        ):
+            LOGGER.info("Result has not changed since last sent -- not resending")
+            return self._last_sent_result
+
         result = self._get_result()
         serialized = result.serialize()
 
@@ -786,4 +816,6 @@ class Reporter:
             json_fpath = result.to_json(self.event_metadata, self.output_dir)
             LOGGER.info(f"Result Files: {npz_fpath}, {json_fpath}")
 
+        self._last_sent_result = result
+        self._last_sent_result_signature = signature
         return result
@@ -4,13 +4,23 @@
 
 import argparse
 import asyncio
+import itertools
 import json
 import logging
-import random
 import threading
 import time
 from pathlib import Path
-from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from typing import (
+    AbstractSet,
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
 import healpy  # type: ignore[import-untyped]
 import mqclient as mq
@@ -24,10 +34,16 @@ from icecube import (  # type: ignore[import-not-found]
 from skyreader import EventMetadata
 from wipac_dev_tools import argparse_tools, logging_tools
 
-from . import SERVER_ENV
+from . import SERVER_ENV, pixel_geometry
 from .collector import Collector, ExtraRecoPixelVariationException
-from .pixels import choose_pixels_to_reconstruct
-from .reporter import Reporter
+from .dispatch import (
+    Dispatcher,
+    calc_bundle_size,
+    calc_n_busy_workers,
+    calc_priority,
+)
+from .pixels import DataflowRefiner, choose_pixels_to_reconstruct, order_pixels
+from .reporter import Reporter, WorkerStatsCollection
 from .utils import (
     NSideProgression,
     calc_estimated_total_nside_recos,
@@ -40,11 +56,11 @@ from .utils import (
 from .. import config as cfg, recos
 from ..recos import RecoInterface, set_pointing_ra_dec
 from ..utils import extract_json_message, messages
-from ..utils.load_scan_state import get_baseline_gcd_frames
+from ..utils.load_scan_state import get_baseline_omgeo
 from ..utils.pixel_classes import (
     NSidesDict,
+    PTuple,
     RecoPixelVariation,
-    SentPixelVariation,
     pframe_tuple,
 )
 
@@ -70,6 +86,7 @@ class PixelsToReco:
         reco_algo: str,
         event_metadata: EventMetadata,
         realtime_format_version: str,
+        pixel_order: str = cfg.PIXEL_ORDER_RANDOM,
     ) -> None:
         """
         Arguments:
@@ -91,8 +108,11 @@ class PixelsToReco:
                 - a collection of metadata about the event
             `realtime_format_version`
                 - the realtime format version that determines how keys are named in the frame
+            `pixel_order`
+                - the order in which each round's pixels are served (see `cfg.PIXEL_ORDERS`)
         """
         self.nsides_dict = nsides_dict
+        self.pixel_order = pixel_order
         self.input_pos_name = input_pos_name
         self.input_time_name = input_time_name
         self.output_particle_name = output_particle_name
@@ -108,7 +128,6 @@ class PixelsToReco:
 
         # Validate & read GCDQp_packet
         p_frame = GCDQp_packet[-1]
-        g_frame = get_baseline_gcd_frames(baseline_GCD, GCDQp_packet)[0]
 
         if p_frame.Stop != icetray.I3Frame.Stream('p'):
             raise RuntimeError("Last frame of the GCDQp packet is not type 'p'.")
@@ -129,43 +148,83 @@ class PixelsToReco:
         self.pulseseries_hlc = dataclasses.I3RecoPulseSeriesMap.from_frame(
             p_frame, self.reco.get_input_pulses(realtime_format_version)+'HLC')
 
-        self.omgeo = g_frame["I3Geometry"].omgeo
+        self.omgeo = get_baseline_omgeo(baseline_GCD, GCDQp_packet)
+
+        # used for refining vertex times -- computed once here instead of per seed
+        self.hlc_dom_positions, self.hlc_dom_times = self.get_hlc_dom_arrays(
+            self.pulseseries_hlc, self.omgeo)
 
         self.pointing_ra_dec = set_pointing_ra_dec(self.reco.pointing_dir_name, p_frame)
 
 
     @staticmethod
-    def refine_vertex_time(vertex, time, direction, pulses, omgeo):
+    def get_hlc_dom_arrays(pulses, omgeo) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """Get the hit DOMs' positions, shape (N,3), and first-pulse times, shape (N,)."""
+        positions = numpy.empty((len(pulses), 3))
+        times = numpy.empty(len(pulses))
+        for i, om in enumerate(pulses.keys()):
+            pos = omgeo[om].position
+            positions[i] = (pos.x, pos.y, pos.z)
+            times[i] = pulses[om][0].time
+        return positions, times
+
+    @staticmethod
+    def refine_vertex_times(vertices, times, directions, dom_positions, dom_times) -> numpy.ndarray:
+        """Refine the vertex time of many seeds at once (see `refine_vertex_time()`).
+
+        `vertices` and `directions` have shape (M,3), `times` has shape (M,),
+        `dom_positions` has shape (N,3), and `dom_times` has shape (N,).
+        """
         thc = dataclasses.I3Constants.theta_cherenkov
         ccc = dataclasses.I3Constants.c
-        min_d = numpy.inf
-        min_t = time
-        adj_d = 0
-        for om in pulses.keys():
-            rvec = omgeo[om].position-vertex
-            _l = -rvec*direction
-            _d = numpy.sqrt(rvec.mag2-_l**2) # closest approach distance
-            if _d < min_d: # closest om
-                min_d = _d
-                min_t = pulses[om][0].time
-                adj_d = _l+_d/numpy.tan(thc)-_d/(numpy.cos(thc)*numpy.sin(thc)) # translation distance
-        if numpy.isinf(min_d):
-            return time
-        return min_t + adj_d/ccc
-
-    def gen_new_pixel_pframes(
+        vertices = numpy.asarray(vertices, dtype=float).reshape(-1, 3)
+        directions = numpy.asarray(directions, dtype=float).reshape(-1, 3)
+        times = numpy.asarray(times, dtype=float).reshape(-1)
+        if not len(dom_times):
+            return times.copy()
+
+        rvec = dom_positions[numpy.newaxis, :, :] - vertices[:, numpy.newaxis, :]  # (M,N,3)
+        _l = -numpy.einsum("mnk,mk->mn", rvec, directions)
+        with numpy.errstate(invalid="ignore"):
+            _d = numpy.sqrt(numpy.einsum("mnk,mnk->mn", rvec, rvec) - _l**2)  # closest approach distance
+        _d[numpy.isnan(_d)] = numpy.inf  # rounding error -- never the closest om
+
+        rows = numpy.arange(len(vertices))
+        closest = numpy.argmin(_d, axis=1)  # closest om (first one, if tied)
+        min_d = _d[rows, closest]
+        min_l = _l[rows, closest]
+        with numpy.errstate(invalid="ignore"):
+            adj_d = min_l+min_d/numpy.tan(thc)-min_d/(numpy.cos(thc)*numpy.sin(thc)) # translation distance
+        return numpy.where(numpy.isinf(min_d), times, dom_times[closest] + adj_d/ccc)
+
+    @staticmethod
+    def refine_vertex_time(vertex, time, direction, dom_positions, dom_times) -> float:
+        """Get the vertex time shifted to match the first pulse of the DOM
+        closest to the track (see `get_hlc_dom_arrays()`)."""
+        return float(
+            PixelsToReco.refine_vertex_times(
+                [(vertex.x, vertex.y, vertex.z)],
+                [time],
+                [(direction.x, direction.y, direction.z)],
+                dom_positions,
+                dom_times,
+            )[0]
+        )
+
+    def get_new_pixels(
         self,
-        already_sent_pixvars: Set[SentPixelVariation],
+        already_sent_pixels: AbstractSet[Tuple[int, int]],
         nside_subprogression: NSideProgression,
-    ) -> Iterator[icetray.I3Frame]:
-        """Yield pixels (PFrames) to be reco'd for each `nside_available`."""
-
-        def pixel_already_sent(pixel: Tuple[icetray.I3Int, icetray.I3Int]) -> bool:
-            # Has this pixel already been sent? Ignore the position-variation id
-            for sent_pixvar in already_sent_pixvars:
-                if sent_pixvar.nside == pixel[0] and sent_pixvar.pixel_id == pixel[1]:
-                    return True
-            return False
+        runtimes_by_nside: Optional[Dict[int, float]] = None,
+    ) -> List[Tuple[int, int]]:
+        """Get the `(nside, pixel_id)` pixels to be reco'd for each `nside_available`.
+
+        `already_sent_pixels` holds the `(nside, pixel_id)` of every pixel
+        already sent (ignoring position-variation ids). Pixels are ordered
+        by `self.pixel_order`, which may use `runtimes_by_nside` (the
+        expected reco runtime for each nside). Use `gen_pframes_batch()`
+        to get their PFrames.
+        """
 
         # find pixels to refine
         LOGGER.info(f"Looking for refinements for {nside_subprogression}...")
@@ -178,50 +237,102 @@ class PixelsToReco:
         )
         LOGGER.info(f"Chose {len(pixels_to_refine)} pixels ({self.pos_variations=}).")
         #
-        pixels_to_refine = set(p for p in pixels_to_refine if not pixel_already_sent(p))
+        return self.get_pixels(pixels_to_refine, already_sent_pixels, runtimes_by_nside)
+
+    def get_pixels(
+        self,
+        pixels_to_refine: AbstractSet[Tuple[int, int]],
+        already_sent_pixels: AbstractSet[Tuple[int, int]],
+        runtimes_by_nside: Optional[Dict[int, float]] = None,
+    ) -> List[Tuple[int, int]]:
+        """Get the given `(nside, pixel_id)` pixels that are to be reco'd, in order.
+
+        See `get_new_pixels()`.
+        """
+        pixels_to_refine = set(p for p in pixels_to_refine if p not in already_sent_pixels)
         LOGGER.info(f"Filtered down to {len(pixels_to_refine)} pixels (others already sent).")
         #
         if not pixels_to_refine:
             LOGGER.info("There are no pixels to refine.")
-            return
+            return []
         LOGGER.debug(f"Got pixels to refine: {pixels_to_refine}")
 
-        # submit the pixels we need to submit (in random order)
-        for i, (nside, pix) in enumerate(sorted(pixels_to_refine, key=lambda _: random.random())):
-            LOGGER.debug(f"Generating pframe(s) from pixel P#{i}: {(nside, pix)}")
-            yield from self._gen_pframes(nside=nside, pixel=pix)
-
-    def i3particle(self, position, direction, energy, time):
-        # generate the particle from scratch
-        particle = dataclasses.I3Particle()
-        particle.shape = dataclasses.I3Particle.ParticleShape.InfiniteTrack
-        particle.fit_status = dataclasses.I3Particle.FitStatus.OK
-        particle.pos = position
-        particle.dir = direction
+        # submit the pixels we need to submit (in order of importance)
+        return order_pixels(
+            pixels_to_refine,
+            self.pixel_order,
+            self.nsides_dict,
+            coord_ra_dec=self.pointing_ra_dec,
+            runtimes_by_nside=runtimes_by_nside,
+        )
 
+    def i3particles(self, positions, direction, energies, times) -> List[dataclasses.I3Particle]:
+        """Generate seed particles (all with the same direction) from scratch."""
         if self.reco.refine_time:
             LOGGER.debug(f"Reco_algo is {self.reco.name}, refining time")
             # given direction and vertex position, calculate time from CAD
-            particle.time = self.refine_vertex_time(
-                position,
-                time,
-                direction,
-                self.pulseseries_hlc,
-                self.omgeo)
+            times = self.refine_vertex_times(
+                [(p.x, p.y, p.z) for p in positions],
+                times,
+                [(direction.x, direction.y, direction.z)] * len(positions),
+                self.hlc_dom_positions,
+                self.hlc_dom_times)
         else:
             LOGGER.debug(f"Reco_algo is {self.reco.name}, not refining time")
-            particle.time = time
 
-        particle.energy = energy
+        particles = []
+        for position, energy, vertex_time in zip(positions, energies, times):
+            particle = dataclasses.I3Particle()
+            particle.shape = dataclasses.I3Particle.ParticleShape.InfiniteTrack
+            particle.fit_status = dataclasses.I3Particle.FitStatus.OK
+            particle.pos = position
+            particle.dir = direction
+            particle.time = float(vertex_time)
+            particle.energy = energy
+            particles.append(particle)
+        return particles
 
-        return particle
+    def i3particle(self, position, direction, energy, time):
+        # generate the particle from scratch
+        return self.i3particles([position], direction, [energy], [time])[0]
 
-    def _gen_pframes(
+    def _get_coarser_pixels(
         self,
-        nside: icetray.I3Int,
-        pixel: icetray.I3Int,
+        nsides: numpy.ndarray,
+        thetas: numpy.ndarray,
+        phis: numpy.ndarray,
+    ) -> List[Optional[Tuple[int, int]]]:
+        """Get the first available (already reco'd) coarser pixel for each pixel.
+
+        Look up the first available coarser NSIDE by iteratively dividing
+        by two each pixel's nside. `None` means no coarser pixel is
+        available (probably we are just scanning finely around MC truth).
+        """
+        # NOTE (v3): this guesswork could be avoided using the NSIDE progression.
+        coarser: List[Optional[Tuple[int, int]]] = [None] * len(nsides)
+        unresolved = numpy.ones(len(nsides), dtype=bool)
+
+        # go from finest to coarsest, so each pixel finds its *first* available coarser nside
+        coarser_nside = int(nsides.max()) // 2 if len(nsides) else 0
+        while coarser_nside >= self.min_nside:
+            candidates = numpy.flatnonzero(unresolved & (nsides > coarser_nside))
+            # NOTE: This is the first nside in the divide-by-two progression that is available in the dictionary. By construction, this should be the previous value in the NSIDE progression.
+            if len(candidates) and coarser_nside in self.nsides_dict:
+                coarser_pixels = healpy.ang2pix(coarser_nside, thetas[candidates], phis[candidates])
+                nside_pixels = self.nsides_dict[coarser_nside]
+                for i, coarser_pixel in zip(candidates, coarser_pixels.tolist()):
+                    if coarser_pixel in nside_pixels:  # coarser pixel found
+                        coarser[i] = (coarser_nside, coarser_pixel)
+                        unresolved[i] = False
+            coarser_nside //= 2
+
+        return coarser
+
+    def gen_pframes_batch(
+        self,
+        pixels: Sequence[Tuple[int, int]],
     ) -> Iterator[icetray.I3Frame]:
-        """Yield PFrames to be reco'd for a given `nside` and `pixel`.
+        """Yield PFrames to be reco'd for each `(nside, pixel)` in `pixels`, in order.
 
         Each PFrame consists of an I3Particle to be used as seed by the reconstruction, plus some metadata.
 
@@ -230,82 +341,95 @@ class PixelsToReco:
         Multiple seed vertices (position variations) are generated according to a reco-specific set of vectors to be added to the base vertex (position).
 
         The base vertex is taken from the best-fit of the coarser pixel or, in absence of it (for example when scanning pixels of the minimum NSIDE), from a seed defined by the reco algorithm.
-        """
-
-        codec, ra = healpy.pix2ang(nside, pixel)
-        dec = numpy.pi/2 - codec
-        zenith, azimuth = astro.equa_to_dir(ra, dec, self.event_metadata.mjd)
-        zenith = float(zenith)
-        azimuth = float(azimuth)
-        direction = dataclasses.I3Direction(zenith, azimuth)
-
 
+        The directions and coarser-pixel lookups are computed in bulk
+        (array calls), before any PFrames are built.
+        """
+        if not pixels:
+            return
 
-        if nside == self.min_nside:
-            # Scanning the minimum NSIDE, the position is taken from a seed provided by reco-specific logic and passed as "fallback position".
-            position = self.fallback_position
-            time = self.fallback_time
-            energy = self.fallback_energy
-        else:
-            coarser_nside = nside
-            while True:
-                # Look up the first available coarser NSIDE by iteratively dividing by two the current nside.
-                # NOTE (v3): this guesswork could be avoided using the NSIDE progression.
-                coarser_nside = coarser_nside//2
-                if coarser_nside < self.min_nside:
-                    # no coarser pixel is available (probably we are just scanning finely around MC truth)
-                    # NOTE (v3): nside != min_side and nside/2 < min_side should be always false? Given the comment above this could have been introduced to support "pointed" scans but this is not currently possible in v3.
-                    break
-                coarser_pixel = healpy.ang2pix(coarser_nside, numpy.pi/2-dec, ra)
-
-                if coarser_nside in self.nsides_dict:
-                    # NOTE: This is the first nside in the divide-by-two progression that is available in the dictionary. By construction, this should be the previous value in the NSIDE progression.
-                    if coarser_pixel in self.nsides_dict[coarser_nside]:
-                        # coarser pixel found
-                        break
-
-            # The following if-else clause decided based on the outcome of the lookup in the previous loop.
-            if coarser_nside < self.min_nside:
-                # no coarser pixel is available (probably we are just scanning finely around MC truth)
+        nsides = numpy.array([p[0] for p in pixels], dtype=int)
+        pixel_ids = numpy.array([p[1] for p in pixels], dtype=int)
+
+        # get directions
+        codecs = numpy.empty(len(pixels))
+        ras = numpy.empty(len(pixels))
+        for nside in numpy.unique(nsides):
+            mask = nsides == nside
+            codecs[mask], ras[mask] = pixel_geometry.pix2ang(int(nside), pixel_ids[mask])
+        decs = numpy.pi/2 - codecs
+        zeniths, azimuths = astro.equa_to_dir(ras, decs, self.event_metadata.mjd)
+        zeniths = numpy.atleast_1d(zeniths)
+        azimuths = numpy.atleast_1d(azimuths)
+
+        # get base vertices
+        coarser_pixels = self._get_coarser_pixels(nsides, numpy.pi/2-decs, ras)
+
+        for i, (nside, pixel) in enumerate(pixels):
+            LOGGER.debug(f"Generating pframe(s) from pixel P#{i}: {(nside, pixel)}")
+            direction = dataclasses.I3Direction(float(zeniths[i]), float(azimuths[i]))
+
+            if nside == self.min_nside or coarser_pixels[i] is None:
+                # Scanning the minimum NSIDE, the position is taken from a seed provided by reco-specific logic and passed as "fallback position".
+                # Otherwise, no coarser pixel is available (probably we are just scanning finely around MC truth)
                 position = self.fallback_position
                 time = self.fallback_time
                 energy = self.fallback_energy
             else:
-                if numpy.isnan(self.nsides_dict[coarser_nside][coarser_pixel].llh):
+                coarser_nside, coarser_pixel = coarser_pixels[i]  # type: ignore[misc]
+                coarser_pixfin = self.nsides_dict[coarser_nside][coarser_pixel]
+                if numpy.isnan(coarser_pixfin.llh):
                     # coarser reconstruction failed
                     position = self.fallback_position
                     time = self.fallback_time
                     energy = self.fallback_energy
                 else:
-                    position = self.nsides_dict[coarser_nside][coarser_pixel].position
-                    time = self.nsides_dict[coarser_nside][coarser_pixel].time
-                    energy = self.nsides_dict[coarser_nside][coarser_pixel].energy
+                    position = coarser_pixfin.position
+                    time = coarser_pixfin.time
+                    energy = coarser_pixfin.energy
+
+            yield from self._gen_pframes(nside, pixel, direction, position, time, energy)
+
+    def _gen_pframes(
+        self,
+        nside: int,
+        pixel: int,
+        direction: dataclasses.I3Direction,
+        position: dataclasses.I3Position,
+        time: float,
+        energy: float,
+    ) -> Iterator[icetray.I3Frame]:
+        """Yield PFrames to be reco'd for a given `nside` and `pixel` (see `gen_pframes_batch()`)."""
 
         # Now generate the vertex seed position variations according to the reco-specific logic.
 
         LOGGER.debug(f"Generating {len(self.pos_variations)} position variations.")
 
-        for i, pos_variation in enumerate(self.pos_variations):
-            p_frame = icetray.I3Frame(icetray.I3Frame.Physics)
-
+        for pos_variation in self.pos_variations:
             if self.reco.rotate_vertex:
                 # rotate variation to be applied in transverse plane
                 pos_variation.rotate_y(direction.theta)
                 pos_variation.rotate_z(direction.phi)
 
-            if self.reco.add_fallback_position:
-                if position != self.fallback_position:
-                    # add fallback pos as an extra first guess
-                    p_frame[f'{self.output_particle_name}_fallback'] = self.i3particle(
-                        self.fallback_position+pos_variation,
-                        direction,
-                        self.fallback_energy,
-                        self.fallback_time)
-
-            p_frame[f'{self.output_particle_name}'] = self.i3particle(position+pos_variation,
-                                                                      direction,
-                                                                      energy,
-                                                                      time)
+        # make all the seed particles at once
+        with_fallback = self.reco.add_fallback_position and position != self.fallback_position
+        n_posvar = len(self.pos_variations)
+        particles = self.i3particles(
+            [position+pv for pv in self.pos_variations]
+            + ([self.fallback_position+pv for pv in self.pos_variations] if with_fallback else []),
+            direction,
+            [energy] * n_posvar + ([self.fallback_energy] * n_posvar if with_fallback else []),
+            [time] * n_posvar + ([self.fallback_time] * n_posvar if with_fallback else []),
+        )
+
+        for i, pos_variation in enumerate(self.pos_variations):
+            p_frame = icetray.I3Frame(icetray.I3Frame.Physics)
+
+            if with_fallback:
+                # add fallback pos as an extra first guess
+                p_frame[f'{self.output_particle_name}_fallback'] = particles[n_posvar+i]
+
+            p_frame[f'{self.output_particle_name}'] = particles[i]
             # generate a new event header
             eventHeader = dataclasses.I3EventHeader(self.event_header)
             eventHeader.sub_event_stream = "SCAN_nside%04u_pixel%04u_posvar%04u" % (nside, pixel, i)
@@ -341,8 +465,7 @@ async def scan(
     global_start_time = time.time()
     LOGGER.info(f"Starting up Skymap Scanner server for event: {event_metadata=}")
 
-    if not nsides_dict:
-        nsides_dict = {}
+    nsides_dict = NSidesDict(nsides_dict or {})
 
     pixeler = PixelsToReco(
         nsides_dict=nsides_dict,
@@ -355,6 +478,7 @@ async def scan(
         reco_algo=reco_algo,
         event_metadata=event_metadata,
         realtime_format_version=realtime_format_version,
+        pixel_order=SERVER_ENV.SKYSCAN_PIXEL_ORDER,
     )
 
     reporter = Reporter(
@@ -404,40 +528,318 @@ async def scan(
 
 
 async def _send_pixels(
-    to_clients_queue: mq.Queue,
-    reco_algo: str,
+    dispatcher: Dispatcher,
     pixeler: PixelsToReco,
-    already_sent_pixvars: Set[SentPixelVariation],
+    collector: Collector,
     nside_subprogression: NSideProgression,
-    realtime_format_version: str,
-) -> Set[SentPixelVariation]:
-    """This send the next logical round of pixels to be reconstructed."""
+    pixels: Optional[AbstractSet[Tuple[int, int]]] = None,
+) -> int:
+    """This send the next logical round of pixels to be reconstructed.
+
+    If `pixels` is given, send those (the ones not already sent) instead
+    of choosing them using `nside_subprogression`. Each message is
+    prioritized by its finest nside (see `calc_priority()`).
+
+    Each pixel variation is registered with the collector *before* it is
+    sent, so its result can be matched even if it comes back right away.
+    Return the number of pixel variations sent (or queued to be sent).
+    """
     LOGGER.info("Getting pixels to send to clients...")
 
-    sent_pixvars: Set[SentPixelVariation] = set([])
-    async with to_clients_queue.open_pub() as pub:
-        for i, pframe in enumerate(
-            pixeler.gen_new_pixel_pframes(already_sent_pixvars, nside_subprogression)
-        ):
-            LOGGER.info(f"Sending message M#{i} {pframe_tuple(pframe)}...")
-            await pub.send(
-                {
-                    cfg.MSG_KEY_RECO_ALGO: reco_algo,
-                    cfg.MSG_KEY_REALTIME_FORMAT_VERSION: realtime_format_version,
-                    cfg.MSG_KEY_PFRAME_PKL_B64: messages.Serialization.encode_pkl_b64(
-                        pframe
-                    ),
-                }
-            )
-            LOGGER.debug(f"sent message M#{i} {pframe_tuple(pframe)}")
-            sent_pixvars.add(SentPixelVariation.from_pframe(pframe))
+    runtimes_by_nside = dispatcher.worker_stats_collection.get_mean_worker_runtimes_by_nside()
+    if pixels is None:
+        pixels_to_send = pixeler.get_new_pixels(
+            collector.sent_pixels, nside_subprogression, runtimes_by_nside
+        )
+    else:
+        pixels_to_send = pixeler.get_pixels(
+            pixels, collector.sent_pixels, runtimes_by_nside
+        )
+
+    nsides = list(nside_subprogression.keys())
+    n_sent = 0
+    for message_pframes in _bundle_pframes(
+        _group_pframes(pixeler.gen_pframes_batch(pixels_to_send)),
+        len(pixels_to_send) * len(pixeler.pos_variations),
+        dispatcher.worker_stats_collection,
+        runtimes_by_nside,
+    ):
+        dispatcher.submit(message_pframes, calc_priority(message_pframes, nsides))
+        n_sent += len(message_pframes)
+        await asyncio.sleep(0)  # let the dispatcher send while we generate
 
     # check if anything was actually processed
-    if not sent_pixvars:
+    if not n_sent:
         LOGGER.info("No additional pixels were sent.")
     else:
-        LOGGER.info(f"Done serving pixels to clients: {len(sent_pixvars)}.")
-    return sent_pixvars
+        LOGGER.info(
+            f"Done serving pixels to clients: {n_sent} "
+            f"({dispatcher.n_waiting} waiting to be sent, "
+            f"{dispatcher.n_in_flight} in flight)."
+        )
+    # only report every round, not every (small) batch of dataflow refinements
+    await collector.report_sent_pixvars(n_sent, bypass_timers=pixels is None)
+    return n_sent
+
+
+def _group_pframes(
+    pframes: Iterator[icetray.I3Frame],
+) -> Iterator[List[icetray.I3Frame]]:
+    """Group the PFrames that are sent in one message (see `SKYSCAN_MERGE_POSVARS`)."""
+    if not SERVER_ENV.SKYSCAN_MERGE_POSVARS:
+        for pframe in pframes:
+            yield [pframe]
+        return
+    # a pixel's position variations are generated one after another
+    for _, group in itertools.groupby(pframes, key=lambda f: pframe_tuple(f)[:2]):
+        yield list(group)
+
+
+def _bundle_pframes(
+    pframe_groups: Iterator[List[icetray.I3Frame]],
+    n_pframes: int,
+    worker_stats_collection: WorkerStatsCollection,
+    runtimes_by_nside: Dict[int, float],
+) -> Iterator[List[icetray.I3Frame]]:
+    """Bundle the pixels' PFrame groups into messages (see `SKYSCAN_BUNDLE_TARGET_SEC`).
+
+    Each bundle is sized using the nside's mean reco runtime (see
+    `calc_bundle_size()`) when its first group comes in, then yielded
+    once it's full. `n_pframes` is the total number of PFrames in the
+    groups, so the PFrames can be generated as they're needed.
+    """
+    if not SERVER_ENV.SKYSCAN_BUNDLE_TARGET_SEC:
+        yield from pframe_groups
+        return
+
+    n_busy_workers = calc_n_busy_workers(worker_stats_collection)
+    n_pframes_left = n_pframes
+    bundle: List[icetray.I3Frame] = []
+    n_bundled = size = 0
+    for group in pframe_groups:
+        if not bundle:  # size the new bundle
+            runtime = runtimes_by_nside.get(pframe_tuple(group[0])[0])
+            size = calc_bundle_size(
+                runtime * len(group) if runtime else None,
+                n_pframes_left // len(group),
+                n_busy_workers,
+                SERVER_ENV.SKYSCAN_BUNDLE_TARGET_SEC,
+            )
+        bundle.extend(group)
+        n_bundled += 1
+        n_pframes_left -= len(group)
+        if n_bundled == size:
+            yield bundle
+            bundle, n_bundled = [], 0
+    if bundle:  # only if `n_pframes` was an overestimate
+        yield bundle
+
+
+async def _get_next_round_request(
+    round_requests: "asyncio.Queue[Optional[int]]",
+) -> Optional[int]:
+    """Wait for the next round request, merging in any others pending.
+
+    A request is the max nside thresholded (`None` for the first round).
+    Since each round opens all nsides up to (plus one) its max nside,
+    the greatest request pending covers all the others.
+    """
+    requests = [await round_requests.get()]
+    while not round_requests.empty():
+        requests.append(round_requests.get_nowait())
+    nsides = [r for r in requests if r is not None]
+    return max(nsides) if nsides else None
+
+
+class _ScanLoop:
+    """The concurrent parts of a scan, sharing the collector, dispatcher,
+    and queue of round requests (see `_serve_and_collect()`)."""
+
+    def __init__(
+        self,
+        from_clients_queue: mq.Queue,
+        collector: Collector,
+        dispatcher: Dispatcher,
+        pixeler: PixelsToReco,
+        nside_progression: NSideProgression,
+    ) -> None:
+        self.from_clients_queue = from_clients_queue
+        self.collector = collector
+        self.dispatcher = dispatcher
+        self.pixeler = pixeler
+        self.nside_progression = nside_progression
+
+        self.refiner = None
+        if SERVER_ENV.SKYSCAN_DATAFLOW_REFINEMENT:
+            self.refiner = DataflowRefiner(
+                collector.nsides_dict, nside_progression, collector.sent_pixels
+            )
+
+        self.round_requests: "asyncio.Queue[Optional[int]]" = asyncio.Queue()
+        self.round_requests.put_nowait(None)  # -> generates first nside
+        self.refinements: "asyncio.Queue[Set[Tuple[int, int]]]" = asyncio.Queue()
+        # refinements taken off the queue, but not yet all submitted
+        self.n_refinements_in_progress = 0
+        # one sender chooses & submits pixels at a time, so they're never chosen twice
+        self.send_lock = asyncio.Lock()
+        self.scan_done = asyncio.Event()
+
+    def _has_refinements_pending(self) -> bool:
+        return not self.refinements.empty() or self.n_refinements_in_progress > 0
+
+    def request_round_if_drained(self) -> None:
+        """Request a full round if nothing is left in flight.
+
+        With dataflow refinement, a full round is only run once nothing
+        is left in flight -- this catches anything missed & it's how the
+        scan finishes.
+        """
+        if not self._has_refinements_pending() and self.collector.has_collected_all_sent():
+            self.round_requests.put_nowait(self.nside_progression.max_nside)
+
+    def _is_scan_done(self, n_sent: int) -> bool:
+        # there was no re-refinement of a region & collected everything sent
+        return (
+            not n_sent
+            and self.round_requests.empty()
+            and not self._has_refinements_pending()
+            and self.collector.has_collected_all_sent()
+        )
+
+    async def send_rounds(self) -> None:
+        """Send a round of pixels for each round request, until the scan is done."""
+        while True:
+            max_nside_thresholded = await _get_next_round_request(self.round_requests)
+            #
+            # SEND PIXELS -- the next logical round of pixels (not necessarily the next nside)
+            #
+            async with self.send_lock:
+                n_sent = await _send_pixels(
+                    self.dispatcher,
+                    self.pixeler,
+                    self.collector,
+                    # we want to open re-refinement for all nsides <= max_nside_thresholded
+                    self.nside_progression.get_slice_plus_one(max_nside_thresholded),
+                )
+            # Check if scan is done
+            if self._is_scan_done(n_sent):
+                LOGGER.info("Done receiving/saving recos from clients.")
+                self.scan_done.set()
+                return
+            # NOTE: when nothing was sent (and we haven't collected all we
+            #       sent) it just means there were no addl pixels to refine
+            #       this time around. That doesn't mean there won't be more
+            #       in the future -- wait for the next threshold.
+
+    async def send_refinements(self) -> None:
+        """Send the pixels to refine (see `DataflowRefiner`) as they come in, forever.
+
+        While they're being sent, they count as in progress -- so, the
+        scan is neither done nor ready for a full round (which could
+        otherwise pick the same pixels).
+        """
+        while True:
+            pixels = await self.refinements.get()
+            self.n_refinements_in_progress += 1
+            try:
+                while not self.refinements.empty():  # merge all pending
+                    pixels |= self.refinements.get_nowait()
+                async with self.send_lock:
+                    await _send_pixels(
+                        self.dispatcher,
+                        self.pixeler,
+                        self.collector,
+                        self.nside_progression,
+                        pixels=pixels,
+                    )
+            finally:
+                self.n_refinements_in_progress -= 1
+            self.request_round_if_drained()  # ex: if they were all already sent
+
+    async def ingest(
+        self,
+        reco_pixel_variation: RecoPixelVariation,
+        runtime: Optional[float],
+    ) -> None:
+        """Collect the reco, then request whatever it makes needed next."""
+        try:
+            pixfin = await self.collector.collect(reco_pixel_variation, runtime)
+        except ExtraRecoPixelVariationException as e:
+            LOGGER.error(e)
+            pixfin = None
+        self.dispatcher.mark_returned(reco_pixel_variation.id_tuple)
+
+        if self.refiner:
+            if pixfin and (
+                pixels := self.refiner.on_pixel_finished(pixfin.nside, pixfin.pixel_id)
+            ):
+                self.refinements.put_nowait(pixels)
+            self.request_round_if_drained()
+            return
+
+        # if we've got enough pixfins, let's get a jump on the next round
+        if max_nside_thresholded := self.collector.get_max_nside_thresholded():
+            # NOTE: POTENTIAL END-GAME SCENARIO
+            # nsides=[8,64,512]. 512 & 64 have been done for a long time.
+            # Now, 8 just thresholded. We don't know if a re-refinement
+            # is needed. (IOW were/are the most recent nside-8 pixels very
+            # important?) AND if they turn out to not warrant re-refinement,
+            # the sender will find that we collected everything AKA we're done!
+            LOGGER.info(f"Threshold met (max={max_nside_thresholded})")
+            self.round_requests.put_nowait(max_nside_thresholded)
+
+    async def give_up(self, id_tuple: PTuple, runtime: Optional[float] = None) -> None:
+        """Collect a NaN reco for the pixel variation, which is out of retries.
+
+        No runtime -> not a real reco, so it's left out of the worker stats.
+        """
+        LOGGER.warning(f"Out of retries for {id_tuple}, using NaN")
+        await self.ingest(RecoPixelVariation.nan(id_tuple), runtime)
+
+    async def _ingest_recos_msg(self, msg: StrDict) -> None:
+        """Ingest a message's reco(s) -- one or more pixel variations'."""
+        rpvs, omitted, runtime = messages.decode_reco_pixel_variations_msg(msg)
+        n_recos = len(rpvs) + len(omitted)  # the runtime is for all of them
+        # the omitted weren't their pixel's best, so NaN has the same result
+        rpvs += [
+            RecoPixelVariation.nan(t) for t in omitted if self.dispatcher.is_in_flight(t)
+        ]
+        for rpv in rpvs:
+            await self.ingest(rpv, runtime / n_recos)
+
+    async def _ingest_failure_msg(self, msg: StrDict) -> None:
+        """Retry (or give up on) a failure message's pixel variation(s)."""
+        id_tuples, reason, runtime = messages.decode_reco_failure_msg(msg)
+        LOGGER.warning(f"Reco failed for {id_tuples}: {reason}")
+        for id_tuple in id_tuples:
+            if not self.dispatcher.is_in_flight(id_tuple):
+                LOGGER.info(f"Already have a reco for {id_tuple}")
+            elif not self.dispatcher.retry(id_tuple):
+                await self.give_up(id_tuple, runtime / len(id_tuples))
+
+    async def collect_recos(self) -> None:
+        """Collect the recos from clients, until the scan is done."""
+        #
+        # COLLECT PIXEL-RECOS
+        #
+        LOGGER.info("Receiving recos from clients...")
+        async with self.from_clients_queue.open_sub() as sub:
+            async for msg in sub:
+                if messages.is_reco_failure_msg(msg):
+                    await self._ingest_failure_msg(msg)
+                else:
+                    await self._ingest_recos_msg(msg)
+
+                # don't rely solely on cancellation (the sub may swallow it)
+                if self.scan_done.is_set():
+                    return
+
+        if self.scan_done.is_set():
+            return
+        # the sender stops us when the scan is done, so we must have timed-out
+        err = "The MQ-sub must have timed out (too many MIA clients)"
+        LOGGER.error(err)
+        raise RuntimeError(err)
 
 
 async def _serve_and_collect(
@@ -453,6 +855,14 @@ async def _serve_and_collect(
 ) -> int:
     """Scan an entire event.
 
+    Pixels are sent and recos are collected concurrently: whenever the
+    collector meets a threshold, it requests a new round from the
+    sender, which may still be sending the previous round.
+
+    With `SKYSCAN_DATAFLOW_REFINEMENT`, each finished pixel's
+    neighborhood is refined right away instead (see `DataflowRefiner`),
+    and a new round is only requested once nothing is left in flight.
+
     Return the number of pixel-variations sent. Stop when all sent
     pixels-variations have been received (or the MQ-sub times-out).
     """
@@ -464,80 +874,46 @@ async def _serve_and_collect(
         nsides=list(nside_progression.keys()),
     )
 
-    max_nside_thresholded = None  # -> generates first nside
-    collected_all_sent = False
-    async with collector.finder_context():
-        while True:
-            #
-            # SEND PIXELS -- the next logical round of pixels (not necessarily the next nside)
-            #
-            sent_pixvars = await _send_pixels(
-                to_clients_queue,
-                reco_algo,
-                pixeler,
-                collector.sent_pixvars,
-                # we want to open re-refinement for all nsides <= max_nside_thresholded
-                nside_progression.get_slice_plus_one(max_nside_thresholded),
-                realtime_format_version,
-            )
-            # Check if scan is done --
-            # there was no re-refinement of a region & collected everything sent
-            if not sent_pixvars and collected_all_sent:
-                LOGGER.info("Done receiving/saving recos from clients.")
-                return collector.n_sent
-            # NOTE: when `sent_pixvars` is empty (and we didn't previously
-            #       collect all we sent) it just means there were no addl
-            #       pixels to refine this time around. That doesn't mean
-            #       there won't be more in the future.
-            await collector.register_sent_pixvars(sent_pixvars)
+    dispatcher = Dispatcher(
+        to_clients_queue,
+        collector,
+        reporter.worker_stats_collection,
+        reco_algo,
+        realtime_format_version,
+    )
 
-            #
-            # COLLECT PIXEL-RECOS
-            #
-            LOGGER.info("Receiving recos from clients...")
-            collected_all_sent = False
-            async with from_clients_queue.open_sub() as sub:  # re-open to avoid inactivity timeout (applicable for rabbitmq)
-                async for msg in sub:
-                    reco_pixel_variation = messages.Serialization.decode_pkl_b64(
-                        msg[cfg.MSG_KEY_RECO_PIXEL_VARIATION_PKL_B64]
-                    )
-                    if not isinstance(reco_pixel_variation, RecoPixelVariation):
-                        raise ValueError(
-                            f"Message not {RecoPixelVariation}: {type(reco_pixel_variation)}"
-                        )
-                    try:
-                        await collector.collect(
-                            reco_pixel_variation,
-                            msg[cfg.MSG_KEY_RUNTIME],
-                        )
-                    except ExtraRecoPixelVariationException as e:
-                        LOGGER.error(e)
-
-                    # if we've got enough pixfins, let's get a jump on the next round
-                    if max_nside_thresholded := collector.get_max_nside_thresholded():
-                        collected_all_sent = collector.has_collected_all_sent()
-                        # NOTE: POTENTIAL END-GAME SCENARIO
-                        # nsides=[8,64,512]. 512 & 64 have been done for a long time.
-                        # Now, 8 just thresholded. We don't know if a re-refinement
-                        # is needed. (IOW were/are the most recent nside-8 pixels very
-                        # important?) AND if they turn out to not warrant re-refinement,
-                        # we need to know if we collected everything AKA we're done!
-                        LOGGER.info(f"Threshold met (max={max_nside_thresholded})")
-                        break
+    scan_loop = _ScanLoop(
+        from_clients_queue,
+        collector,
+        dispatcher,
+        pixeler,
+        nside_progression,
+    )
 
-            #
-            # OUT OF LOOP: either b/c time for more pixels, or timed-out
-            #
-            # time for more pixels
-            if max_nside_thresholded:
-                continue  # do-while loop logic
-            # timed-out
-            err = "The MQ-sub must have timed out (too many MIA clients)"
-            LOGGER.error(err)
-            raise RuntimeError(err)
-
-    # this statement should never be reached
-    raise RuntimeError("Unknown state -- there is an error upstream")
+    async with collector.finder_context():
+        tasks = [
+            asyncio.create_task(scan_loop.send_rounds()),
+            asyncio.create_task(dispatcher.run()),
+            asyncio.create_task(scan_loop.collect_recos()),
+        ]
+        if scan_loop.refiner:
+            tasks.append(asyncio.create_task(scan_loop.send_refinements()))
+        if SERVER_ENV.SKYSCAN_STRAGGLER_RTT_MULTIPLE:
+            tasks.append(asyncio.create_task(dispatcher.run_straggler_checks()))
+        if SERVER_ENV.SKYSCAN_RETRY_DEADLINE_SEC:
+            tasks.append(
+                asyncio.create_task(dispatcher.run_deadline_checks(scan_loop.give_up))
+            )
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()  # raise if errored
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    return collector.n_sent
 
 
 def write_startup_json(
@@ -0,0 +1,142 @@
+"""Tools for caching parsed GCD frame packets (in memory and on disk)."""
+
+import dataclasses as dc
+import hashlib
+import logging
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .utils import load_framepacket_from_file
+
+try:  # these are only used for typehints, so mock imports are fine
+    from icecube.icetray import I3Frame  # type: ignore[import]
+except ImportError:
+    I3Frame = Any
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dc.dataclass(frozen=True)
+class _FileKey:
+    """Identifies a specific version of a file on the filesystem."""
+
+    path: str
+    mtime_ns: int
+    size: int
+
+    @staticmethod
+    def from_path(filename: str) -> "_FileKey":
+        """Get an instance by stat-ing the file."""
+        path = os.path.realpath(filename)
+        stat = os.stat(path)
+        return _FileKey(path, stat.st_mtime_ns, stat.st_size)
+
+
+@dc.dataclass
+class _CacheEntry:
+    """A parsed GCD frame packet along with its derived objects."""
+
+    file_key: _FileKey
+    sha1: Optional[str]  # only set when using the disk cache
+    frames: List[I3Frame]
+    omgeo: Any = None  # lazily set
+
+
+# keyed by real path
+_CACHE: Dict[str, _CacheEntry] = {}
+
+
+def _hash_file(path: str) -> str:
+    m = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            m.update(chunk)
+    return m.hexdigest()
+
+
+def _load_from_disk_cache(fpath: Path) -> Optional[List[I3Frame]]:
+    try:
+        with open(fpath, "rb") as f:
+            frames = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:  # a corrupt/partial file is not fatal -- just re-parse
+        LOGGER.warning(f"[gcd-cache] could not read {fpath}: {repr(e)}")
+        return None
+    LOGGER.info(f"[gcd-cache] read from disk {fpath}")
+    return frames  # type: ignore[no-any-return]
+
+
+def _save_to_disk_cache(fpath: Path, frames: List[I3Frame]) -> None:
+    fpath.parent.mkdir(parents=True, exist_ok=True)
+    # write then rename, so concurrent readers never see a partial file
+    tmp = fpath.with_name(f"{fpath.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(frames, f)
+    os.replace(tmp, fpath)
+    LOGGER.info(f"[gcd-cache] wrote to disk {fpath}")
+
+
+def _get_entry(filename: str, disk_cache_dir: Optional[Path]) -> _CacheEntry:
+    file_key = _FileKey.from_path(filename)
+
+    entry = _CACHE.get(file_key.path)
+    if entry and entry.file_key == file_key:
+        return entry
+
+    # not in memory (or the file changed)
+    sha1 = None
+    frames = None
+    if disk_cache_dir:
+        # hash it to key the disk cache
+        sha1 = _hash_file(file_key.path)
+        if entry and entry.sha1 == sha1:  # only the file's metadata changed
+            entry.file_key = file_key
+            return entry
+        disk_fpath = disk_cache_dir / f"{sha1}.pkl"
+        frames = _load_from_disk_cache(disk_fpath)
+    if frames is None:
+        LOGGER.info(f"[gcd-cache] parsing {file_key.path}")
+        frames = load_framepacket_from_file(file_key.path)
+        if disk_cache_dir:
+            _save_to_disk_cache(disk_fpath, frames)
+
+    entry = _CACHE[file_key.path] = _CacheEntry(file_key, sha1, frames)
+    return entry
+
+
+def load_gcd_frames(
+    filename: str,
+    disk_cache_dir: Optional[Path] = None,
+) -> List[I3Frame]:
+    """Get the frames of a GCD file, parsing the file only if needed.
+
+    Frames are cached in memory for the lifetime of the process, keyed
+    by the file's path, mtime, and size. If `disk_cache_dir` is given,
+    the parsed frames are also persisted there (keyed by content hash)
+    so other processes can skip parsing.
+
+    NOTE: the returned frames are shared -- do not modify them.
+    """
+    return _get_entry(filename, disk_cache_dir).frames
+
+
+def load_omgeo(
+    filename: str,
+    disk_cache_dir: Optional[Path] = None,
+) -> Any:
+    """Get the `I3OMGeoMap` of a GCD file's geometry (G) frame.
+
+    This is cached alongside the frames (see `load_gcd_frames()`).
+    """
+    entry = _get_entry(filename, disk_cache_dir)
+    if entry.omgeo is None:
+        entry.omgeo = entry.frames[0]["I3Geometry"].omgeo
+    return entry.omgeo
+
+
+def clear() -> None:
+    """Clear the in-memory cache."""
+    _CACHE.clear()
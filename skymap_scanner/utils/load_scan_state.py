@@ -11,7 +11,8 @@ from icecube import icetray  # type: ignore[import-not-found]
 from skyreader import EventMetadata
 
 from .. import config as cfg
-from .pixel_classes import RecoPixelFinal, RecoPixelVariation
+from .gcd_cache import load_gcd_frames, load_omgeo
+from .pixel_classes import NSidesDict, RecoPixelFinal, RecoPixelVariation
 from .utils import hash_frame_packet, load_framepacket_from_file
 
 LOGGER = logging.getLogger(__name__)
@@ -41,12 +42,16 @@ def load_cache_state(
 Code extracted from load_scan_state()
 """
 def get_baseline_gcd_frames(baseline_GCD_file, GCDQp_packet) -> List[icetray.I3Frame]:
+    """Get the baseline GCD frames (or the GCDQp packet's G frame).
 
+    The baseline GCD file is only parsed once per process (see `gcd_cache`),
+    so the returned frames are shared -- do not modify them.
+    """
     if baseline_GCD_file is not None:
 
         LOGGER.debug(f"Trying to read GCD from {baseline_GCD_file}.")
         try:
-            baseline_GCD_frames = load_framepacket_from_file(baseline_GCD_file)
+            baseline_GCD_frames = load_gcd_frames(baseline_GCD_file)
         except Exception:
             LOGGER.debug(" -> failed")
             raise RuntimeError("Unable to read baseline GCD. In the current design, this is unexpected. Possibly a bug or data corruption!")
@@ -63,6 +68,17 @@ def get_baseline_gcd_frames(baseline_GCD_file, GCDQp_packet) -> List[icetray.I3F
     return baseline_GCD_frames
 
 
+def get_baseline_omgeo(baseline_GCD_file, GCDQp_packet):
+    """Get the `I3OMGeoMap` of the baseline GCD frames (see `get_baseline_gcd_frames()`).
+
+    For a baseline GCD file, this is only extracted once per process.
+    """
+    g_frame = get_baseline_gcd_frames(baseline_GCD_file, GCDQp_packet)[0]
+    if baseline_GCD_file is not None:
+        return load_omgeo(baseline_GCD_file)
+    return g_frame["I3Geometry"].omgeo
+
+
 def load_scan_state(
     event_metadata: EventMetadata,
     state_dict: dict,
@@ -83,7 +99,7 @@ def load_scan_state(
     nsides = [(int(d[5:]), os.path.join(this_event_cache_dir, d)) for d in os.listdir(this_event_cache_dir) if os.path.isdir(os.path.join(this_event_cache_dir, d)) and d.startswith("nside")]
 
     if cfg.STATEDICT_NSIDES not in state_dict:
-        state_dict[cfg.STATEDICT_NSIDES] = dict()
+        state_dict[cfg.STATEDICT_NSIDES] = NSidesDict()
 
     for nside, nside_dir in nsides:
         if nside not in state_dict[cfg.STATEDICT_NSIDES]:
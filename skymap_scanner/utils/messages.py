@@ -2,7 +2,15 @@
 
 import base64
 import pickle
-from typing import Any
+from typing import Any, Dict, List, Tuple
+
+from .. import config as cfg
+from .pixel_classes import PTuple, RecoPixelVariation
+
+try:  # this is only used for decoding I3Frames, so a mock import is fine elsewhere
+    from icecube.icetray import I3Frame  # type: ignore[import]
+except ImportError:
+    I3Frame = Any
 
 
 class Serialization:
@@ -17,3 +25,262 @@ class Serialization:
     def decode_pkl_b64(b64_string: str) -> Any:
         """Decode a message-friendly to Python object."""
         return pickle.loads(base64.b64decode(b64_string))
+
+    @staticmethod
+    def encode_i3frame_b64(frame: I3Frame) -> str:
+        """Encode an I3Frame (its raw bytes) to message-friendly string."""
+        return base64.b64encode(frame.dumps()).decode()
+
+    @staticmethod
+    def decode_i3frame_b64(b64_string: str) -> I3Frame:
+        """Decode a message-friendly string to an I3Frame."""
+        frame = I3Frame()
+        frame.loads(base64.b64decode(b64_string))
+        return frame
+
+
+def get_wire_version(msg: Dict[str, Any]) -> int:
+    """Get the message's encoding version (messages without one are legacy)."""
+    wire_version = msg.get(cfg.MSG_KEY_WIRE_VERSION, cfg.WIRE_VERSION_PKL_B64)
+    if wire_version not in cfg.WIRE_VERSIONS:
+        raise ValueError(f"Unknown message wire version: {wire_version}")
+    return wire_version  # type: ignore[no-any-return]
+
+
+def encode_pframe_msg(
+    reco_algo: str,
+    realtime_format_version: str,
+    pframe: I3Frame,
+    wire_version: int,
+) -> Dict[str, Any]:
+    """Make a message for a pixel (PFrame) to be reco'd."""
+    msg: Dict[str, Any] = {
+        cfg.MSG_KEY_RECO_ALGO: reco_algo,
+        cfg.MSG_KEY_REALTIME_FORMAT_VERSION: realtime_format_version,
+    }
+    if wire_version == cfg.WIRE_VERSION_PKL_B64:  # legacy -- no version field
+        msg[cfg.MSG_KEY_PFRAME_PKL_B64] = Serialization.encode_pkl_b64(pframe)
+    elif wire_version == cfg.WIRE_VERSION_BINARY:
+        msg[cfg.MSG_KEY_WIRE_VERSION] = wire_version
+        msg[cfg.MSG_KEY_PFRAME_I3_B64] = Serialization.encode_i3frame_b64(pframe)
+    else:
+        raise ValueError(f"Unknown message wire version: {wire_version}")
+    return msg
+
+
+def decode_pframe_msg(msg: Dict[str, Any]) -> Tuple[str, I3Frame, str, int]:
+    """Get the reco_algo, PFrame, realtime_format_version, and wire
+    version from a pixel message."""
+    wire_version = get_wire_version(msg)
+    if wire_version == cfg.WIRE_VERSION_BINARY:
+        pframe = Serialization.decode_i3frame_b64(msg[cfg.MSG_KEY_PFRAME_I3_B64])
+    else:
+        pframe = Serialization.decode_pkl_b64(msg[cfg.MSG_KEY_PFRAME_PKL_B64])
+    return (
+        msg[cfg.MSG_KEY_RECO_ALGO],
+        pframe,
+        msg[cfg.MSG_KEY_REALTIME_FORMAT_VERSION],
+        wire_version,
+    )
+
+
+def encode_pframes_msg(
+    reco_algo: str,
+    realtime_format_version: str,
+    pframes: List[I3Frame],
+    wire_version: int,
+    best_only: bool = False,
+) -> Dict[str, Any]:
+    """Make a message for multiple pixel variations (PFrames) to be reco'd
+    together.
+
+    If `best_only`, the client replies with only the best variation of
+    each pixel.
+    """
+    msg: Dict[str, Any] = {
+        cfg.MSG_KEY_RECO_ALGO: reco_algo,
+        cfg.MSG_KEY_REALTIME_FORMAT_VERSION: realtime_format_version,
+        cfg.MSG_KEY_BEST_ONLY: best_only,
+    }
+    if wire_version == cfg.WIRE_VERSION_PKL_B64:  # legacy -- no version field
+        msg[cfg.MSG_KEY_PFRAMES_PKL_B64] = [
+            Serialization.encode_pkl_b64(f) for f in pframes
+        ]
+    elif wire_version == cfg.WIRE_VERSION_BINARY:
+        msg[cfg.MSG_KEY_WIRE_VERSION] = wire_version
+        msg[cfg.MSG_KEY_PFRAMES_I3_B64] = [
+            Serialization.encode_i3frame_b64(f) for f in pframes
+        ]
+    else:
+        raise ValueError(f"Unknown message wire version: {wire_version}")
+    return msg
+
+
+def decode_pframes_msg(
+    msg: Dict[str, Any],
+) -> Tuple[str, List[I3Frame], str, int, bool]:
+    """Get the reco_algo, PFrames, realtime_format_version, wire version,
+    and whether to reply with only the best variations from a pixel
+    message -- either kind (see `encode_pframe_msg()` & `encode_pframes_msg()`)."""
+    if (
+        cfg.MSG_KEY_PFRAMES_PKL_B64 not in msg
+        and cfg.MSG_KEY_PFRAMES_I3_B64 not in msg
+    ):
+        reco_algo, pframe, realtime_format_version, wire_version = decode_pframe_msg(
+            msg
+        )
+        return reco_algo, [pframe], realtime_format_version, wire_version, False
+
+    wire_version = get_wire_version(msg)
+    if wire_version == cfg.WIRE_VERSION_BINARY:
+        pframes = [
+            Serialization.decode_i3frame_b64(f) for f in msg[cfg.MSG_KEY_PFRAMES_I3_B64]
+        ]
+    else:
+        pframes = [
+            Serialization.decode_pkl_b64(f) for f in msg[cfg.MSG_KEY_PFRAMES_PKL_B64]
+        ]
+    return (
+        msg[cfg.MSG_KEY_RECO_ALGO],
+        pframes,
+        msg[cfg.MSG_KEY_REALTIME_FORMAT_VERSION],
+        wire_version,
+        msg[cfg.MSG_KEY_BEST_ONLY],
+    )
+
+
+def encode_reco_pixel_variation_msg(
+    reco_pixel_variation: RecoPixelVariation,
+    runtime: float,
+    wire_version: int,
+) -> Dict[str, Any]:
+    """Make a message for a reco'd pixel variation."""
+    msg: Dict[str, Any] = {cfg.MSG_KEY_RUNTIME: runtime}
+    if wire_version == cfg.WIRE_VERSION_PKL_B64:  # legacy -- no version field
+        msg[cfg.MSG_KEY_RECO_PIXEL_VARIATION_PKL_B64] = Serialization.encode_pkl_b64(
+            reco_pixel_variation
+        )
+    elif wire_version == cfg.WIRE_VERSION_BINARY:
+        msg[cfg.MSG_KEY_WIRE_VERSION] = wire_version
+        msg[cfg.MSG_KEY_RECO_PIXEL_VARIATION_BIN_B64] = base64.b64encode(
+            reco_pixel_variation.to_bytes()
+        ).decode()
+    else:
+        raise ValueError(f"Unknown message wire version: {wire_version}")
+    return msg
+
+
+def decode_reco_pixel_variation_msg(
+    msg: Dict[str, Any],
+) -> Tuple[RecoPixelVariation, float]:
+    """Get the RecoPixelVariation and the reco's runtime from a message."""
+    if get_wire_version(msg) == cfg.WIRE_VERSION_BINARY:
+        reco_pixel_variation = RecoPixelVariation.from_bytes(
+            base64.b64decode(msg[cfg.MSG_KEY_RECO_PIXEL_VARIATION_BIN_B64])
+        )
+    else:
+        reco_pixel_variation = Serialization.decode_pkl_b64(
+            msg[cfg.MSG_KEY_RECO_PIXEL_VARIATION_PKL_B64]
+        )
+    if not isinstance(reco_pixel_variation, RecoPixelVariation):
+        raise ValueError(
+            f"Message not {RecoPixelVariation}: {type(reco_pixel_variation)}"
+        )
+    return reco_pixel_variation, msg[cfg.MSG_KEY_RUNTIME]
+
+
+def encode_reco_pixel_variations_msg(
+    reco_pixel_variations: List[RecoPixelVariation],
+    omitted: List[PTuple],
+    runtime: float,
+    wire_version: int,
+) -> Dict[str, Any]:
+    """Make a message for multiple reco'd pixel variations, which took
+    `runtime` altogether.
+
+    `omitted` holds the id tuples of the pixel variations that were also
+    reco'd, but are not included (ex: they weren't their pixel's best).
+    """
+    msg: Dict[str, Any] = {
+        cfg.MSG_KEY_RUNTIME: runtime,
+        cfg.MSG_KEY_OMITTED_PTUPLES: [list(t) for t in omitted],
+    }
+    if wire_version == cfg.WIRE_VERSION_PKL_B64:  # legacy -- no version field
+        msg[cfg.MSG_KEY_RECO_PIXEL_VARIATIONS_PKL_B64] = [
+            Serialization.encode_pkl_b64(rpv) for rpv in reco_pixel_variations
+        ]
+    elif wire_version == cfg.WIRE_VERSION_BINARY:
+        msg[cfg.MSG_KEY_WIRE_VERSION] = wire_version
+        msg[cfg.MSG_KEY_RECO_PIXEL_VARIATIONS_BIN_B64] = [
+            base64.b64encode(rpv.to_bytes()).decode() for rpv in reco_pixel_variations
+        ]
+    else:
+        raise ValueError(f"Unknown message wire version: {wire_version}")
+    return msg
+
+
+def decode_reco_pixel_variations_msg(
+    msg: Dict[str, Any],
+) -> Tuple[List[RecoPixelVariation], List[PTuple], float]:
+    """Get the RecoPixelVariations, the omitted pixel variations' id
+    tuples, and the (total) runtime from a message -- either kind (see
+    `encode_reco_pixel_variation_msg()` & `encode_reco_pixel_variations_msg()`)."""
+    if (
+        cfg.MSG_KEY_RECO_PIXEL_VARIATIONS_PKL_B64 not in msg
+        and cfg.MSG_KEY_RECO_PIXEL_VARIATIONS_BIN_B64 not in msg
+    ):
+        reco_pixel_variation, runtime = decode_reco_pixel_variation_msg(msg)
+        return [reco_pixel_variation], [], runtime
+
+    if get_wire_version(msg) == cfg.WIRE_VERSION_BINARY:
+        reco_pixel_variations = [
+            RecoPixelVariation.from_bytes(base64.b64decode(b))
+            for b in msg[cfg.MSG_KEY_RECO_PIXEL_VARIATIONS_BIN_B64]
+        ]
+    else:
+        reco_pixel_variations = [
+            Serialization.decode_pkl_b64(b)
+            for b in msg[cfg.MSG_KEY_RECO_PIXEL_VARIATIONS_PKL_B64]
+        ]
+    for rpv in reco_pixel_variations:
+        if not isinstance(rpv, RecoPixelVariation):
+            raise ValueError(f"Message not {RecoPixelVariation}: {type(rpv)}")
+    omitted: List[PTuple] = [
+        (int(nside), int(pixel_id), int(posvar_id))
+        for nside, pixel_id, posvar_id in msg[cfg.MSG_KEY_OMITTED_PTUPLES]
+    ]
+    return reco_pixel_variations, omitted, msg[cfg.MSG_KEY_RUNTIME]
+
+
+def encode_reco_failure_msg(
+    id_tuples: List[PTuple],
+    reason: str,
+    runtime: float,
+) -> Dict[str, Any]:
+    """Make a message for pixel variations whose reco failed (or timed out)."""
+    return {
+        cfg.MSG_KEY_RUNTIME: runtime,
+        cfg.MSG_KEY_RECO_FAILURE: {
+            cfg.MSG_KEY_RECO_FAILURE_PTUPLES: [list(t) for t in id_tuples],
+            cfg.MSG_KEY_RECO_FAILURE_REASON: reason,
+        },
+    }
+
+
+def is_reco_failure_msg(msg: Dict[str, Any]) -> bool:
+    """Is this a message for a failed reco (vs. a reco'd pixel variation)?"""
+    return cfg.MSG_KEY_RECO_FAILURE in msg
+
+
+def decode_reco_failure_msg(msg: Dict[str, Any]) -> Tuple[List[PTuple], str, float]:
+    """Get the pixel variations' id tuples, the failure reason, and the
+    runtime from a failed-reco message."""
+    failure = msg[cfg.MSG_KEY_RECO_FAILURE]
+    return (
+        [
+            (int(nside), int(pixel_id), int(posvar_id))
+            for nside, pixel_id, posvar_id in failure[cfg.MSG_KEY_RECO_FAILURE_PTUPLES]
+        ],
+        failure[cfg.MSG_KEY_RECO_FAILURE_REASON],
+        msg[cfg.MSG_KEY_RUNTIME],
+    )
@@ -1,8 +1,13 @@
 """Classes for representing a pixel-like things in various forms."""
 
 import dataclasses as dc
+import heapq
+import struct
 import time
-from typing import Any, Dict, Tuple
+from collections.abc import MutableMapping
+from typing import Any, ClassVar, Dict, Iterator, List, Mapping, Tuple
+
+import numpy as np
 
 from .. import config as cfg
 from .. import recos
@@ -109,6 +114,86 @@ class RecoPixelVariation(_PixelLike, _RecoData):
             self, "id_tuple", (self.nside, self.pixel_id, self.posvar_id)
         )
 
+    # nside, pixel_id, posvar_id, llh, E_in, E_tot, x, y, z, time, energy
+    _STRUCT: ClassVar[struct.Struct] = struct.Struct("<3q8d")
+
+    def to_bytes(self) -> bytes:
+        """Get a compact, fixed-layout binary representation."""
+        return self._STRUCT.pack(
+            self.nside,
+            self.pixel_id,
+            self.posvar_id,
+            self.llh,
+            self.reco_losses_inside,
+            self.reco_losses_total,
+            self.position.x,
+            self.position.y,
+            self.position.z,
+            self.time,
+            self.energy,
+        )
+
+    @staticmethod
+    def from_bytes(data: bytes) -> "RecoPixelVariation":
+        """Get an instance from its binary representation (see `to_bytes()`)."""
+        (
+            nside,
+            pixel_id,
+            posvar_id,
+            llh,
+            reco_losses_inside,
+            reco_losses_total,
+            x,
+            y,
+            z,
+            time_,
+            energy,
+        ) = RecoPixelVariation._STRUCT.unpack(data)
+        return RecoPixelVariation(
+            nside=nside,
+            pixel_id=pixel_id,
+            posvar_id=posvar_id,
+            llh=llh,
+            reco_losses_inside=reco_losses_inside,
+            reco_losses_total=reco_losses_total,
+            position=I3Position(x, y, z),
+            time=time_,
+            energy=energy,
+        )
+
+    @staticmethod
+    def nan(id_tuple: PTuple) -> "RecoPixelVariation":
+        """Get an instance standing in for a failed reco (all values are NaN)."""
+        nside, pixel_id, posvar_id = id_tuple
+        return RecoPixelVariation(
+            nside=nside,
+            pixel_id=pixel_id,
+            posvar_id=posvar_id,
+            llh=np.nan,
+            reco_losses_inside=np.nan,
+            reco_losses_total=np.nan,
+            position=I3Position(np.nan, np.nan, np.nan),
+            time=np.nan,
+            energy=np.nan,
+        )
+
+    @staticmethod
+    def best_of(
+        reco_pixel_variations: List["RecoPixelVariation"],
+    ) -> "RecoPixelVariation":
+        """Get the variation with the lowest llh.
+
+        Each variation is compared to the best so far, in order, and a
+        NaN never replaces it.
+        """
+        best = None
+        for this in reco_pixel_variations:
+            if (not best) or (this.llh < best.llh and not np.isnan(this.llh)):
+                best = this
+        if best is None:
+            raise ValueError("No RecoPixelVariations given")
+        return best
+
     @staticmethod
     def from_i3frame(
         frame: I3Frame,
@@ -121,4 +206,227 @@ class RecoPixelVariation(_PixelLike, _RecoData):
         )
 
 
-NSidesDict = Dict[int, Dict[int, RecoPixelFinal]]  # nside:(id:RecoPixelFinal}
+class RecoPixelFinalStore(MutableMapping):  # type: ignore[type-arg]
+    """A compact, array-backed `{pixel_id: RecoPixelFinal}` dict for an nside.
+
+    Each pixel is a row of a numpy structured array (see `DTYPE`),
+    instead of a dataclass instance holding an `I3Position` object.
+    `RecoPixelFinal` instances are rebuilt on access. Use `array` for
+    vectorized access to all the pixels.
+
+    `version` increments on every change, and `rewrite_version` only on
+    changes that are not appends (overwrites & deletions) -- so, if only
+    the latter is unchanged, the new pixels are `array[n_previous:]`.
+    """
+
+    DTYPE = np.dtype(
+        [
+            ("pixel_id", np.int64),
+            ("llh", np.float64),
+            ("E_in", np.float64),
+            ("E_tot", np.float64),
+            ("x", np.float64),
+            ("y", np.float64),
+            ("z", np.float64),
+            ("t", np.float64),
+            ("energy", np.float64),
+        ]
+    )
+    _INITIAL_CAPACITY = 64
+
+    def __init__(self, nside: int) -> None:
+        self.nside = nside
+        self._data = np.zeros(self._INITIAL_CAPACITY, dtype=self.DTYPE)
+        self._n = 0
+        self._index: Dict[int, int] = {}  # pixel_id -> row
+        self.version = 0
+        self.rewrite_version = 0
+
+    @property
+    def array(self) -> np.ndarray:
+        """A (read-only) view of the stored pixels, in iteration order.
+
+        The view is invalidated by the next insertion/deletion.
+        """
+        view = self._data[: self._n]
+        view.flags.writeable = False
+        return view
+
+    def __getitem__(self, pixel_id: int) -> RecoPixelFinal:
+        row = self._data[self._index[pixel_id]]
+        return RecoPixelFinal(
+            nside=self.nside,
+            pixel_id=int(row["pixel_id"]),
+            llh=float(row["llh"]),
+            reco_losses_inside=float(row["E_in"]),
+            reco_losses_total=float(row["E_tot"]),
+            position=I3Position(float(row["x"]), float(row["y"]), float(row["z"])),
+            time=float(row["t"]),
+            energy=float(row["energy"]),
+        )
+
+    def __setitem__(self, pixel_id: int, pixfin: RecoPixelFinal) -> None:
+        if (
+            not isinstance(pixfin, RecoPixelFinal)
+            or self.nside != pixfin.nside
+            or pixel_id != pixfin.pixel_id
+        ):
+            raise ValueError(
+                f"Invalid {RecoPixelFinal} for {(self.nside, pixel_id)}: {pixfin}"
+            )
+        try:
+            row = self._index[pixel_id]
+        except KeyError:
+            if self._n == len(self._data):  # full -- double the capacity
+                self._data = np.concatenate([self._data, np.zeros_like(self._data)])
+            row = self._index[pixel_id] = self._n
+            self._n += 1
+        else:
+            self.rewrite_version += 1
+        self.version += 1
+        self._data[row] = (
+            pixfin.pixel_id,
+            pixfin.llh,
+            pixfin.reco_losses_inside,
+            pixfin.reco_losses_total,
+            pixfin.position.x,
+            pixfin.position.y,
+            pixfin.position.z,
+            pixfin.time,
+            pixfin.energy,
+        )
+
+    def __delitem__(self, pixel_id: int) -> None:
+        row = self._index.pop(pixel_id)
+        last = self._n - 1
+        if row != last:  # move the last row into the hole
+            self._data[row] = self._data[last]
+            self._index[int(self._data[row]["pixel_id"])] = row
+        self._n = last
+        self.version += 1
+        self.rewrite_version += 1
+
+    def __contains__(self, pixel_id: object) -> bool:
+        return pixel_id in self._index
+
+    def __iter__(self) -> Iterator[int]:
+        # row order (this is insertion order, unless pixels were deleted)
+        return iter(self._data["pixel_id"][: self._n].tolist())
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(nside={self.nside}, n_pixels={self._n})"
+
+
+class BestPixelsTracker:
+    """Keep track of the best (lowest non-NaN llh) pixels of a `NSidesDict`.
+
+    The tracker catches up lazily: only the pixels appended since the
+    last call are looked at (see `RecoPixelFinalStore.rewrite_version`).
+    Anything else (overwrites, deletions, replaced stores) triggers a
+    full rescan. Ties are broken by nside then insertion order, same as
+    iterating over the `NSidesDict`. Asking for more than `capacity`
+    pixels grows it (with one rescan).
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self._reset()
+
+    def _reset(self) -> None:
+        # a max-heap (via negation) of the `capacity` best -- (llh, nside index, row)
+        self._heap: List[Tuple[float, int, int, int, int]] = []
+        self._nsides: List[int] = []
+        self._seen: Dict[int, Tuple[RecoPixelFinalStore, int, int]] = {}
+
+    def _push_rows(self, nside_index: int, nside: int, rows: np.ndarray, offset: int) -> None:
+        row_ids = np.arange(offset, offset + len(rows))
+        keep = ~np.isnan(rows["llh"])
+        rows, row_ids = rows[keep], row_ids[keep]
+        if len(rows) > self.capacity:  # only the best of these can make it
+            best = np.lexsort((row_ids, rows["llh"]))[: self.capacity]
+            rows, row_ids = rows[best], row_ids[best]
+
+        for llh, row_id, pixel_id in zip(
+            rows["llh"].tolist(), row_ids.tolist(), rows["pixel_id"].tolist()
+        ):
+            item = (-llh, -nside_index, -row_id, nside, pixel_id)
+            if len(self._heap) < self.capacity:
+                heapq.heappush(self._heap, item)
+            elif item > self._heap[0]:  # better than the worst kept
+                heapq.heapreplace(self._heap, item)
+
+    def _update(self, nsides_dict: "NSidesDict") -> None:
+        nsides = list(nsides_dict.keys())
+        if nsides[: len(self._nsides)] != self._nsides:  # an nside was removed
+            self._reset()
+
+        for nside_index, nside in enumerate(nsides):
+            store = nsides_dict[nside]
+            n_seen = 0
+            if nside in self._seen:
+                seen_store, seen_rewrite_version, n_seen = self._seen[nside]
+                if seen_store is not store or seen_rewrite_version != store.rewrite_version:
+                    self._reset()
+                    self._update(nsides_dict)
+                    return
+            self._push_rows(nside_index, nside, store.array[n_seen:], n_seen)
+            self._seen[nside] = (store, store.rewrite_version, len(store))
+
+        self._nsides = nsides
+
+    def get_best(self, nsides_dict: "NSidesDict", k: int) -> List[Tuple[int, int]]:
+        """Get the `(nside, pixel_id)` of (up to) the `k` best pixels, best first."""
+        if k > self.capacity:
+            self.capacity = k
+            self._reset()
+        self._update(nsides_dict)
+        return [(item[3], item[4]) for item in sorted(self._heap, reverse=True)[:k]]
+
+
+class NSidesDict(Dict[int, RecoPixelFinalStore]):
+    """A `{nside: {pixel_id: RecoPixelFinal}}` dict.
+
+    Any plain dict (or other mapping) set as a value is converted to a
+    `RecoPixelFinalStore`.
+    """
+
+    N_BEST_PIXELS_TRACKED = 16
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__()
+        self._best_pixels_tracker = BestPixelsTracker(self.N_BEST_PIXELS_TRACKED)
+        self.update(*args, **kwargs)
+
+    def get_best_pixels(self, k: int = 1) -> List[Tuple[int, int]]:
+        """Get the `(nside, pixel_id)` of the `k` pixels with the lowest
+        (non-NaN) llh, best first.
+
+        Only pixels saved since the last call are looked at, so this is
+        cheap to call repeatedly.
+        """
+        return self._best_pixels_tracker.get_best(self, k)
+
+    @staticmethod
+    def _to_store(nside: int, pixels: Mapping[int, RecoPixelFinal]) -> RecoPixelFinalStore:
+        if isinstance(pixels, RecoPixelFinalStore) and pixels.nside == nside:
+            return pixels
+        store = RecoPixelFinalStore(nside)
+        store.update(pixels)
+        return store
+
+    def __setitem__(self, nside: int, pixels: Mapping[int, RecoPixelFinal]) -> None:
+        super().__setitem__(nside, self._to_store(nside, pixels))
+
+    def update(self, *args: Any, **kwargs: Any) -> None:  # type: ignore[override]
+        for nside, pixels in dict(*args, **kwargs).items():
+            self[nside] = pixels
+
+    def setdefault(  # type: ignore[override]
+        self, nside: int, default: Mapping[int, RecoPixelFinal]
+    ) -> RecoPixelFinalStore:
+        if nside not in self:
+            self[nside] = default
+        return self[nside]
@@ -2,49 +2,161 @@
 
 import dataclasses as dc
 import logging
-from typing import Tuple
+from typing import Dict, Hashable, Optional, Tuple
 
 import numpy as np
 from skyreader import EventMetadata, SkyScanResult
 
-from .pixel_classes import NSidesDict, RecoPixelFinal
+from .pixel_classes import NSidesDict, RecoPixelFinal, RecoPixelFinalStore
 
 LOGGER = logging.getLogger(__name__)
 
 
-def from_nsides_dict(
-    nsides_dict: NSidesDict,
+def _make_dtype(
+    nside: int,
     is_complete: bool,
     event_metadata: EventMetadata,
-) -> SkyScanResult:
-    """Factory method for nsides_dict."""
+) -> np.dtype:
     event_metadata_dict = {}
     if event_metadata:
         event_metadata_dict = dc.asdict(event_metadata)
 
+    return np.dtype(  # type: ignore[call-overload,no-any-return]
+        SkyScanResult.PIXEL_TYPES[event_metadata.version],
+        metadata=dict(
+            nside=nside,
+            complete=is_complete,
+            **event_metadata_dict,
+        ),
+    )
+
+
+def from_nsides_dict(
+    nsides_dict: NSidesDict,
+    is_complete: bool,
+    event_metadata: EventMetadata,
+) -> SkyScanResult:
+    """Factory method for nsides_dict."""
     result = {}
     for nside, pixel_dict in nsides_dict.items():
-        _dtype = np.dtype(  # type: ignore[call-overload]
-            SkyScanResult.PIXEL_TYPES[event_metadata.version],
-            metadata=dict(
-                nside=nside,
-                complete=is_complete,
-                **event_metadata_dict,
-            ),
-        )
+        _dtype = _make_dtype(nside, is_complete, event_metadata)
         nside_pixel_values = np.zeros(len(pixel_dict), dtype=_dtype)
         LOGGER.debug(
             f"nside {nside} has {len(pixel_dict)} pixels / {12 * nside**2} total."
         )
 
-        for i, (pixel_id, pixfin) in enumerate(sorted(pixel_dict.items())):
-            nside_pixel_values[i] = _pixelreco_to_tuple(pixfin, nside, pixel_id)
+        if isinstance(pixel_dict, RecoPixelFinalStore):
+            # vectorized: copy each column, already validated on insertion
+            _store_array_to_pixel_values(pixel_dict.array, nside_pixel_values)
+        else:
+            for i, (pixel_id, pixfin) in enumerate(sorted(pixel_dict.items())):
+                nside_pixel_values[i] = _pixelreco_to_tuple(pixfin, nside, pixel_id)
 
         result[SkyScanResult.format_nside(nside)] = nside_pixel_values
 
     return SkyScanResult(result)
 
 
+@dc.dataclass
+class _NSideCacheEntry:
+    store: RecoPixelFinalStore
+    version: int
+    rewrite_version: int
+    n_rows: int  # number of store rows incorporated
+    values: np.ndarray  # sorted by pixel id
+
+
+class IncrementalResultBuilder:
+    """Build `SkyScanResult`s for an evolving nsides_dict, incrementally.
+
+    Each nside's (sorted) pixel values are cached. When an nside's store
+    only had pixels appended, just the new pixels are converted and
+    merged in; any other change rebuilds that nside. Nsides that are not
+    `RecoPixelFinalStore`s are always rebuilt.
+    """
+
+    def __init__(self, event_metadata: EventMetadata) -> None:
+        self.event_metadata = event_metadata
+        self._cache: Dict[int, _NSideCacheEntry] = {}
+
+    @staticmethod
+    def signature(nsides_dict: NSidesDict, is_complete: bool) -> Optional[Hashable]:
+        """Get a value that changes whenever the built result would.
+
+        Returns `None` if this cannot be determined.
+        """
+        versions = []
+        for nside, pixel_dict in nsides_dict.items():
+            if not isinstance(pixel_dict, RecoPixelFinalStore):
+                return None
+            versions.append((nside, id(pixel_dict), pixel_dict.version))
+        return (tuple(versions), is_complete)
+
+    def _get_nside_values(
+        self,
+        store: RecoPixelFinalStore,
+        _dtype: np.dtype,
+    ) -> np.ndarray:
+        entry = self._cache.get(store.nside)
+
+        if entry and entry.store is store and entry.rewrite_version == store.rewrite_version:
+            if entry.version != store.version:  # only appends -- merge them in
+                new_rows = store.array[entry.n_rows :]
+                new_values = np.zeros(len(new_rows), dtype=_dtype)
+                _store_array_to_pixel_values(new_rows, new_values)
+                names = _dtype.names
+                assert names is not None  # it's a structured dtype
+                index_field = names[0]
+                entry.values = np.insert(
+                    entry.values,
+                    np.searchsorted(entry.values[index_field], new_values[index_field]),
+                    new_values,
+                )
+                entry.version = store.version
+                entry.n_rows = len(store)
+        else:  # (re)build from scratch
+            values = np.zeros(len(store), dtype=_dtype)
+            _store_array_to_pixel_values(store.array, values)
+            entry = self._cache[store.nside] = _NSideCacheEntry(
+                store, store.version, store.rewrite_version, len(store), values
+            )
+
+        if entry.values.dtype != _dtype or entry.values.dtype.metadata != _dtype.metadata:
+            # ex: the 'complete' metadata changed -- no need to copy the data
+            entry.values = entry.values.view(_dtype)
+        return entry.values
+
+    def build(self, nsides_dict: NSidesDict, is_complete: bool) -> SkyScanResult:
+        """Get the `SkyScanResult` for the current nsides_dict."""
+        result = {}
+        for nside, pixel_dict in nsides_dict.items():
+            _dtype = _make_dtype(nside, is_complete, self.event_metadata)
+            if isinstance(pixel_dict, RecoPixelFinalStore):
+                nside_pixel_values = self._get_nside_values(pixel_dict, _dtype)
+            else:
+                nside_pixel_values = from_nsides_dict(
+                    {nside: pixel_dict}, is_complete, self.event_metadata
+                ).result[SkyScanResult.format_nside(nside)]
+            result[SkyScanResult.format_nside(nside)] = nside_pixel_values
+
+        return SkyScanResult(result)
+
+
+# the `RecoPixelFinalStore.DTYPE` fields, in `SkyScanResult.PIXEL_TYPES` order
+_STORE_FIELDS = ("pixel_id", "llh", "E_in", "E_tot", "x", "y", "z", "t")
+
+
+def _store_array_to_pixel_values(
+    store_array: np.ndarray, nside_pixel_values: np.ndarray
+) -> None:
+    """Fill `nside_pixel_values` with the `store_array` rows, sorted by pixel id."""
+    ordered = store_array[np.argsort(store_array["pixel_id"], kind="stable")]
+    names = nside_pixel_values.dtype.names
+    assert names is not None  # it's a structured dtype
+    for name, store_field in zip(names, _STORE_FIELDS):
+        nside_pixel_values[name] = ordered[store_field]
+
+
 def _pixelreco_to_tuple(
     pixfin: RecoPixelFinal, nside: int, pixel_id: int
 ) -> Tuple[int, float, float, float, float, float, float, float]:
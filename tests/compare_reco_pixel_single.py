@@ -1,30 +1,46 @@
 """Testing script for comparing two reco pixel outfiles."""
 
 import argparse
+import dataclasses as dc
 import json
 import logging
 from pathlib import Path
+from typing import List
 
 from skyreader import SkyScanResult, EventMetadata
 from wipac_dev_tools import logging_tools
 
 from compare_scan_results import compare_then_exit
-from skymap_scanner.config import MSG_KEY_RECO_PIXEL_VARIATION_PKL_B64
 from skymap_scanner.utils import to_skyscan_result
-from skymap_scanner.utils.messages import Serialization
+from skymap_scanner.utils.messages import decode_reco_pixel_variations_msg
 from skymap_scanner.utils.pixel_classes import RecoPixelFinal
 
 
-def load_from_outfile(outfile_fpath: Path) -> SkyScanResult:
-    """Load a SkyScanResult from the outfile."""
+def load_from_outfile(outfile_fpath: Path) -> List[RecoPixelFinal]:
+    """Load the reco(s) from the outfile.
+
+    There are several if the infile held a batch of PFrames (see
+    `make_batched_reco_pixel_infile.py`).
+    """
     with open(outfile_fpath, "r") as f:
         msg = json.load(f)
 
-    pixfin = RecoPixelFinal.from_recopixelvariation(
-        Serialization.decode_pkl_b64(msg[MSG_KEY_RECO_PIXEL_VARIATION_PKL_B64])
-    )
+    return [
+        RecoPixelFinal.from_recopixelvariation(rpv)
+        for rpv in decode_reco_pixel_variations_msg(msg)[0]
+    ]
+
+
+def to_result(pixfins: List[RecoPixelFinal]) -> SkyScanResult:
+    """Make a SkyScanResult from the reco(s).
+
+    A batch's recos are each given their own pixel (ids 0, 1, ...), so
+    they're all compared.
+    """
+    if len(pixfins) > 1:
+        pixfins = [dc.replace(p, pixel_id=i) for i, p in enumerate(pixfins)]
     return to_skyscan_result.from_nsides_dict(
-        {pixfin.nside: {pixfin.pixel_id: pixfin}},
+        {pixfins[0].nside: {p.pixel_id: p for p in pixfins}},
         is_complete=True,
         event_metadata=EventMetadata(0, 0, "", 0., False)
     )
@@ -43,7 +59,7 @@ def main():
     parser.add_argument(
         "-a",
         "--actual",
-        help="The first (actual) outfile",
+        help="The first (actual) outfile -- may hold a batch of recos of the expected's PFrame",
         required=True,
         type=Path,
     )
@@ -71,8 +87,11 @@ def main():
     args = parser.parse_args()
     logging_tools.log_argparse_args(args, logger=logger, level="WARNING")
 
-    actual = load_from_outfile(args.actual)
-    expected = load_from_outfile(args.expected)
+    actual_pixfins = load_from_outfile(args.actual)
+    # if the actual is a batch of the expected's PFrame, each must match the expected
+    [expected_pixfin] = load_from_outfile(args.expected)
+    actual = to_result(actual_pixfins)
+    expected = to_result([expected_pixfin] * len(actual_pixfins))
 
     compare_then_exit(
         actual,
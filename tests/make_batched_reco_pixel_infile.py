@@ -0,0 +1,81 @@
+"""Script for making a batched reco infile from a single-PFrame infile.
+
+The batch is the infile's PFrame repeated, as position variations
+0, 1, ... -- so each of the batch's recos (done in one tray) can be
+compared to the single PFrame's reco (see `compare_reco_pixel_single.py`).
+"""
+
+import argparse
+import json
+import logging
+from pathlib import Path
+
+from icecube import icetray  # type: ignore[import-not-found]
+from wipac_dev_tools import logging_tools
+
+from skymap_scanner import config as cfg
+from skymap_scanner.utils import messages
+
+
+def main():
+    """Read the single-PFrame infile and write the batched infile."""
+
+    logging.basicConfig(level=logging.DEBUG)
+
+    logger = logging.getLogger(__name__)
+
+    parser = argparse.ArgumentParser(description="Make a batched reco infile")
+
+    parser.add_argument(
+        "-i",
+        "--infile",
+        help="The single-PFrame infile",
+        required=True,
+        type=Path,
+    )
+    parser.add_argument(
+        "-o",
+        "--outfile",
+        help="The batched infile to write",
+        required=True,
+        type=Path,
+    )
+    parser.add_argument(
+        "-n",
+        "--n-pframes",
+        help="The number of PFrames in the batch",
+        default=2,
+        type=int,
+    )
+
+    args = parser.parse_args()
+    logging_tools.log_argparse_args(args, logger=logger, level="WARNING")
+
+    with open(args.infile, "r") as f:
+        (
+            reco_algo,
+            [pframe],
+            realtime_format_version,
+            wire_version,
+            _,
+        ) = messages.decode_pframes_msg(json.load(f))
+
+    batch = []
+    for posvar_id in range(args.n_pframes):
+        frame = icetray.I3Frame(pframe)
+        del frame[cfg.I3FRAME_POSVAR]
+        frame[cfg.I3FRAME_POSVAR] = icetray.I3Int(posvar_id)
+        batch.append(frame)
+
+    with open(args.outfile, "w") as f:
+        json.dump(
+            messages.encode_pframes_msg(
+                reco_algo, realtime_format_version, batch, wire_version
+            ),
+            f,
+        )
+    logger.info(f"Wrote {len(batch)} PFrames to {args.outfile}.")
+
+
+if __name__ == "__main__":
+    main()
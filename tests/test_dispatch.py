@@ -0,0 +1,454 @@
+"""Tests for dispatching pixel variations to clients (using a fake clock)."""
+
+import asyncio
+import contextlib
+import dataclasses as dc
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+from icecube import icetray  # type: ignore[import-not-found]
+
+from skymap_scanner import config as cfg
+from skymap_scanner.server import SERVER_ENV, dispatch
+from skymap_scanner.server.dispatch import (
+    Dispatcher,
+    calc_auto_window,
+    calc_bundle_size,
+    calc_n_busy_workers,
+    calc_priority,
+    calc_straggler_timeout,
+)
+from skymap_scanner.server.reporter import WorkerStatsCollection
+from skymap_scanner.utils import messages
+from skymap_scanner.utils.pixel_classes import PTuple, pframe_tuple
+
+
+class FakeClock:
+    """Stands in for the `time` module, so time only passes when told to."""
+
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, sec: float) -> None:
+        self.now += sec
+
+
+class FakeCollector:
+    """Records the dispatcher's calls to the collector."""
+
+    def __init__(self) -> None:
+        self.registered: List[PTuple] = []
+        self.restamped: List[PTuple] = []
+        self.expecting_duplicates: List[PTuple] = []
+
+    def register_sent_pixvar(self, sent_pixvar: Any) -> None:
+        self.registered.append(
+            (sent_pixvar.nside, sent_pixvar.pixel_id, sent_pixvar.posvar_id)
+        )
+
+    def restamp_sent_time(self, id_tuple: PTuple) -> None:
+        self.restamped.append(id_tuple)
+
+    def expect_duplicates(self, id_tuple: PTuple) -> None:
+        self.expecting_duplicates.append(id_tuple)
+
+
+class FakeQueue:
+    """Records the messages sent to clients."""
+
+    def __init__(self) -> None:
+        self.sent: List[List[PTuple]] = []  # the pframes' ids, per message
+
+    @contextlib.asynccontextmanager
+    async def open_pub(self) -> Any:
+        yield self
+
+    async def send(self, msg: Dict[str, Any]) -> None:
+        pframes = messages.decode_pframes_msg(msg)[1]
+        self.sent.append([pframe_tuple(f) for f in pframes])
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(dispatch, "time", clock)
+    return clock
+
+
+def set_server_env(monkeypatch: pytest.MonkeyPatch, **kwargs: Any) -> None:
+    """Override the dispatcher's env vars (it's a frozen dataclass)."""
+    monkeypatch.setattr(dispatch, "SERVER_ENV", dc.replace(SERVER_ENV, **kwargs))
+
+
+def make_pframe(nside: int, pixel_id: int, posvar_id: int) -> icetray.I3Frame:
+    frame = icetray.I3Frame(icetray.I3Frame.Physics)
+    frame[cfg.I3FRAME_NSIDE] = icetray.I3Int(nside)
+    frame[cfg.I3FRAME_PIXEL] = icetray.I3Int(pixel_id)
+    frame[cfg.I3FRAME_POSVAR] = icetray.I3Int(posvar_id)
+    return frame
+
+
+def make_worker_stats(
+    nside: int,
+    n_recos: int,
+    runtime: float = 10.0,
+    roundtrip: float = 12.0,
+    interval: float = 2.0,
+    worker_stats_collection: Optional[WorkerStatsCollection] = None,
+) -> WorkerStatsCollection:
+    """Add `n_recos` recos, started `interval` sec apart, to the collection."""
+    if worker_stats_collection is None:
+        worker_stats_collection = WorkerStatsCollection()
+    for i in range(n_recos):
+        start = i * interval
+        worker_stats_collection.update(nside, runtime, start, start + roundtrip)
+    return worker_stats_collection
+
+
+async def settle() -> None:
+    """Let the running tasks go until they're all waiting again."""
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+#
+# calc_*()
+#
+
+
+def test_calc_n_busy_workers() -> None:
+    assert calc_n_busy_workers(WorkerStatsCollection()) is None
+    # 10 recos over 30 sec -> 3 sec/reco, each taking 10 sec
+    stats = make_worker_stats(8, 10)
+    assert calc_n_busy_workers(stats) == pytest.approx(10 / 3)
+
+
+def test_calc_auto_window() -> None:
+    assert calc_auto_window(WorkerStatsCollection(), 1.5) is None
+    # (10 sec reco + 2 sec overhead) / 3 sec/reco -> 4 in flight
+    stats = make_worker_stats(8, 10)
+    assert calc_auto_window(stats, 1.0) == 4
+    assert calc_auto_window(stats, 1.5) == 6
+
+
+def test_calc_bundle_size() -> None:
+    # unknown runtimes
+    assert calc_bundle_size(None, 1000, 4.0, 10.0) == 1
+    assert calc_bundle_size(2.0, 1000, None, 10.0) == 1
+    # sized by the target
+    assert calc_bundle_size(2.0, 1000, 4.0, 10.0) == 5
+    assert calc_bundle_size(20.0, 1000, 4.0, 10.0) == 1
+    # shrinks near the end of the round
+    assert calc_bundle_size(2.0, 12, 4.0, 10.0) == 3
+    assert calc_bundle_size(2.0, 2, 4.0, 10.0) == 1
+    assert calc_bundle_size(2.0, 3, 0.5, 10.0) == 3
+    # capped
+    assert calc_bundle_size(0.01, 10**6, 1.0, 10.0) == dispatch.BUNDLE_MAX_PIXELS
+
+
+def test_calc_straggler_timeout() -> None:
+    n_min = dispatch.STRAGGLER_MIN_ROUNDTRIPS
+    assert calc_straggler_timeout(WorkerStatsCollection(), 8, 3.0) is None
+    assert calc_straggler_timeout(make_worker_stats(8, n_min - 1), 8, 3.0) is None
+
+    stats = make_worker_stats(8, n_min)
+    assert calc_straggler_timeout(stats, 8, 3.0) == 3.0 * 12.0
+    # too few of the nside's own -> use all nsides'
+    make_worker_stats(64, 2, roundtrip=100.0, worker_stats_collection=stats)
+    assert calc_straggler_timeout(stats, 64, 3.0) == 3.0 * 12.0
+    # enough of the nside's own
+    make_worker_stats(64, n_min, roundtrip=100.0, worker_stats_collection=stats)
+    assert calc_straggler_timeout(stats, 64, 3.0) == 3.0 * 100.0
+
+
+#
+# Dispatcher
+#
+
+
+def make_dispatcher(
+    worker_stats_collection: Optional[WorkerStatsCollection] = None,
+) -> Tuple[Dispatcher, FakeCollector, FakeQueue]:
+    collector, queue = FakeCollector(), FakeQueue()
+    dispatcher = Dispatcher(
+        queue,  # type: ignore[arg-type]
+        collector,  # type: ignore[arg-type]
+        worker_stats_collection or WorkerStatsCollection(),
+        "dummy",
+        "0",
+    )
+    return dispatcher, collector, queue
+
+
+def test_submit_window_and_priority(
+    clock: FakeClock, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    set_server_env(monkeypatch, SKYSCAN_DISPATCH_MAX_IN_FLIGHT=2)
+    dispatcher, collector, queue = make_dispatcher()
+
+    async def go() -> None:
+        dispatcher.submit([make_pframe(8, 0, 0), make_pframe(8, 0, 1)], priority=0)
+        dispatcher.submit([make_pframe(8, 1, 0)], priority=0)
+        dispatcher.submit([make_pframe(8, 2, 0)], priority=5)
+        # registered right away, even though they're not sent yet
+        assert collector.registered == [(8, 0, 0), (8, 0, 1), (8, 1, 0), (8, 2, 0)]
+        assert dispatcher.n_waiting == 4
+
+        task = asyncio.create_task(dispatcher.run())
+        await settle()
+        # highest priority first, then until the window is full
+        assert queue.sent == [[(8, 2, 0)], [(8, 0, 0), (8, 0, 1)]]
+        assert dispatcher.n_in_flight == 3  # a message isn't split up
+        assert dispatcher.n_waiting == 1
+        assert collector.restamped == [(8, 2, 0), (8, 0, 0), (8, 0, 1)]
+
+        # returning one isn't enough room...
+        dispatcher.mark_returned((8, 2, 0))
+        await settle()
+        assert len(queue.sent) == 2
+        assert not dispatcher.is_in_flight((8, 2, 0))
+        # ...but two is
+        dispatcher.mark_returned((8, 0, 0))
+        await settle()
+        assert queue.sent[2:] == [[(8, 1, 0)]]
+        assert dispatcher.n_in_flight == 2
+        assert dispatcher.n_waiting == 0
+
+        # returning an unknown (or already returned) one changes nothing
+        dispatcher.mark_returned((8, 0, 0))
+        dispatcher.mark_returned((8, 99, 0))
+        assert dispatcher.n_in_flight == 2
+
+        task.cancel()
+
+    asyncio.run(go())
+
+
+def test_rounds_and_refinements_priority(
+    clock: FakeClock, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Rounds & refinements share one priority: the finest nside, then submission order."""
+    set_server_env(monkeypatch, SKYSCAN_DISPATCH_MAX_IN_FLIGHT=1)
+    dispatcher, collector, queue = make_dispatcher()
+    nsides = [8, 64, 512]
+
+    def submit(pframes: List[icetray.I3Frame]) -> None:
+        dispatcher.submit(pframes, calc_priority(pframes, nsides))
+
+    async def go() -> None:
+        # a round of nsides 8 & 64...
+        submit([make_pframe(8, 0, 0)])
+        submit([make_pframe(8, 1, 0), make_pframe(64, 0, 0)])
+        # ...a refinement...
+        submit([make_pframe(512, 0, 0)])
+        submit([make_pframe(64, 1, 0)])
+        # ...and a later round, which doesn't jump ahead of the earlier
+        submit([make_pframe(8, 2, 0)])
+        submit([make_pframe(64, 2, 0)])
+
+        task = asyncio.create_task(dispatcher.run())
+        for pframe in [
+            (512, 0, 0),
+            (8, 1, 0),
+            (64, 1, 0),
+            (64, 2, 0),
+            (8, 0, 0),
+            (8, 2, 0),
+        ]:
+            await settle()
+            assert queue.sent[-1][0] == pframe
+            dispatcher.mark_returned(pframe)
+            if pframe == (8, 1, 0):
+                dispatcher.mark_returned((64, 0, 0))
+        await settle()
+        assert dispatcher.n_waiting == 0
+
+        task.cancel()
+
+    assert calc_priority([make_pframe(8, 0, 0)], nsides) == 0
+    assert calc_priority([make_pframe(8, 0, 0), make_pframe(512, 0, 0)], nsides) == 2
+    asyncio.run(go())
+
+
+def test_unbounded_window(clock: FakeClock, monkeypatch: pytest.MonkeyPatch) -> None:
+    set_server_env(monkeypatch, SKYSCAN_DISPATCH_MAX_IN_FLIGHT=0)
+    dispatcher, _, queue = make_dispatcher()
+
+    async def go() -> None:
+        task = asyncio.create_task(dispatcher.run())
+        for i in range(50):
+            dispatcher.submit([make_pframe(8, i, 0)], priority=0)
+        await settle()
+        assert len(queue.sent) == 50
+        assert dispatcher.n_in_flight == 50
+        task.cancel()
+
+    asyncio.run(go())
+
+
+def test_auto_window(clock: FakeClock, monkeypatch: pytest.MonkeyPatch) -> None:
+    set_server_env(
+        monkeypatch,
+        SKYSCAN_DISPATCH_MAX_IN_FLIGHT=2,
+        SKYSCAN_DISPATCH_AUTO_WINDOW=True,
+        SKYSCAN_DISPATCH_AUTO_WINDOW_HEADROOM=1.5,
+    )
+    stats = WorkerStatsCollection()
+    dispatcher, _, queue = make_dispatcher(stats)
+
+    async def go() -> None:
+        task = asyncio.create_task(dispatcher.run())
+        for i in range(20):
+            dispatcher.submit([make_pframe(8, i, 0)], priority=0)
+        await settle()
+        assert dispatcher.n_in_flight == 2  # no stats -> the minimum
+
+        # the window is not re-estimated until the interval has passed
+        make_worker_stats(8, 10, worker_stats_collection=stats)  # -> 6
+        dispatcher.mark_returned((8, 0, 0))
+        await settle()
+        assert dispatcher.n_in_flight == 2
+        clock.advance(dispatch.AUTO_WINDOW_UPDATE_INTERVAL_SEC + 1)
+        dispatcher.mark_returned((8, 1, 0))
+        await settle()
+        assert dispatcher.n_in_flight == 6
+        assert len(queue.sent) == 8
+        task.cancel()
+
+    asyncio.run(go())
+
+
+def test_retry(clock: FakeClock, monkeypatch: pytest.MonkeyPatch) -> None:
+    set_server_env(monkeypatch, SKYSCAN_DISPATCH_MAX_IN_FLIGHT=1, SKYSCAN_RETRY_BUDGET=2)
+    dispatcher, collector, queue = make_dispatcher()
+
+    async def go() -> None:
+        task = asyncio.create_task(dispatcher.run())
+        dispatcher.submit([make_pframe(8, 0, 0), make_pframe(8, 0, 1)], priority=0)
+        dispatcher.submit([make_pframe(8, 1, 0)], priority=0)
+        await settle()
+        assert queue.sent == [[(8, 0, 0), (8, 0, 1)]]
+
+        # not in flight -> no retry
+        assert not dispatcher.retry((8, 1, 0))
+
+        # re-sent by itself, ahead of what's waiting & without taking more room
+        clock.advance(5)
+        assert dispatcher.retry((8, 0, 1))
+        await settle()
+        assert queue.sent[1:] == [[(8, 0, 1)]]
+        assert collector.expecting_duplicates == [(8, 0, 1)]
+        assert dispatcher.n_in_flight == 2
+        assert dispatcher.n_waiting == 1
+        assert dispatcher._in_flight[(8, 0, 1)] == clock.now  # restarted the clock
+
+        # until the budget is spent
+        assert dispatcher.retry((8, 0, 1))
+        assert not dispatcher.retry((8, 0, 1))
+        await settle()
+        assert len(queue.sent) == 3
+
+        # a returned one is forgotten -- and if queued to be re-sent, it isn't
+        assert dispatcher.retry((8, 0, 0))
+        dispatcher.mark_returned((8, 0, 0))
+        assert not dispatcher.retry((8, 0, 0))
+        await settle()
+        assert (8, 0, 0) not in dispatcher._pframes
+        assert [(8, 0, 0)] not in queue.sent[3:]
+
+        task.cancel()
+
+    asyncio.run(go())
+
+
+def test_stragglers(clock: FakeClock, monkeypatch: pytest.MonkeyPatch) -> None:
+    set_server_env(
+        monkeypatch,
+        SKYSCAN_STRAGGLER_RTT_MULTIPLE=3.0,
+        SKYSCAN_STRAGGLER_MAX_RESENDS=2,
+    )
+    monkeypatch.setattr(dispatch, "STRAGGLER_CHECK_INTERVAL_SEC", 0)
+    stats = WorkerStatsCollection()
+    dispatcher, collector, queue = make_dispatcher(stats)
+    timeout = 3.0 * 12.0
+
+    async def go() -> None:
+        task = asyncio.create_task(dispatcher.run())
+        dispatcher.submit([make_pframe(8, 0, 0)], priority=0)
+        dispatcher.submit([make_pframe(64, 0, 0)], priority=0)
+        await settle()
+
+        # not enough stats
+        clock.advance(1000)
+        assert dispatcher.find_stragglers() == []
+
+        make_worker_stats(8, dispatch.STRAGGLER_MIN_ROUNDTRIPS, worker_stats_collection=stats)
+        assert sorted(dispatcher.find_stragglers()) == [(8, 0, 0), (64, 0, 0)]
+        dispatcher.mark_returned((64, 0, 0))
+
+        # re-sent twice at most, each time the clock restarts
+        checks = asyncio.create_task(dispatcher.run_straggler_checks())
+        await settle()
+        assert queue.sent[2:] == [[(8, 0, 0)]]
+        assert collector.expecting_duplicates == [(8, 0, 0)]
+        assert dispatcher.find_stragglers() == []
+        clock.advance(timeout - 1)
+        assert dispatcher.find_stragglers() == []
+        clock.advance(2)
+        await settle()
+        assert queue.sent[2:] == [[(8, 0, 0)], [(8, 0, 0)]]
+        clock.advance(timeout + 1)
+        await settle()
+        assert dispatcher.find_stragglers() == []
+        assert len(queue.sent) == 4
+
+        checks.cancel()
+        task.cancel()
+
+    asyncio.run(go())
+
+
+def test_deadlines(clock: FakeClock, monkeypatch: pytest.MonkeyPatch) -> None:
+    set_server_env(monkeypatch, SKYSCAN_RETRY_BUDGET=1, SKYSCAN_RETRY_DEADLINE_SEC=100)
+    monkeypatch.setattr(dispatch, "DEADLINE_CHECK_INTERVAL_SEC", 0)
+    dispatcher, collector, queue = make_dispatcher()
+    given_up: List[PTuple] = []
+
+    async def give_up(id_tuple: PTuple) -> None:
+        given_up.append(id_tuple)
+        dispatcher.mark_returned(id_tuple)
+
+    async def go() -> None:
+        task = asyncio.create_task(dispatcher.run())
+        dispatcher.submit([make_pframe(8, 0, 0)], priority=0)
+        await settle()
+        clock.advance(50)
+        dispatcher.submit([make_pframe(8, 1, 0)], priority=0)
+        await settle()
+
+        clock.advance(51)
+        assert dispatcher.find_overdue() == [(8, 0, 0)]
+
+        # retried once...
+        checks = asyncio.create_task(dispatcher.run_deadline_checks(give_up))
+        await settle()
+        assert queue.sent[2:] == [[(8, 0, 0)]]
+        assert given_up == []
+        # ...then given up on
+        clock.advance(101)
+        await settle()
+        assert given_up == [(8, 0, 0)]
+        assert queue.sent[3:] == [[(8, 1, 0)]]  # its first retry
+        clock.advance(101)
+        await settle()
+        assert given_up == [(8, 0, 0), (8, 1, 0)]
+        assert dispatcher.n_in_flight == 0
+        assert collector.expecting_duplicates.count((8, 0, 0)) == 2
+
+        checks.cancel()
+        task.cancel()
+
+    asyncio.run(go())
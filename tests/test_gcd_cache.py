@@ -0,0 +1,92 @@
+"""Tests for caching parsed GCD frame packets."""
+
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import pytest
+
+from skymap_scanner.utils import gcd_cache
+
+
+class FakeGeometry:
+    """Stands in for an `I3Geometry`."""
+
+    def __init__(self, omgeo: Dict[str, int]) -> None:
+        self.omgeo = omgeo
+
+
+@pytest.fixture(autouse=True)
+def empty_cache() -> Iterator[None]:
+    gcd_cache.clear()
+    yield
+    gcd_cache.clear()
+
+
+@pytest.fixture
+def parsed(monkeypatch: pytest.MonkeyPatch) -> List[str]:
+    """Parse files into fake frames, recording each file parsed."""
+    parsed: List[str] = []
+
+    def fake_load_framepacket_from_file(path: str) -> List[Dict[str, Any]]:
+        parsed.append(path)
+        return [{"I3Geometry": FakeGeometry({"om": len(parsed)})}]
+
+    monkeypatch.setattr(
+        gcd_cache, "load_framepacket_from_file", fake_load_framepacket_from_file
+    )
+    return parsed
+
+
+def write_gcd(path: Path, content: bytes, mtime_ns: int) -> str:
+    path.write_bytes(content)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+    return str(path)
+
+
+def test_parsed_once(tmp_path: Path, parsed: List[str]) -> None:
+    fpath = write_gcd(tmp_path / "gcd.i3", b"gcd", 10**9)
+
+    frames = gcd_cache.load_gcd_frames(fpath)
+    assert gcd_cache.load_gcd_frames(fpath) is frames
+    omgeo = gcd_cache.load_omgeo(fpath)
+    assert omgeo == {"om": 1}
+    assert gcd_cache.load_omgeo(fpath) is omgeo
+    assert parsed == [os.path.realpath(fpath)]
+
+    # the file changed -> re-parsed
+    write_gcd(tmp_path / "gcd.i3", b"new gcd", 2 * 10**9)
+    assert gcd_cache.load_omgeo(fpath) == {"om": 2}
+    assert len(parsed) == 2
+
+    # cleared -> re-parsed
+    gcd_cache.clear()
+    gcd_cache.load_gcd_frames(fpath)
+    assert len(parsed) == 3
+
+
+def test_disk_cache(tmp_path: Path, parsed: List[str]) -> None:
+    fpath = write_gcd(tmp_path / "gcd.i3", b"gcd", 10**9)
+    disk_cache_dir = tmp_path / "cache"
+
+    frames = gcd_cache.load_gcd_frames(fpath, disk_cache_dir)
+    assert len(list(disk_cache_dir.glob("*.pkl"))) == 1
+
+    # a new process (an empty in-memory cache) reads it from disk
+    gcd_cache.clear()
+    from_disk = gcd_cache.load_gcd_frames(fpath, disk_cache_dir)
+    assert from_disk is not frames
+    assert from_disk[0]["I3Geometry"].omgeo == {"om": 1}
+    assert len(parsed) == 1
+
+    # only the metadata changed -> not re-parsed
+    write_gcd(tmp_path / "gcd.i3", b"gcd", 2 * 10**9)
+    assert gcd_cache.load_gcd_frames(fpath, disk_cache_dir) is from_disk
+    assert len(parsed) == 1
+
+    # a corrupt cache file is re-parsed
+    gcd_cache.clear()
+    for pkl in disk_cache_dir.glob("*.pkl"):
+        pkl.write_bytes(b"not a pickle")
+    gcd_cache.load_gcd_frames(fpath, disk_cache_dir)
+    assert len(parsed) == 2
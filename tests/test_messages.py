@@ -0,0 +1,189 @@
+"""Round-trip tests for the message encodings (under each wire version)."""
+
+import math
+
+import pytest
+from icecube import dataclasses, icetray  # type: ignore[import-not-found]
+
+from skymap_scanner import config as cfg
+from skymap_scanner.utils import messages
+from skymap_scanner.utils.pixel_classes import RecoPixelVariation, pframe_tuple
+
+
+def _rpv(nside: int, pixel_id: int, posvar_id: int, **kwargs) -> RecoPixelVariation:
+    values = dict(
+        llh=-123.25,
+        reco_losses_inside=-0.5,
+        reco_losses_total=1e300,
+        position=dataclasses.I3Position(-1.5, 2.25, -1e-300),
+        time=-10000.125,
+        energy=float("inf"),
+    )
+    values.update(kwargs)
+    return RecoPixelVariation(
+        nside=nside, pixel_id=pixel_id, posvar_id=posvar_id, **values
+    )
+
+
+RPVS = [
+    _rpv(8, 0, 0),
+    _rpv(1024, 12 * 1024**2 - 1, 7, llh=0.0, energy=-0.0),
+    _rpv(
+        64,
+        1234,
+        2,
+        llh=float("nan"),
+        reco_losses_inside=float("nan"),
+        reco_losses_total=float("-inf"),
+        position=dataclasses.I3Position(float("nan"), float("nan"), float("nan")),
+        time=float("nan"),
+        energy=float("nan"),
+    ),
+    RecoPixelVariation.nan((2, 3, 4)),
+]
+
+
+def _values(rpv: RecoPixelVariation) -> tuple:
+    return (
+        rpv.nside,
+        rpv.pixel_id,
+        rpv.posvar_id,
+        rpv.llh,
+        rpv.reco_losses_inside,
+        rpv.reco_losses_total,
+        rpv.position.x,
+        rpv.position.y,
+        rpv.position.z,
+        rpv.time,
+        rpv.energy,
+    )
+
+
+def assert_same_rpv(actual: RecoPixelVariation, expected: RecoPixelVariation) -> None:
+    """Assert the two are the same, value for value (NaN == NaN & the sign of zero matters)."""
+    assert actual.id_tuple == expected.id_tuple
+    for a, e in zip(_values(actual), _values(expected)):
+        assert type(a) is type(e)
+        if isinstance(e, float) and math.isnan(e):
+            assert math.isnan(a)
+        else:
+            assert a == e
+            assert math.copysign(1, a) == math.copysign(1, e)
+
+
+@pytest.mark.parametrize("rpv", RPVS, ids=lambda r: str(r.id_tuple))
+def test_reco_pixel_variation_bytes(rpv: RecoPixelVariation) -> None:
+    data = rpv.to_bytes()
+    assert len(data) == RecoPixelVariation._STRUCT.size
+    assert_same_rpv(RecoPixelVariation.from_bytes(data), rpv)
+
+
+def test_reco_pixel_variation_bytes_overflow() -> None:
+    with pytest.raises(Exception):  # struct.error -- an int64 can't hold it
+        _rpv(8, 2**63, 0).to_bytes()
+
+
+@pytest.mark.parametrize("wire_version", cfg.WIRE_VERSIONS)
+@pytest.mark.parametrize("rpv", RPVS, ids=lambda r: str(r.id_tuple))
+def test_reco_pixel_variation_msg(rpv: RecoPixelVariation, wire_version: int) -> None:
+    msg = messages.encode_reco_pixel_variation_msg(rpv, 12.5, wire_version)
+    assert messages.get_wire_version(msg) == wire_version
+    assert not messages.is_reco_failure_msg(msg)
+
+    actual, runtime = messages.decode_reco_pixel_variation_msg(msg)
+    assert_same_rpv(actual, rpv)
+    assert runtime == 12.5
+
+    # also readable as a multi-variation message
+    actuals, omitted, runtime = messages.decode_reco_pixel_variations_msg(msg)
+    assert len(actuals) == 1
+    assert_same_rpv(actuals[0], rpv)
+    assert omitted == []
+    assert runtime == 12.5
+
+
+@pytest.mark.parametrize("wire_version", cfg.WIRE_VERSIONS)
+def test_reco_pixel_variations_msg(wire_version: int) -> None:
+    omitted = [(8, 0, 1), (8, 0, 2)]
+    msg = messages.encode_reco_pixel_variations_msg(RPVS, omitted, 3.0, wire_version)
+    assert messages.get_wire_version(msg) == wire_version
+
+    actuals, actual_omitted, runtime = messages.decode_reco_pixel_variations_msg(msg)
+    assert len(actuals) == len(RPVS)
+    for actual, expected in zip(actuals, RPVS):
+        assert_same_rpv(actual, expected)
+    assert actual_omitted == omitted
+    assert runtime == 3.0
+
+
+def test_reco_failure_msg() -> None:
+    msg = messages.encode_reco_failure_msg([(8, 1, 0), (8, 1, 1)], "boom", 1.5)
+    assert messages.is_reco_failure_msg(msg)
+    assert messages.decode_reco_failure_msg(msg) == ([(8, 1, 0), (8, 1, 1)], "boom", 1.5)
+
+
+def test_unknown_wire_version() -> None:
+    with pytest.raises(ValueError):
+        messages.encode_reco_pixel_variation_msg(RPVS[0], 1.0, 999)
+    msg = messages.encode_reco_pixel_variation_msg(RPVS[0], 1.0, cfg.WIRE_VERSION_BINARY)
+    msg[cfg.MSG_KEY_WIRE_VERSION] = 999
+    with pytest.raises(ValueError):
+        messages.decode_reco_pixel_variation_msg(msg)
+
+
+#
+# PFrames
+#
+
+
+def _pframe(nside: int, pixel_id: int, posvar_id: int) -> icetray.I3Frame:
+    frame = icetray.I3Frame(icetray.I3Frame.Physics)
+    frame[cfg.I3FRAME_NSIDE] = icetray.I3Int(nside)
+    frame[cfg.I3FRAME_PIXEL] = icetray.I3Int(pixel_id)
+    frame[cfg.I3FRAME_POSVAR] = icetray.I3Int(posvar_id)
+    particle = dataclasses.I3Particle()
+    particle.pos = dataclasses.I3Position(-1.5, 2.25, float("nan"))
+    particle.time = -10000.125
+    particle.energy = float("nan")
+    frame[cfg.OUTPUT_PARTICLE_NAME] = particle
+    return frame
+
+
+def assert_same_pframe(actual: icetray.I3Frame, expected: icetray.I3Frame) -> None:
+    """Assert the two are the same, key for key."""
+    assert actual.Stop == expected.Stop
+    assert sorted(actual.keys()) == sorted(expected.keys())
+    assert pframe_tuple(actual) == pframe_tuple(expected)
+    a, e = actual[cfg.OUTPUT_PARTICLE_NAME], expected[cfg.OUTPUT_PARTICLE_NAME]
+    assert (a.pos.x, a.pos.y, a.time) == (e.pos.x, e.pos.y, e.time)
+    assert math.isnan(a.pos.z) and math.isnan(a.energy)
+
+
+@pytest.mark.parametrize("wire_version", cfg.WIRE_VERSIONS)
+def test_pframe_msg(wire_version: int) -> None:
+    pframe = _pframe(64, 1234, 5)
+    msg = messages.encode_pframe_msg("dummy", "0", pframe, wire_version)
+    assert messages.get_wire_version(msg) == wire_version
+
+    reco_algo, actual, realtime_format_version, actual_wv = messages.decode_pframe_msg(msg)
+    assert (reco_algo, realtime_format_version, actual_wv) == ("dummy", "0", wire_version)
+    assert_same_pframe(actual, pframe)
+
+    # also readable as a multi-frame message
+    reco_algo, actuals, _, actual_wv, best_only = messages.decode_pframes_msg(msg)
+    assert (reco_algo, actual_wv, best_only) == ("dummy", wire_version, False)
+    assert len(actuals) == 1
+    assert_same_pframe(actuals[0], pframe)
+
+
+@pytest.mark.parametrize("best_only", [False, True])
+@pytest.mark.parametrize("wire_version", cfg.WIRE_VERSIONS)
+def test_pframes_msg(wire_version: int, best_only: bool) -> None:
+    pframes = [_pframe(64, 1234, i) for i in range(3)]
+    msg = messages.encode_pframes_msg("dummy", "0", pframes, wire_version, best_only)
+
+    reco_algo, actuals, _, actual_wv, actual_best_only = messages.decode_pframes_msg(msg)
+    assert (reco_algo, actual_wv, actual_best_only) == ("dummy", wire_version, best_only)
+    assert len(actuals) == len(pframes)
+    for actual, expected in zip(actuals, pframes):
+        assert_same_pframe(actual, expected)
@@ -0,0 +1,270 @@
+"""Tests for the pixel classes' containers."""
+
+import math
+import random
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pytest
+from icecube import dataclasses  # type: ignore[import-not-found]
+
+from skymap_scanner.utils.pixel_classes import (
+    BestPixelsTracker,
+    NSidesDict,
+    RecoPixelFinal,
+    RecoPixelFinalStore,
+)
+
+
+def _pixfin(nside: int, pixel_id: int, llh: float) -> RecoPixelFinal:
+    return RecoPixelFinal(
+        nside=nside,
+        pixel_id=pixel_id,
+        llh=llh,
+        reco_losses_inside=-1.5,
+        reco_losses_total=float("nan"),
+        position=dataclasses.I3Position(1.0, -2.0, pixel_id * 0.5),
+        time=-100.25,
+        energy=float("inf"),
+    )
+
+
+def assert_same_pixfin(actual: RecoPixelFinal, expected: RecoPixelFinal) -> None:
+    """Assert the two are the same, value for value (NaN == NaN)."""
+    assert (actual.nside, actual.pixel_id) == (expected.nside, expected.pixel_id)
+    for a, e in [
+        (actual.llh, expected.llh),
+        (actual.reco_losses_inside, expected.reco_losses_inside),
+        (actual.reco_losses_total, expected.reco_losses_total),
+        (actual.position.x, expected.position.x),
+        (actual.position.y, expected.position.y),
+        (actual.position.z, expected.position.z),
+        (actual.time, expected.time),
+        (actual.energy, expected.energy),
+    ]:
+        assert (math.isnan(a) and math.isnan(e)) or a == e
+
+
+#
+# RecoPixelFinalStore
+#
+
+
+def test_store_roundtrip() -> None:
+    store = RecoPixelFinalStore(8)
+    pixfins = [_pixfin(8, i, -float(i)) for i in (5, 0, 700, 3)]
+    for p in pixfins:
+        store[p.pixel_id] = p
+
+    assert len(store) == 4
+    assert list(store) == [5, 0, 700, 3]  # insertion order
+    for p in pixfins:
+        assert p.pixel_id in store
+        assert_same_pixfin(store[p.pixel_id], p)
+    assert 1 not in store
+    with pytest.raises(KeyError):
+        store[1]
+
+    assert store.array.dtype == RecoPixelFinalStore.DTYPE
+    assert store.array["pixel_id"].tolist() == [5, 0, 700, 3]
+    assert store.array["llh"].tolist() == [-5.0, -0.0, -700.0, -3.0]
+    with pytest.raises(ValueError):  # read-only
+        store.array["llh"][0] = 0.0
+
+
+@pytest.mark.parametrize(
+    "pixel_id, pixfin",
+    [
+        (1, _pixfin(8, 2, 0.0)),  # wrong pixel
+        (1, _pixfin(64, 1, 0.0)),  # wrong nside
+        (1, "not a pixfin"),
+    ],
+)
+def test_store_rejects_invalid(pixel_id: int, pixfin: RecoPixelFinal) -> None:
+    store = RecoPixelFinalStore(8)
+    with pytest.raises(ValueError):
+        store[pixel_id] = pixfin
+    assert len(store) == 0
+    assert store.version == 0
+
+
+def test_store_grows() -> None:
+    store = RecoPixelFinalStore(1024)
+    n = RecoPixelFinalStore._INITIAL_CAPACITY * 4 + 1
+    for i in range(n):
+        store[i] = _pixfin(1024, i, float(i))
+    assert len(store) == n
+    assert store.array["pixel_id"].tolist() == list(range(n))
+    assert_same_pixfin(store[n - 1], _pixfin(1024, n - 1, float(n - 1)))
+
+
+def test_store_versions() -> None:
+    store = RecoPixelFinalStore(8)
+    store[0] = _pixfin(8, 0, 1.0)
+    store[1] = _pixfin(8, 1, 2.0)
+    assert (store.version, store.rewrite_version) == (2, 0)  # appends
+
+    store[0] = _pixfin(8, 0, 3.0)  # overwrite
+    assert (store.version, store.rewrite_version) == (3, 1)
+    assert store[0].llh == 3.0
+    assert len(store) == 2
+
+    del store[0]
+    assert (store.version, store.rewrite_version) == (4, 2)
+
+    # so, if only `version` changed, the new pixels are at the end
+    n_previous, rewrite_version = len(store), store.rewrite_version
+    store[2] = _pixfin(8, 2, 4.0)
+    store[3] = _pixfin(8, 3, 5.0)
+    assert store.rewrite_version == rewrite_version
+    assert store.array[n_previous:]["pixel_id"].tolist() == [2, 3]
+
+
+def test_store_delete() -> None:
+    store = RecoPixelFinalStore(8)
+    for i in range(5):
+        store[i] = _pixfin(8, i, float(i))
+
+    del store[1]  # the last row fills the hole
+    assert list(store) == [0, 4, 2, 3]
+    del store[3]  # the last row
+    assert list(store) == [0, 4, 2]
+    with pytest.raises(KeyError):
+        del store[3]
+
+    assert len(store) == 3
+    for i in (0, 2, 4):
+        assert_same_pixfin(store[i], _pixfin(8, i, float(i)))
+    # the deleted can be re-added
+    store[1] = _pixfin(8, 1, 9.0)
+    assert list(store) == [0, 4, 2, 1]
+    assert store[1].llh == 9.0
+
+
+def test_store_matches_dict() -> None:
+    """Randomly set/overwrite/delete, checking against a plain dict."""
+    rng = random.Random(1234)
+    store = RecoPixelFinalStore(8)
+    expected: Dict[int, RecoPixelFinal] = {}
+    for _ in range(2000):
+        pixel_id = rng.randrange(200)
+        if pixel_id in expected and rng.random() < 0.3:
+            del store[pixel_id]
+            del expected[pixel_id]
+        else:
+            expected[pixel_id] = _pixfin(8, pixel_id, rng.uniform(-10, 10))
+            store[pixel_id] = expected[pixel_id]
+
+    assert len(store) == len(expected)
+    assert sorted(store) == sorted(expected)
+    assert sorted(store.keys()) == sorted(expected.keys())
+    for pixel_id, pixfin in expected.items():
+        assert_same_pixfin(store[pixel_id], pixfin)
+    # the array agrees with the rows
+    for row in store.array:
+        assert row["llh"] == expected[int(row["pixel_id"])].llh
+    assert np.unique(store.array["pixel_id"]).size == len(store)
+
+
+def test_nsides_dict_converts_to_stores() -> None:
+    nsides_dict = NSidesDict({8: {0: _pixfin(8, 0, 1.0)}})
+    nsides_dict[64] = {5: _pixfin(64, 5, 2.0)}
+    nsides_dict.setdefault(512, {})
+    assert all(isinstance(s, RecoPixelFinalStore) for s in nsides_dict.values())
+    assert [s.nside for s in nsides_dict.values()] == [8, 64, 512]
+    assert_same_pixfin(nsides_dict[64][5], _pixfin(64, 5, 2.0))
+
+    # a store for the nside is kept as is
+    store = RecoPixelFinalStore(8)
+    store[0] = _pixfin(8, 0, 3.0)
+    nsides_dict[8] = store
+    assert nsides_dict[8] is store
+    # one for another nside is converted, so its pixels are rejected
+    with pytest.raises(ValueError):
+        nsides_dict[64] = store
+
+
+#
+# BestPixelsTracker
+#
+
+
+def brute_force_best(nsides_dict: NSidesDict, k: int) -> List[Tuple[int, int]]:
+    """Sort every (non-NaN) pixel -- ties go by nside then row order."""
+    pixels = [
+        (store[pixel_id].llh, nside_index, row, nside, pixel_id)
+        for nside_index, (nside, store) in enumerate(nsides_dict.items())
+        for row, pixel_id in enumerate(store)
+        if not math.isnan(store[pixel_id].llh)
+    ]
+    return [(p[3], p[4]) for p in sorted(pixels)[:k]]
+
+
+def test_best_pixels() -> None:
+    nsides_dict = NSidesDict()
+    assert nsides_dict.get_best_pixels(3) == []
+
+    nsides_dict[8] = {
+        0: _pixfin(8, 0, 5.0),
+        1: _pixfin(8, 1, float("nan")),
+        2: _pixfin(8, 2, -1.0),
+    }
+    assert nsides_dict.get_best_pixels() == [(8, 2)]
+    assert nsides_dict.get_best_pixels(5) == [(8, 2), (8, 0)]  # no NaNs
+
+    # ties go by nside, then insertion order
+    nsides_dict[64] = {7: _pixfin(64, 7, -1.0), 3: _pixfin(64, 3, -1.0)}
+    nsides_dict[8][9] = _pixfin(8, 9, -1.0)
+    assert nsides_dict.get_best_pixels(4) == [(8, 2), (8, 9), (64, 7), (64, 3)]
+
+
+def test_best_pixels_catches_up() -> None:
+    nsides_dict = NSidesDict({8: {0: _pixfin(8, 0, 5.0)}})
+    tracker = BestPixelsTracker(2)
+    assert tracker.get_best(nsides_dict, 2) == [(8, 0)]
+
+    # appends
+    nsides_dict[8][1] = _pixfin(8, 1, 4.0)
+    nsides_dict[8][2] = _pixfin(8, 2, 6.0)
+    nsides_dict[64] = {0: _pixfin(64, 0, 1.0)}
+    assert tracker.get_best(nsides_dict, 2) == [(64, 0), (8, 1)]
+    # an overwrite -- for the worse
+    nsides_dict[64][0] = _pixfin(64, 0, 100.0)
+    assert tracker.get_best(nsides_dict, 2) == [(8, 1), (8, 0)]
+    # a deletion
+    del nsides_dict[8][1]
+    assert tracker.get_best(nsides_dict, 2) == [(8, 0), (8, 2)]
+    # a replaced store
+    nsides_dict[8] = {5: _pixfin(8, 5, 50.0)}
+    assert tracker.get_best(nsides_dict, 2) == [(8, 5), (64, 0)]
+    # a removed nside
+    del nsides_dict[8]
+    assert tracker.get_best(nsides_dict, 2) == [(64, 0)]
+    # more than the capacity -- it grows, then keeps catching up
+    nsides_dict[64].update({i: _pixfin(64, i, -float(i)) for i in range(1, 6)})
+    assert tracker.get_best(nsides_dict, 4) == [(64, 5), (64, 4), (64, 3), (64, 2)]
+    assert tracker.capacity == 4
+    assert tracker.get_best(nsides_dict, 2) == [(64, 5), (64, 4)]
+    nsides_dict[64][6] = _pixfin(64, 6, -6.0)
+    assert tracker.get_best(nsides_dict, 4) == [(64, 6), (64, 5), (64, 4), (64, 3)]
+    assert tracker.capacity == 4
+
+
+def test_best_pixels_matches_brute_force() -> None:
+    """Randomly set/overwrite/delete, checking the best after each."""
+    rng = random.Random(5678)
+    nsides = [8, 64, 512]
+    nsides_dict = NSidesDict()
+    for _ in range(1000):
+        nside = rng.choice(nsides)
+        store = nsides_dict.setdefault(nside, {})
+        pixel_id = rng.randrange(50)
+        if pixel_id in store and rng.random() < 0.2:
+            del store[pixel_id]
+        else:
+            # few distinct values, so there are ties
+            llh = rng.choice([float("nan"), *range(-5, 5)])
+            store[pixel_id] = _pixfin(nside, pixel_id, float(llh))
+
+        k = rng.randint(1, NSidesDict.N_BEST_PIXELS_TRACKED + 4)
+        assert nsides_dict.get_best_pixels(k) == brute_force_best(nsides_dict, k)